@@ -0,0 +1,113 @@
+"""
+Benchmark single-row create latency.
+
+Times POST /sensors/ and POST /metrics/ end to end, and the database work of
+creating a sensor with INSERT ... RETURNING against the add, commit and
+refresh sequence it replaced. Reports mean, p50 and p95 latency and SQL
+statements per create.
+
+Usage:
+    python -m benchmarks.bench_create --requests 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Base, get_db
+from src.main import app
+from src.models.models import Sensor
+
+
+def summarize(durations, statements):
+    durations = sorted(durations)
+    return {
+        "mean_us": statistics.fmean(durations) * 1e6,
+        "p50_us": durations[len(durations) // 2] * 1e6,
+        "p95_us": durations[int(len(durations) * 0.95)] * 1e6,
+        "statements_per_create": statements / len(durations),
+    }
+
+
+def timed(count, create, counter):
+    create(0)  # warm up
+    counter[0] = 0
+    durations = []
+    for i in range(count):
+        started = time.perf_counter()
+        create(i)
+        durations.append(time.perf_counter() - started)
+    return summarize(durations, counter[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    report = {"requests": args.requests}
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'create.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        counter = [0]
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count_statement(*args):
+            counter[0] += 1
+
+        def refresh_create(i):
+            with session_factory() as db:
+                sensor = Sensor(name=f"Sensor {i}", location="Benchmark")
+                db.add(sensor)
+                db.commit()
+                db.refresh(sensor)
+
+        def returning_create(i):
+            with session_factory() as db:
+                db.execute(
+                    insert(Sensor).values(name=f"Sensor {i}", location="Benchmark")
+                    .returning(Sensor.id, Sensor.name, Sensor.location, Sensor.created_at)
+                ).one()
+                db.commit()
+
+        report["session_refresh"] = timed(args.requests, refresh_create, counter)
+        report["session_returning"] = timed(args.requests, returning_create, counter)
+
+        def override_get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            with TestClient(app) as client:
+                report["http_create_sensor"] = timed(
+                    args.requests,
+                    lambda i: client.post("/sensors/", json={"name": f"Sensor {i}", "location": "Benchmark"}),
+                    counter
+                )
+                report["http_create_metric"] = timed(
+                    args.requests,
+                    lambda i: client.post("/metrics/", json={"sensor_id": 1, "metric_type": "temperature",
+                                                             "value": float(i)}),
+                    counter
+                )
+        finally:
+            app.dependency_overrides = {}
+            engine.dispose()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
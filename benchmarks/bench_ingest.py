@@ -0,0 +1,134 @@
+"""
+Benchmark ingestion throughput of the HTTP and streaming paths.
+
+Stores the same readings with one POST /metrics/ per reading, with
+POST /metrics/batch/ as JSON and as packed binary records, and over the
+/metrics/ingest/ WebSocket with frames of a single reading and batched JSON
+and binary frames. Reports rows per second and time per reading for each.
+
+Usage:
+    python -m benchmarks.bench_ingest --readings 5000 --frame-size 100
+"""
+import argparse
+import json
+import os
+import random
+import struct
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Base, get_db
+from src.main import app
+from src.models.models import Sensor
+from src.schemas.schemas import MetricType
+from src.utils.ingest import BINARY_CONTENT_TYPE
+
+SENSORS = 10
+METRIC_TYPES = [metric_type.value for metric_type in MetricType]
+
+
+def make_readings(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {"sensor_id": rng.randint(1, SENSORS), "metric_type": rng.choice(METRIC_TYPES),
+         "value": round(rng.uniform(0.0, 100.0), 2)}
+        for _ in range(count)
+    ]
+
+
+def http_post(client, readings):
+    for reading in readings:
+        client.post("/metrics/", json=reading)
+
+
+def pack(readings):
+    return b"".join(
+        struct.pack("<IBqd", reading["sensor_id"], METRIC_TYPES.index(reading["metric_type"]), 0, reading["value"])
+        for reading in readings
+    )
+
+
+def chunks(readings, size):
+    return [readings[i:i + size] for i in range(0, len(readings), size)]
+
+
+def http_batch(client, readings, batch_size, binary):
+    for batch in chunks(readings, batch_size):
+        if binary:
+            client.post("/metrics/batch/", content=pack(batch), headers={"Content-Type": BINARY_CONTENT_TYPE})
+        else:
+            client.post("/metrics/batch/", json=batch)
+
+
+def websocket_stream(client, readings, frame_size, binary=False):
+    frames = chunks(readings, frame_size)
+    with client.websocket_connect("/metrics/ingest/") as websocket:
+        for frame in frames:
+            if binary:
+                websocket.send_bytes(pack(frame))
+            else:
+                websocket.send_text(json.dumps(frame))
+        # Wait until every frame is acknowledged
+        acknowledged = 0
+        while acknowledged < len(frames):
+            acknowledged = websocket.receive_json()["frames"]
+
+
+def summarize(count, elapsed):
+    return {"rows_per_s": count / elapsed, "us_per_reading": elapsed / count * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=5000)
+    parser.add_argument("--frame-size", type=int, default=100,
+                        help="Readings per frame or request in the batched runs")
+    args = parser.parse_args()
+
+    report = {"readings": args.readings}
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'ingest.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        with session_factory() as db:
+            db.add_all([Sensor(name=f"Sensor {i}", location="Benchmark") for i in range(SENSORS)])
+            db.commit()
+
+        def override_get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            with TestClient(app) as client:
+                runs = {
+                    "http_post": lambda readings: http_post(client, readings),
+                    "websocket_single": lambda readings: websocket_stream(client, readings, 1),
+                    "websocket_batched": lambda readings: websocket_stream(client, readings, args.frame_size),
+                    "websocket_binary": lambda readings: websocket_stream(client, readings, args.frame_size, True),
+                    "http_batch_json": lambda readings: http_batch(client, readings, args.frame_size, False),
+                    "http_batch_binary": lambda readings: http_batch(client, readings, args.frame_size, True),
+                }
+                for name, run in runs.items():
+                    run(make_readings(100, seed=1))  # warm up
+                    readings = make_readings(args.readings)
+                    started = time.perf_counter()
+                    run(readings)
+                    report[name] = summarize(len(readings), time.perf_counter() - started)
+        finally:
+            app.dependency_overrides = {}
+            engine.dispose()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
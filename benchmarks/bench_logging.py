@@ -0,0 +1,115 @@
+"""
+Benchmark request latency with logging enabled.
+
+Issues POST /query/ requests for metric types without data, so every request
+logs one line per metric type, and compares the queue-based logger against
+handlers that write synchronously on the request thread and against logging
+disabled.
+
+Usage:
+    python -m benchmarks.bench_logging --requests 2000
+"""
+import argparse
+import json
+import logging
+import statistics
+import tempfile
+import time
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from queue import SimpleQueue
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.database import Base, get_db
+from src.main import app
+from src.utils import logging_config
+
+QUERY = {"metric_types": ["wind_speed", "pressure", "rainfall"], "statistic": "avg"}
+
+
+def run_requests(client, count):
+    """Return per-request latencies in milliseconds."""
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        client.post("/query/", json=QUERY)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": ordered[len(ordered) // 2],
+        "p99_ms": ordered[int(len(ordered) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--json", action="store_true", help="Use the JSON line file format")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    logger = logging_config.logger
+    original_handlers = logger.handlers[:]
+    original_level = logger.level
+    report = {"requests": args.requests}
+
+    with tempfile.TemporaryDirectory() as directory, TestClient(app) as client:
+        logging_config.log_dir = Path(directory)
+        logging_config.listener.stop()
+        logger.propagate = False
+
+        try:
+            # Console and file I/O on the request thread
+            handlers = logging_config.create_handlers(args.json)
+            logger.handlers = handlers
+            run_requests(client, 50)  # warm up
+            report["synchronous"] = summarize(run_requests(client, args.requests))
+            for handler in handlers:
+                handler.close()
+
+            # Records handed to a background listener thread
+            handlers = logging_config.create_handlers(args.json)
+            log_queue = SimpleQueue()
+            listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            logger.handlers = [QueueHandler(log_queue)]
+            report["queue"] = summarize(run_requests(client, args.requests))
+            listener.stop()
+            for handler in handlers:
+                handler.close()
+
+            # Level disabled: lazy %-style arguments are never formatted
+            logger.setLevel(logging.WARNING)
+            report["disabled"] = summarize(run_requests(client, args.requests))
+        finally:
+            logger.handlers = original_handlers
+            logger.setLevel(original_level)
+            logger.propagate = True
+            logging_config.listener.start()
+            app.dependency_overrides = {}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark the parallel query mode against the serial aggregation.
+
+Builds a temporary SQLite database with synthetic readings, then times the
+same query at increasing degrees of parallelism up to the number of cores.
+
+Usage:
+    python -m benchmarks.bench_parallel_query --rows 2000000 --repeat 3
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from src.database.database import Base
+from src.models.models import Metric, Sensor
+from src.schemas.schemas import QueryParams
+from src.utils.parallel_query import parallel_query
+from src.utils.query_planner import answer_query, scan_window
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+METRIC_TYPES = ["temperature", "humidity", "wind_speed", "pressure", "rainfall"]
+
+
+def build_database(path, rows, sensors):
+    """Fill a database file with rows readings spread over 31 days."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(0)
+    span_seconds = 31 * 24 * 3600
+    with engine.begin() as connection:
+        connection.execute(insert(Sensor), [
+            {"name": f"Bench Sensor {i}", "location": "Bench", "created_at": START}
+            for i in range(sensors)
+        ])
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "sensor_id": i % sensors + 1,
+                "metric_type": METRIC_TYPES[i % len(METRIC_TYPES)],
+                "value": rng.uniform(0.0, 100.0),
+                "timestamp": START + timedelta(seconds=span_seconds * i / rows),
+            })
+            if len(batch) == 50000:
+                connection.execute(insert(Metric), batch)
+                batch = []
+        if batch:
+            connection.execute(insert(Metric), batch)
+    return engine
+
+
+def time_call(fn, repeat):
+    """Return the best wall-clock time of repeat calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-parallelism", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    query_params = QueryParams(
+        metric_types=METRIC_TYPES,
+        statistic="avg",
+        start_date=START,
+        end_date=START + timedelta(days=31)
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build_database(os.path.join(directory, "bench.db"), args.rows, args.sensors)
+
+        def serial():
+            with Session(bind=engine) as session:
+                window = (query_params.start_date, query_params.end_date)
+                return answer_query(query_params, scan_window(session, window, [query_params]))
+
+        baseline = time_call(serial, args.repeat)
+        report = {
+            "rows": args.rows,
+            "cores": os.cpu_count(),
+            "serial_seconds": baseline,
+            "parallel": [],
+        }
+
+        parallelism = 1
+        while parallelism <= args.max_parallelism:
+            elapsed = time_call(lambda: parallel_query(engine, query_params, parallelism=parallelism), args.repeat)
+            report["parallel"].append({
+                "parallelism": parallelism,
+                "seconds": elapsed,
+                "speedup": baseline / elapsed,
+            })
+            parallelism *= 2
+
+        engine.dispose()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark API startup: import, lifespan startup and first request.
+
+Every run is a fresh interpreter, as for a new worker. Each run imports
+src.main, starts the app with its lifespan and serves GET /. Runs use a
+temporary working directory: "fresh" runs start without a database, and
+"existing" runs reuse one that is already initialized. Each run also times
+the schema-version check against a full Base.metadata.create_all on the
+initialized database. The report holds the median of each phase. With
+--budget-ms the exit status is 1 when the median total of existing runs
+exceeds the budget.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --runs 10 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(src.main.app) as client:
+    ready = time.perf_counter()
+    client.get("/")
+    served = time.perf_counter()
+
+    from src.database.database import Base, engine
+    from src.database.init_db import ensure_schema
+    check_started = time.perf_counter()
+    ensure_schema(engine)
+    checked = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    created = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (served - ready) * 1000,
+    "total_ms": (served - started) * 1000,
+    "schema_check_ms": (checked - check_started) * 1000,
+    "create_all_ms": (created - checked) * 1000,
+}))
+"""
+
+
+def run_once(directory) -> dict:
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=directory, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def medians(runs) -> dict:
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, help="Fail if the median total of existing runs exceeds this")
+    args = parser.parse_args(argv)
+
+    fresh = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as directory:
+            fresh.append(run_once(directory))
+
+    with tempfile.TemporaryDirectory() as directory:
+        run_once(directory)  # initialize the database
+        existing = [run_once(directory) for _ in range(args.runs)]
+
+    report = {"runs": args.runs, "fresh": medians(fresh), "existing": medians(existing)}
+    exit_code = 0
+    if args.budget_ms is not None:
+        report["budget_ms"] = args.budget_ms
+        report["within_budget"] = report["existing"]["total_ms"] <= args.budget_ms
+        exit_code = 0 if report["within_budget"] else 1
+
+    print(json.dumps(report, indent=2))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
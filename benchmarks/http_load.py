@@ -0,0 +1,246 @@
+"""
+End-to-end HTTP load benchmark.
+
+Drives the API with a scripted mix of requests from concurrent workers and
+reports throughput and p50/p95/p99 latency per route as JSON. By default the
+app runs in-process through an ASGI transport on a freshly seeded temporary
+database; with --base-url the requests go to a running server instead, which
+should already hold a dataset (see python -m src.database.generate_data).
+
+Usage:
+    python -m benchmarks.http_load --mix mixed --requests 5000 --concurrency 16
+    python -m benchmarks.http_load --mix dashboard --output run.json --baseline previous.json
+    python -m benchmarks.http_load --base-url http://localhost:8000 --sensors 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Base, get_db
+from src.database.generate_data import generate_dataset
+from src.schemas.schemas import MetricType, StatisticType
+from src.utils.datetime_helper import utc_now
+
+METRIC_TYPES = [metric_type.value for metric_type in MetricType]
+STATISTICS = [statistic.value for statistic in StatisticType]
+
+# Relative weights of each operation in a scripted mix
+MIXES = {
+    "ingest": {"create_metric": 90, "latest": 5, "query": 5},
+    "dashboard": {"query": 35, "batch_query": 5, "weekly_averages": 25, "latest": 25, "list_metrics": 10},
+    "mixed": {"create_metric": 50, "query": 20, "weekly_averages": 15, "latest": 15},
+}
+
+
+def create_metric(rng, sensors):
+    return "POST", "/metrics/", {
+        "json": {
+            "sensor_id": rng.randint(1, sensors),
+            "metric_type": rng.choice(METRIC_TYPES),
+            "value": round(rng.uniform(0.0, 100.0), 2),
+        }
+    }
+
+
+def _query_body(rng, sensors):
+    body = {
+        "metric_types": rng.sample(METRIC_TYPES, rng.randint(1, 3)),
+        "statistic": rng.choice(STATISTICS),
+    }
+    if rng.random() < 0.7:
+        body["sensor_ids"] = rng.sample(range(1, sensors + 1), min(sensors, rng.randint(1, 5)))
+    if rng.random() < 0.5:
+        end_date = utc_now()
+        body["start_date"] = (end_date - timedelta(days=7)).isoformat()
+        body["end_date"] = end_date.isoformat()
+    return body
+
+
+def query(rng, sensors):
+    return "POST", "/query/", {"json": _query_body(rng, sensors)}
+
+
+def batch_query(rng, sensors):
+    return "POST", "/query/batch/", {"json": [_query_body(rng, sensors) for _ in range(rng.randint(5, 20))]}
+
+
+def weekly_averages(rng, sensors):
+    return "GET", "/sensors/{sensor_id}/weekly-averages/", {"sensor_id": rng.randint(1, sensors)}
+
+
+def latest(rng, sensors):
+    return "GET", "/sensors/{sensor_id}/latest/", {"sensor_id": rng.randint(1, sensors)}
+
+
+def list_metrics(rng, sensors):
+    return "GET", "/metrics/", {"params": {"sensor_id": rng.randint(1, sensors), "limit": 100}}
+
+
+OPERATIONS = {
+    "create_metric": create_metric,
+    "query": query,
+    "batch_query": batch_query,
+    "weekly_averages": weekly_averages,
+    "latest": latest,
+    "list_metrics": list_metrics,
+}
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, int(round(fraction * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+async def worker(client, rng, mix, sensors, remaining, latencies, errors):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        method, route, options = OPERATIONS[rng.choices(names, weights)[0]](rng, sensors)
+        url = route.format(sensor_id=options.pop("sensor_id", None)) if "{" in route else route
+        label = f"{method} {route}"
+
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **options)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        latencies[label].append((time.perf_counter() - started) * 1000)
+        if failed:
+            errors[label] += 1
+
+
+async def run_load(client, mix, sensors, requests, concurrency, seed):
+    """Run the mix and return the per-route report."""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    remaining = [requests]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(client, random.Random(seed + i), mix, sensors, remaining, latencies, errors)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for label, values in sorted(latencies.items()):
+        ordered = sorted(values)
+        routes[label] = {
+            "count": len(ordered),
+            "errors": errors[label],
+            "throughput_rps": len(ordered) / elapsed,
+            "mean_ms": sum(ordered) / len(ordered),
+            "p50_ms": percentile(ordered, 0.50),
+            "p95_ms": percentile(ordered, 0.95),
+            "p99_ms": percentile(ordered, 0.99),
+        }
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "throughput_rps": requests / elapsed,
+        "errors": sum(errors.values()),
+        "routes": routes,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Return the routes whose p95 latency regressed by more than tolerance."""
+    regressions = []
+    for label, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(label)
+        if previous and previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append({
+                "route": label,
+                "baseline_p95_ms": previous["p95_ms"],
+                "p95_ms": current["p95_ms"],
+                "change": current["p95_ms"] / previous["p95_ms"] - 1,
+            })
+    return regressions
+
+
+async def run_in_process(args):
+    """Seed a temporary database and drive the app through an ASGI transport."""
+    from src.main import app
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'load.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        # Queries are relative to now, so the dataset has to end now
+        generate_dataset(engine, args.sensors, args.days, args.interval_minutes, args.seed, end_date=utc_now())
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def override_get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                return await run_load(client, MIXES[args.mix], args.sensors, args.requests, args.concurrency, args.seed)
+        finally:
+            app.dependency_overrides = {}
+            engine.dispose()
+
+
+async def run_remote(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30.0) as client:
+        return await run_load(client, MIXES[args.mix], args.sensors, args.requests, args.concurrency, args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sensors", type=int, default=20, help="Sensors in the seeded dataset")
+    parser.add_argument("--days", type=int, default=7, help="Days of history in the seeded dataset")
+    parser.add_argument("--interval-minutes", type=float, default=15)
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_remote(args) if args.base_url else run_in_process(args))
+    report = {"mix": args.mix, "target": args.base_url or "in-process", "seed": args.seed, **report}
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            report["regressions"] = compare(report, json.load(baseline_file), args.tolerance)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Microbenchmarks for the query engine hot paths.
+
+Times get_statistic_query at several dataset sizes, and the size-independent
+create_query_result_object, QueryParams validation, MetricResponse
+serialization and the per-request rate limiter check. Results are emitted as JSON; with --baseline each benchmark is
+compared against a previous run and the exit status is 1 if any of them got
+slower than the tolerance allows.
+
+Usage:
+    python -m benchmarks.microbench --sizes 10000,1000000,10000000 --output micro.json
+    python -m benchmarks.microbench --sizes 10000 --baseline micro.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.database.database import Base
+from src.database.generate_data import generate_dataset
+from src.models.models import Metric
+from src.schemas.schemas import MetricResponse, QueryParams, StatisticType
+from src.utils.helpers import create_query_result_object, get_statistic_query
+from src.utils.rate_limit import TokenBuckets, client_key
+
+END_DATE = datetime(2025, 3, 1, tzinfo=timezone.utc)
+SENSORS = 10
+DAYS = 31
+METRIC_TYPE_COUNT = 5
+
+
+def measure(fn, repeat, min_time=0.2):
+    """
+    Time fn, calibrating the number of calls per round like timeit.
+
+    Returns:
+        dict: Median and minimum time per call in microseconds
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1000000:
+            break
+        number *= 10
+
+    rounds = [elapsed]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append(time.perf_counter() - started)
+
+    per_call = [duration / number * 1e6 for duration in rounds]
+    return {"median_us": statistics.median(per_call), "min_us": min(per_call), "calls": number * repeat}
+
+
+def build_database(path, rows):
+    """Create a database with about rows metrics for SENSORS sensors over DAYS days."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    readings = max(1, rows // (SENSORS * METRIC_TYPE_COUNT))
+    generate_dataset(engine, SENSORS, DAYS, DAYS * 24 * 60 / readings, seed=0, end_date=END_DATE)
+    return engine
+
+
+def bench_statistic_queries(size, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build_database(os.path.join(directory, "micro.db"), size)
+        with Session(bind=engine) as db:
+            metric_query = db.query(Metric).filter(
+                Metric.metric_type == "temperature",
+                Metric.timestamp >= END_DATE - timedelta(days=7),
+                Metric.timestamp <= END_DATE
+            )
+            for statistic in StatisticType:
+                timing = measure(lambda: get_statistic_query(metric_query, statistic), repeat, min_time=0.05)
+                results.append({"name": f"get_statistic_query[{statistic.value}]", "size": size, **timing})
+        engine.dispose()
+    return results
+
+
+def bench_schemas(repeat):
+    results = []
+    now = datetime.now(timezone.utc)
+
+    results.append({"name": "create_query_result_object[min]", "size": None, **measure(
+        lambda: create_query_result_object("min", "temperature", 12.5, [], now, now, sensor_id=1), repeat
+    )})
+    results.append({"name": "create_query_result_object[avg]", "size": None, **measure(
+        lambda: create_query_result_object("avg", "temperature", 12.5, list(range(1, 21)), now, now), repeat
+    )})
+
+    payload = {
+        "sensor_ids": list(range(1, 21)),
+        "metric_types": ["temperature", "humidity", "wind_speed"],
+        "statistic": "avg",
+        "start_date": (now - timedelta(days=7)).isoformat(),
+        "end_date": now.isoformat(),
+    }
+    results.append({"name": "QueryParams.model_validate", "size": None, **measure(
+        lambda: QueryParams.model_validate(payload), repeat
+    )})
+
+    page_adapter = TypeAdapter(List[MetricResponse])
+    for page_size in (1, 100, 1000):
+        page = [
+            Metric(id=i, sensor_id=1, metric_type="temperature", value=20.0 + i % 10, timestamp=now)
+            for i in range(page_size)
+        ]
+        results.append({"name": f"MetricResponse.serialize[page={page_size}]", "size": None, **measure(
+            lambda: page_adapter.dump_json(page_adapter.validate_python(page, from_attributes=True)), repeat
+        )})
+    return results
+
+
+def bench_rate_limit(repeat):
+    results = []
+    scope = {"headers": [(b"content-type", b"application/json"), (b"x-api-key", b"gateway")],
+             "client": ("10.0.0.1", 5000)}
+    buckets = TokenBuckets(rate=1e9, burst=1e9)
+    results.append({"name": "RateLimit.take[clients=1]", "size": None, **measure(
+        lambda: buckets.take(client_key(scope)), repeat
+    )})
+
+    # Rotate through many clients so lookups miss the cache and idle buckets are evicted
+    many = TokenBuckets(rate=1.0, burst=1.0, max_clients=10000)
+    counter = iter(range(10 ** 9))
+    results.append({"name": "RateLimit.take[clients=100000]", "size": None, **measure(
+        lambda: many.take(next(counter) % 100000), repeat
+    )})
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the benchmarks whose median got slower than tolerance allows."""
+    previous = {(item["name"], item["size"]): item for item in baseline.get("results", [])}
+    comparison = []
+    for item in results:
+        before = previous.get((item["name"], item["size"]))
+        if before is None:
+            continue
+        ratio = item["median_us"] / before["median_us"]
+        comparison.append({
+            "name": item["name"],
+            "size": item["size"],
+            "baseline_median_us": before["median_us"],
+            "median_us": item["median_us"],
+            "ratio": ratio,
+            "regressed": ratio > 1 + tolerance,
+        })
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,1000000,10000000",
+                        help="Comma-separated dataset sizes in rows for the statistic queries")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown (0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    results = bench_schemas(args.repeat) + bench_rate_limit(args.repeat)
+    for size in (int(size) for size in args.sizes.split(",") if size):
+        results.extend(bench_statistic_queries(size, args.repeat))
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            report["comparison"] = compare(results, json.load(baseline_file), args.tolerance)
+        exit_code = 1 if any(item["regressed"] for item in report["comparison"]) else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Online backup and restore using SQLite's backup API.
+
+Snapshots are consistent even while the API is writing. Pages are copied in
+small steps with a pause between them, so the source database is only
+locked briefly and ingestion keeps flowing. If another connection writes
+to the database mid-copy, SQLite restarts the copy, so the result is
+always a point-in-time snapshot. Under steady ingestion the stepped copy
+could restart forever, so after BACKUP_MAX_RESTARTS restarts the remaining
+pages are copied in a single step, holding the read lock (and making
+writers wait) until it is done. Snapshots can be gzip-compressed.
+
+Usage:
+    python -m src.database.backup backup --output backups/weather.db.gz --compress
+    python -m src.database.backup restore backups/weather.db.gz
+
+Restart the API after a restore, so its sensor cache is rebuilt from the
+restored database.
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+# Add the parent directory to sys.path to allow importing from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, parent_dir)
+
+from src.database.database import engine
+from src.utils.logging_config import logger
+from src.utils.sensor_cache import sensor_cache
+
+# Directory snapshots taken through the admin endpoint are written to
+BACKUP_DIR = Path(os.getenv("BACKUP_DIR", "backups"))
+# Pages copied per step and pause between steps
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.005"))
+# Restarts of the stepped copy tolerated before the rest is copied in one step
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "3"))
+
+
+class BackupReport(NamedTuple):
+    """Outcome of a backup."""
+    path: str
+    pages: int
+    size_bytes: int
+    compressed: bool
+    duration: float
+    restarts: int = 0
+
+
+class _TooManyRestarts(Exception):
+    """Raised from the progress callback to abandon a stepped copy."""
+
+
+def _copy(source, target, pages_per_step: int, step_sleep: float, max_restarts: int):
+    """
+    Copy source into target, falling back to a single step if the stepped copy keeps restarting.
+
+    Returns:
+        tuple: Pages in the snapshot and restarts of the stepped copy
+    """
+    state = {"pages": 0, "remaining": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        state["pages"] = total
+        # The remaining count only grows when a write to the source restarted the copy
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+        # The backup API only sleeps when a step finds the database busy, so pause here, between steps
+        if remaining and step_sleep:
+            time.sleep(step_sleep)
+
+    try:
+        source.backup(target, pages=pages_per_step, progress=progress, sleep=step_sleep)
+    except _TooManyRestarts:
+        logger.warning("Backup restarted %d times under concurrent writes, copying the rest in one step",
+                       state["restarts"])
+        source.backup(target, pages=-1, progress=progress, sleep=step_sleep)
+    return state["pages"], state["restarts"]
+
+
+def backup_database(
+        target_engine,
+        destination,
+        compress: bool = False,
+        pages_per_step: int = None,
+        step_sleep: float = None,
+        max_restarts: int = None
+) -> BackupReport:
+    """
+    Copy the database behind target_engine to destination.
+
+    Args:
+        target_engine: Engine of the database to back up
+        destination: Path of the snapshot file
+        compress (bool): Gzip the snapshot
+        pages_per_step (int): Pages copied before the source lock is released
+        step_sleep (float): Seconds to pause between steps
+        max_restarts (int): Restarts tolerated before the rest is copied in one step
+
+    Returns:
+        BackupReport: Location, size and duration of the backup
+    """
+    pages_per_step = pages_per_step or BACKUP_PAGES_PER_STEP
+    step_sleep = BACKUP_STEP_SLEEP if step_sleep is None else step_sleep
+    max_restarts = BACKUP_MAX_RESTARTS if max_restarts is None else max_restarts
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+
+    # Snapshot to a temporary file first so a failed backup never leaves a partial file behind
+    fd, snapshot_path = tempfile.mkstemp(suffix=".db", dir=destination.parent)
+    os.close(fd)
+
+    try:
+        raw_connection = target_engine.raw_connection()
+        try:
+            snapshot = sqlite3.connect(snapshot_path)
+            try:
+                pages, restarts = _copy(
+                    raw_connection.driver_connection, snapshot, pages_per_step, step_sleep, max_restarts
+                )
+            finally:
+                snapshot.close()
+        finally:
+            raw_connection.close()
+
+        if compress:
+            with open(snapshot_path, "rb") as source, gzip.open(destination, "wb", compresslevel=6) as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+        else:
+            os.replace(snapshot_path, destination)
+    finally:
+        if os.path.exists(snapshot_path):
+            os.unlink(snapshot_path)
+
+    report = BackupReport(
+        str(destination), pages, destination.stat().st_size, compress, time.perf_counter() - started, restarts
+    )
+    logger.info("Backed up %d pages to %s (%d bytes) in %.2f s with %d restarts",
+                report.pages, report.path, report.size_bytes, report.duration, report.restarts)
+    return report
+
+
+def restore_database(target_engine, source, pages_per_step: int = None) -> None:
+    """
+    Replace the contents of the database behind target_engine with a snapshot.
+
+    Gzip-compressed snapshots (.gz) are decompressed first. The copy goes
+    through the backup API, so open connections see either the old or the
+    restored database, never a mix.
+
+    The sensor cache is only cleared in this process. A running API keeps
+    its own cache and would accept readings for sensors the snapshot does
+    not have, so restart the API after restoring from the command line.
+    """
+    source = Path(source)
+    pages_per_step = pages_per_step or BACKUP_PAGES_PER_STEP
+
+    with tempfile.TemporaryDirectory() as directory:
+        if source.suffix == ".gz":
+            snapshot_path = Path(directory) / "restore.db"
+            with gzip.open(source, "rb") as compressed, open(snapshot_path, "wb") as target:
+                shutil.copyfileobj(compressed, target, 1024 * 1024)
+        else:
+            snapshot_path = source
+
+        snapshot = sqlite3.connect(snapshot_path)
+        try:
+            raw_connection = target_engine.raw_connection()
+            try:
+                snapshot.backup(raw_connection.driver_connection, pages=pages_per_step)
+            finally:
+                raw_connection.close()
+        finally:
+            snapshot.close()
+
+    # Pooled connections may hold cached schema from before the restore
+    target_engine.dispose()
+    # The snapshot may hold a different set of sensors
+    sensor_cache(target_engine).clear()
+    logger.info("Restored database from %s", source)
+
+
+def default_backup_path(compress: bool) -> Path:
+    # Microseconds keep backups taken within the same second from overwriting each other
+    name = f"weather_data-{datetime.now().strftime('%Y%m%dT%H%M%S.%f')}.db"
+    return BACKUP_DIR / (name + ".gz" if compress else name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up or restore the weather database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backup_parser = subparsers.add_parser("backup", help="Take a consistent online snapshot")
+    backup_parser.add_argument("--output", help="Snapshot path (defaults to a timestamped file in BACKUP_DIR)")
+    backup_parser.add_argument("--compress", action="store_true", help="Gzip the snapshot")
+    backup_parser.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP, help="Pages copied per step")
+    backup_parser.add_argument("--sleep", type=float, default=BACKUP_STEP_SLEEP, help="Seconds between steps")
+    backup_parser.add_argument("--max-restarts", type=int, default=BACKUP_MAX_RESTARTS,
+                               help="Restarts tolerated before the rest is copied in one step")
+
+    restore_parser = subparsers.add_parser("restore", help="Restore the database from a snapshot")
+    restore_parser.add_argument("snapshot", help="Snapshot file, optionally gzip-compressed (.gz)")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "backup":
+            destination = args.output or default_backup_path(args.compress)
+            report = backup_database(
+                engine, destination, args.compress, args.pages, args.sleep, args.max_restarts
+            )
+            print(f"Backed up {report.pages} pages to {report.path} ({report.size_bytes} bytes) "
+                  f"in {report.duration:.2f} s.")
+        else:
+            restore_database(engine, args.snapshot)
+            print(f"Restored database from {args.snapshot}. Restart the API to reload its sensor cache.")
+    except (sqlite3.Error, OSError) as e:
+        logger.error("Database %s failed: %s", args.command, e)
+        print(f"Database {args.command} failed. Check the logs for details.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
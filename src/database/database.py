@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 # Updated import for declarative_base in SQLAlchemy 2.0
 from sqlalchemy.orm import sessionmaker, declarative_base
 
@@ -9,6 +9,18 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///./weather_data.db"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Lets the retention job reclaim space with incremental vacuum. This only
+    # takes effect on new databases; existing ones are converted with
+    # python -m src.database.retention --enable-incremental-vacuum
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Use declarative_base from sqlalchemy.orm package
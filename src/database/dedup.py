@@ -0,0 +1,93 @@
+"""
+Unique index on metric readings, used by ingestion deduplication.
+
+With INGEST_DEDUP set to "ignore" or "replace", inserts resolve duplicates
+with ON CONFLICT against a unique index on (sensor_id, metric_type,
+timestamp). The index is optional because databases that already hold
+duplicates must be cleaned up before it can be created, which this module
+does, keeping the most recently written row of each reading. The cleanup
+scans and rewrites the whole metrics table, so it only runs from this script
+or once when a schema upgrade records a new version, never on every start.
+
+Usage:
+    python -m src.database.dedup
+"""
+import argparse
+import os
+import sys
+
+# Add the parent directory to sys.path to allow importing from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, parent_dir)
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database.database import engine
+from src.utils.logging_config import logger
+
+READING_INDEX = "uq_metrics_reading"
+
+
+class MissingReadingIndexError(RuntimeError):
+    """Raised when deduplicated ingestion is enabled but the unique reading index does not exist."""
+
+
+def reading_index_exists(connection) -> bool:
+    """Return whether the unique reading index has been created."""
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (READING_INDEX,)
+    ).first() is not None
+
+
+def remove_duplicate_metrics(connection) -> int:
+    """
+    Delete all but the highest id of each (sensor_id, metric_type, timestamp).
+
+    Returns:
+        int: Number of rows deleted
+    """
+    return connection.exec_driver_sql(
+        "DELETE FROM metrics WHERE id NOT IN "
+        "(SELECT MAX(id) FROM metrics GROUP BY sensor_id, metric_type, timestamp)"
+    ).rowcount
+
+
+def ensure_reading_index(connection) -> int:
+    """
+    Create the unique reading index if it is missing, removing duplicates first.
+
+    Args:
+        connection: SQLAlchemy connection inside a transaction
+
+    Returns:
+        int: Number of duplicate rows removed
+    """
+    if reading_index_exists(connection):
+        return 0
+
+    removed = remove_duplicate_metrics(connection)
+    connection.exec_driver_sql(
+        f"CREATE UNIQUE INDEX {READING_INDEX} ON metrics (sensor_id, metric_type, timestamp)"
+    )
+    logger.info("Created unique reading index after removing %d duplicate metrics", removed)
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove duplicate readings and create the unique reading index.")
+    parser.parse_args(argv)
+
+    try:
+        with engine.begin() as connection:
+            removed = ensure_reading_index(connection)
+    except SQLAlchemyError as e:
+        logger.error("Failed to create the unique reading index: %s", e)
+        print("Failed to create the unique reading index. Check the logs for details.")
+        return 1
+
+    print(f"Unique reading index in place; removed {removed} duplicate metrics.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Partitioned Parquet export of the metrics table for offline analytics.
+
+Each complete UTC day is written as one Parquet file per metric type, laid out
+as Hive-style partitions:
+
+    exports/date=2025-03-01/metric_type=temperature/part-0.parquet
+
+Rows are streamed from the database in chunks and every chunk becomes a
+row group, so memory use stays flat and readers can skip row groups using
+the min/max statistics of each column. Exports are incremental: the last
+exported day and the highest metric id seen are recorded in the export
+directory, so the next run writes the days after it, plus any earlier days
+that received backfilled readings since, found with a range scan over the
+new ids. Row counts of every file are checked against the source before a
+day is marked as exported.
+
+Usage:
+    python -m src.database.export --output exports
+    python -m src.database.export --full
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+# Add the parent directory to sys.path to allow importing from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, parent_dir)
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database.database import engine
+from src.utils.datetime_helper import utc_now
+from src.utils.logging_config import logger
+
+# Directory the partitioned dataset is written to
+EXPORT_DIR = Path(os.getenv("EXPORT_DIR", "exports"))
+# Rows fetched from the database and written per row group
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "100000"))
+
+STATE_FILE = "_export_state.json"
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("sensor_id", pa.int32()),
+    ("value", pa.float64()),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+])
+
+
+class ExportVerificationError(Exception):
+    """Raised when an exported file does not hold the same number of rows as the source."""
+
+
+class ExportState(NamedTuple):
+    """Progress recorded between export runs."""
+    last_day: Optional[date]
+    last_metric_id: int
+
+
+class ExportReport(NamedTuple):
+    """Outcome of an export run."""
+    days: List[str]
+    files: int
+    rows: int
+    duration: float
+
+
+def read_state(output_dir) -> ExportState:
+    """Return the progress of previous exports to output_dir."""
+    path = Path(output_dir) / STATE_FILE
+    if not path.exists():
+        return ExportState(None, 0)
+    with open(path) as state_file:
+        state = json.load(state_file)
+    last_day = state.get("last_exported_day")
+    return ExportState(date.fromisoformat(last_day) if last_day else None, state.get("last_metric_id", 0))
+
+
+def write_state(output_dir, state: ExportState) -> None:
+    path = Path(output_dir) / STATE_FILE
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "w") as state_file:
+        json.dump({
+            "last_exported_day": state.last_day.isoformat() if state.last_day else None,
+            "last_metric_id": state.last_metric_id,
+        }, state_file)
+    os.replace(temporary, path)
+
+
+def _day_bounds(day: date):
+    # Timestamps are stored as ISO text, so day boundaries compare as strings
+    return day.isoformat(), (day + timedelta(days=1)).isoformat()
+
+
+def days_to_export(connection, after: Optional[date], until: date) -> List[date]:
+    """
+    List the days holding metrics after the given day and before until.
+
+    Args:
+        connection: Database connection
+        after (date): Last day already exported, or None to start from the first metric
+        until (date): First day not to export, normally today since it is still incomplete
+
+    Returns:
+        List[date]: Days with at least one metric, in order
+    """
+    if after is None:
+        first = connection.exec_driver_sql("SELECT MIN(timestamp) FROM metrics").scalar()
+        if first is None:
+            return []
+        day = date.fromisoformat(first[:10])
+    else:
+        day = after + timedelta(days=1)
+
+    days = []
+    while day < until:
+        start, end = _day_bounds(day)
+        if connection.exec_driver_sql(
+            "SELECT 1 FROM metrics WHERE timestamp >= ? AND timestamp < ? LIMIT 1", (start, end)
+        ).first():
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def backfilled_days(connection, state: ExportState) -> List[date]:
+    """
+    List already exported days that received readings after the previous export.
+
+    Only metrics with an id above the recorded one are scanned, using the primary key.
+    """
+    if state.last_day is None:
+        return []
+    _, end = _day_bounds(state.last_day)
+    rows = connection.exec_driver_sql(
+        "SELECT DISTINCT substr(timestamp, 1, 10) FROM metrics WHERE id > ? AND timestamp < ?",
+        (state.last_metric_id, end)
+    ).scalars()
+    return sorted(date.fromisoformat(day) for day in rows)
+
+
+def _to_record_batch(rows) -> pa.RecordBatch:
+    ids, sensor_ids, values, timestamps = zip(*rows)
+    return pa.record_batch([
+        pa.array(ids, pa.int64()),
+        pa.array(sensor_ids, pa.int32()),
+        pa.array(values, pa.float64()),
+        pa.array(timestamps, pa.string()).cast(pa.timestamp("us")).cast(SCHEMA.field("timestamp").type),
+    ], schema=SCHEMA)
+
+
+@contextmanager
+def read_snapshot(connection):
+    """
+    Run the enclosed statements in one explicit read transaction.
+
+    pysqlite does not begin a transaction for SELECT statements, so without
+    this each statement would see the database as of its own start. The
+    snapshot is taken at the first read and held until the block ends; in
+    rollback journal mode writers wait for it, in WAL mode they do not.
+    """
+    connection.exec_driver_sql("BEGIN")
+    try:
+        yield
+    finally:
+        connection.exec_driver_sql("COMMIT")
+
+
+def export_day(connection, day: date, output_dir, chunk_rows: int) -> dict:
+    """
+    Write one Parquet file per metric type for a day and verify its row counts.
+
+    The counts and the rows are read from the same snapshot, so readings
+    inserted while the day is exported cannot make a correct export fail
+    verification.
+
+    Returns:
+        dict: Rows written per metric type
+
+    Raises:
+        ExportVerificationError: If a file does not match the source row count
+    """
+    start, end = _day_bounds(day)
+    written = {}
+    with read_snapshot(connection):
+        source_counts = dict(connection.exec_driver_sql(
+            "SELECT metric_type, COUNT(*) FROM metrics WHERE timestamp >= ? AND timestamp < ? GROUP BY metric_type",
+            (start, end)
+        ).all())
+
+        for metric_type, expected in source_counts.items():
+            directory = Path(output_dir) / f"date={day.isoformat()}" / f"metric_type={metric_type}"
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / "part-0.parquet"
+            temporary = directory / "part-0.parquet.tmp"
+
+            result = connection.exec_driver_sql(
+                "SELECT id, sensor_id, value, timestamp FROM metrics "
+                "WHERE timestamp >= ? AND timestamp < ? AND metric_type = ? ORDER BY timestamp, id",
+                (start, end, metric_type)
+            )
+            with pq.ParquetWriter(temporary, SCHEMA, compression="zstd", write_statistics=True,
+                                  use_dictionary=["sensor_id"]) as writer:
+                while rows := result.fetchmany(chunk_rows):
+                    writer.write_batch(_to_record_batch(rows), row_group_size=chunk_rows)
+
+            exported = pq.ParquetFile(temporary).metadata.num_rows
+            if exported != expected:
+                os.unlink(temporary)
+                raise ExportVerificationError(
+                    f"{day} {metric_type}: exported {exported} rows, source has {expected}"
+                )
+            os.replace(temporary, path)
+            written[metric_type] = exported
+    return written
+
+
+def export_metrics(target_engine, output_dir, chunk_rows: int = None, full: bool = False,
+                   until: date = None) -> ExportReport:
+    """
+    Export every complete day not exported yet, and re-export days that were backfilled.
+
+    Args:
+        target_engine: Engine of the database to export
+        output_dir: Root directory of the partitioned dataset
+        chunk_rows (int): Rows fetched and written per row group
+        full (bool): Ignore the recorded state and export every day again
+        until (date): First day not to export (defaults to today in UTC)
+
+    Returns:
+        ExportReport: Days exported, number of files and rows written and duration
+    """
+    chunk_rows = chunk_rows or EXPORT_CHUNK_ROWS
+    until = until or utc_now().date()
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+
+    state = ExportState(None, 0) if full else read_state(output_dir)
+    exported_days, files, rows = [], 0, 0
+    with target_engine.connect() as connection:
+        high_water = connection.exec_driver_sql("SELECT MAX(id) FROM metrics").scalar() or 0
+        backfilled = backfilled_days(connection, state)
+        last_day = state.last_day
+        for day in sorted(set(backfilled) | set(days_to_export(connection, state.last_day, until))):
+            written = export_day(connection, day, output_dir, chunk_rows)
+            # The id mark only moves once every backfilled day has been rewritten
+            last_day = max(day, last_day or day)
+            write_state(output_dir, ExportState(last_day, state.last_metric_id))
+            exported_days.append(day.isoformat())
+            files += len(written)
+            rows += sum(written.values())
+            logger.info("Exported %d metrics for %s %s", sum(written.values()), day, written)
+        write_state(output_dir, ExportState(last_day, high_water))
+        if backfilled:
+            logger.info("Re-exported %d days with backfilled readings", len(backfilled))
+
+    report = ExportReport(exported_days, files, rows, time.perf_counter() - started)
+    logger.info("Export wrote %d rows in %d files for %d days in %.2f s",
+                report.rows, report.files, len(report.days), report.duration)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export metrics to a partitioned Parquet dataset.")
+    parser.add_argument("--output", default=str(EXPORT_DIR), help="Root directory of the dataset")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS, help="Rows per row group")
+    parser.add_argument("--full", action="store_true", help="Export every day again, ignoring previous runs")
+    parser.add_argument("--until", type=date.fromisoformat, default=None,
+                        help="First day not to export (defaults to today, which is still incomplete)")
+    args = parser.parse_args(argv)
+
+    try:
+        report = export_metrics(engine, args.output, args.chunk_rows, args.full, args.until)
+    except (SQLAlchemyError, OSError, ExportVerificationError) as e:
+        logger.error("Export failed: %s", e)
+        print("Export failed. Check the logs for details.")
+        return 1
+
+    print(f"Exported {report.rows} metrics in {report.files} files for {len(report.days)} days "
+          f"in {report.duration:.2f} s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
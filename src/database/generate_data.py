@@ -0,0 +1,209 @@
+"""
+Synthetic dataset generator for load and capacity testing.
+
+Generates N sensors x M days of readings at a fixed sampling interval. Values
+follow a diurnal curve inside the get_sample_metric_ranges bounds, with noise
+from a seeded NumPy generator so runs are reproducible. Rows are produced as
+NumPy arrays in chunks and written with bulk executemany inserts.
+
+Usage:
+    python -m src.database.generate_data --sensors 100 --days 30 --interval-minutes 5 --seed 42
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+# Add the parent directory to sys.path to allow importing from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, parent_dir)
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database.database import Base, engine
+from src.models.models import Metric, Sensor
+from src.utils.helpers import get_sample_metric_ranges, iter_epoch_chunks
+from src.utils.ingest import conflict_clause
+from src.utils.latest_metrics import rebuild_latest_metrics
+from src.utils.logging_config import logger
+
+SECONDS_PER_DAY = 86400
+
+# Time of the last reading unless another is given, so the same seed always produces the same rows
+DEFAULT_END_DATE = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+# Shape of each metric's daily cycle: (diurnal amplitude, peak hour, noise),
+# amplitude and noise as fractions of the half-range of the metric
+DIURNAL_PROFILES = {
+    "temperature": (0.6, 15.0, 0.08),
+    "humidity": (0.5, 4.0, 0.1),
+    "wind_speed": (0.3, 14.0, 0.25),
+    "pressure": (0.1, 10.0, 0.05),
+}
+
+# Probability of a reading falling while it is raining
+RAIN_PROBABILITY = 0.1
+
+# Followed by ingestion's conflict clause, so duplicates are resolved the same way when INGEST_DEDUP is set
+INSERT_METRICS_SQL = (
+    f"INSERT INTO {Metric.__tablename__} (sensor_id, metric_type, value, timestamp) VALUES (?, ?, ?, ?)"
+)
+
+# Settings that speed up the load, restored afterwards
+BULK_LOAD_PRAGMAS = {"synchronous": "OFF", "cache_size": "-262144"}
+
+
+def generate_metric_values(metric_type, seconds_of_day, rng):
+    """
+    Generate readings for one metric type following a diurnal curve.
+
+    Args:
+        metric_type (str): Metric type, a key of get_sample_metric_ranges
+        seconds_of_day (np.ndarray): Seconds since midnight UTC of each reading
+        rng (np.random.Generator): Seeded random generator
+
+    Returns:
+        np.ndarray: Values clipped to the metric's sample range
+    """
+    low, high = get_sample_metric_ranges()[metric_type]
+    mid = (low + high) / 2
+    half_range = (high - low) / 2
+
+    if metric_type == "rainfall":
+        raining = rng.random(seconds_of_day.size) < RAIN_PROBABILITY
+        return np.where(raining, rng.exponential(half_range / 3, seconds_of_day.size), 0.0).clip(low, high)
+
+    amplitude, peak_hour, noise = DIURNAL_PROFILES[metric_type]
+    phase = 2 * np.pi * (seconds_of_day / SECONDS_PER_DAY - peak_hour / 24)
+    values = mid + half_range * (amplitude * np.cos(phase) + noise * rng.standard_normal(seconds_of_day.size))
+    return values.clip(low, high)
+
+
+def format_timestamps(epoch_seconds):
+    """Format epoch seconds the way SQLAlchemy stores DateTime columns in SQLite."""
+    text = np.datetime_as_string(epoch_seconds.astype("datetime64[s]").astype("datetime64[us]"), unit="us")
+    return np.char.replace(text, "T", " ")
+
+
+def generate_dataset(
+        target_engine, sensors, days, interval_minutes, seed, end_date=None, chunk_rows=500000, defer_indexes=True
+):
+    """
+    Generate and insert a synthetic dataset.
+
+    Args:
+        target_engine: Engine of the database to fill
+        sensors (int): Number of sensors to create
+        days (int): Number of days of history per sensor
+        interval_minutes (float): Minutes between readings of a sensor
+        seed (int): Seed of the random generator
+        end_date (datetime): Time of the last reading (defaults to DEFAULT_END_DATE)
+        chunk_rows (int): Approximate number of rows generated per insert batch
+        defer_indexes (bool): Drop the metrics indexes during the load and rebuild them afterwards
+
+    Returns:
+        int: Number of metric rows inserted
+
+    Raises:
+        ValueError: If the interval is shorter than a second
+    """
+    end_date = end_date or DEFAULT_END_DATE
+    interval = int(interval_minutes * 60)
+    if interval <= 0:
+        raise ValueError("interval_minutes must be at least one second")
+    end_epoch = int(end_date.timestamp()) // interval * interval
+    readings = days * SECONDS_PER_DAY // interval
+    start_epoch = end_epoch - (readings - 1) * interval
+
+    metric_types = list(get_sample_metric_ranges())
+    timestamps_per_chunk = max(1, chunk_rows // len(metric_types))
+    sensor_seeds = np.random.SeedSequence(seed).spawn(sensors)
+    first_reading = datetime.fromtimestamp(start_epoch, timezone.utc)
+    last_reading = datetime.fromtimestamp(end_epoch, timezone.utc)
+
+    # Building the secondary indexes once after the load is much faster than
+    # maintaining them row by row
+    deferred_indexes = list(Metric.__table__.indexes) if defer_indexes else []
+
+    inserted = 0
+    statement = INSERT_METRICS_SQL + conflict_clause()
+    with target_engine.connect() as connection:
+        previous = {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in BULK_LOAD_PRAGMAS}
+        for name, value in BULK_LOAD_PRAGMAS.items():
+            connection.exec_driver_sql(f"PRAGMA {name} = {value}")
+        connection.commit()
+        try:
+            with connection.begin():
+                for index in deferred_indexes:
+                    index.drop(connection, checkfirst=True)
+
+                sensor_ids = connection.execute(
+                    insert(Sensor).returning(Sensor.id, sort_by_parameter_order=True),
+                    [
+                        {"name": f"Synthetic Station {i + 1}", "location": f"Synthetic Location {i + 1}",
+                         "created_at": first_reading}
+                        for i in range(sensors)
+                    ]
+                ).scalars().all()
+
+                for sensor_id, sensor_seed in zip(sensor_ids, sensor_seeds):
+                    rng = np.random.default_rng(sensor_seed)
+                    for epochs in iter_epoch_chunks(first_reading, last_reading, interval, timestamps_per_chunk):
+                        count = epochs.size
+                        timestamps = format_timestamps(epochs).tolist()
+                        seconds_of_day = epochs % SECONDS_PER_DAY
+
+                        rows = []
+                        for metric_type in metric_types:
+                            values = generate_metric_values(metric_type, seconds_of_day, rng).tolist()
+                            rows.extend(zip([sensor_id] * count, [metric_type] * count, values, timestamps))
+
+                        # Readings skipped as duplicates are not counted
+                        inserted += connection.exec_driver_sql(statement, rows).rowcount
+
+                for index in deferred_indexes:
+                    index.create(connection)
+                rebuild_latest_metrics(connection)
+        finally:
+            # The connection goes back to the pool, so later users must get the usual settings
+            for name, value in previous.items():
+                connection.exec_driver_sql(f"PRAGMA {name} = {int(value)}")
+            connection.commit()
+
+    return inserted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic weather dataset.")
+    parser.add_argument("--sensors", type=int, default=10, help="Number of sensors to create")
+    parser.add_argument("--days", type=int, default=7, help="Days of history per sensor")
+    parser.add_argument("--interval-minutes", type=float, default=60, help="Minutes between readings")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for reproducible datasets")
+    parser.add_argument("--end-date", type=datetime.fromisoformat, default=None,
+                        help=f"ISO-8601 time of the last reading (defaults to {DEFAULT_END_DATE.isoformat()})")
+    args = parser.parse_args(argv)
+
+    if args.end_date is not None and args.end_date.tzinfo is None:
+        args.end_date = args.end_date.replace(tzinfo=timezone.utc)
+
+    try:
+        Base.metadata.create_all(bind=engine)
+        started = time.perf_counter()
+        inserted = generate_dataset(engine, args.sensors, args.days, args.interval_minutes, args.seed, args.end_date)
+        elapsed = time.perf_counter() - started
+    except (SQLAlchemyError, ValueError) as e:
+        logger.error("Error generating dataset: %s", e)
+        print("Dataset generation failed. Check the logs for details.")
+        return 1
+
+    logger.info("Generated %d metrics for %d sensors in %.1f s", inserted, args.sensors, elapsed)
+    print(f"Generated {inserted} metrics for {args.sensors} sensors in {elapsed:.1f} s "
+          f"({inserted / max(elapsed, 1e-9):,.0f} rows/s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,11 @@
 """
 Database initialization script that can be run independently to ensure
 the database and tables are properly created before starting the API.
+
+The schema version is recorded in SQLite's user_version header field. At
+startup the API only reads that field and does the full initialization when
+it differs from SCHEMA_VERSION, instead of reflecting every table on each
+worker start.
 """
 import os
 import sys
@@ -11,17 +16,68 @@ sys.path.insert(0, parent_dir)
 
 from sqlalchemy.exc import SQLAlchemyError
 from src.database.database import Base, engine
+from src.database.dedup import MissingReadingIndexError, ensure_reading_index, reading_index_exists
+from src.utils.ingest import INGEST_DEDUP
+from src.utils.latest_metrics import rebuild_latest_metrics
 from src.utils.logging_config import logger
 
+# Bump whenever tables or indexes change, so existing databases are upgraded at the next startup
+SCHEMA_VERSION = 1
+
+
+def upgrade_schema(connection) -> None:
+    """Bring indexes and derived tables up to date once the tables exist, and record the schema version."""
+    # Deduplicated ingestion needs the unique reading index. Creating it removes existing
+    # duplicates with a full table scan, so it only happens here, once per upgrade
+    if INGEST_DEDUP != "off":
+        ensure_reading_index(connection)
+    # Backfill the latest readings table for databases created before it existed
+    rebuild_latest_metrics(connection)
+    connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def ensure_schema(target_engine) -> bool:
+    """
+    Bring the database up to SCHEMA_VERSION if it is not there yet.
+
+    Args:
+        target_engine: Engine of the database to check
+
+    Returns:
+        bool: True if the schema had to be created or upgraded
+
+    Raises:
+        MissingReadingIndexError: If INGEST_DEDUP is enabled on an up-to-date database without the
+            unique reading index, which python -m src.database.dedup creates
+    """
+    with target_engine.begin() as connection:
+        if connection.exec_driver_sql("PRAGMA user_version").scalar() == SCHEMA_VERSION:
+            # Inserts with ON CONFLICT fail without the index, so refuse to start rather than
+            # deleting duplicates from a possibly large table on every boot
+            if INGEST_DEDUP != "off" and not reading_index_exists(connection):
+                logger.error("INGEST_DEDUP=%s needs the unique reading index; run python -m src.database.dedup",
+                             INGEST_DEDUP)
+                raise MissingReadingIndexError(
+                    "The unique reading index is missing; run python -m src.database.dedup"
+                )
+            return False
+        logger.info("Upgrading database schema to version %d...", SCHEMA_VERSION)
+        Base.metadata.create_all(bind=connection)
+        upgrade_schema(connection)
+        return True
+
+
 def init_database():
     """Initialize the database by creating all tables."""
     try:
         logger.info("Starting database initialization...")
         Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            upgrade_schema(connection)
         logger.info("Database tables created successfully.")
         return True
     except SQLAlchemyError as e:
-        logger.error(f"Error initializing database: {str(e)}")
+        logger.error("Error initializing database: %s", e)
         return False
 
 if __name__ == "__main__":
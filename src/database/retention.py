@@ -0,0 +1,261 @@
+"""
+Retention policy engine for the metrics table.
+
+Rules map metric types to a maximum age in days, for example
+RETENTION_RULES="*=90,rainfall=365,pressure=forever" keeps rainfall for a
+year, pressure forever and everything else for 90 days. Expired rows are
+deleted in bounded chunks, each in its own short transaction, so the SQLite
+write lock is never held for long. Freed pages are then returned to the file
+system with incremental vacuum in small steps instead of a blocking VACUUM.
+
+Run once from the command line:
+    python -m src.database.retention
+or periodically in the API by setting RETENTION_INTERVAL_MINUTES.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+# Add the parent directory to sys.path to allow importing from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, parent_dir)
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database.database import engine
+from src.models.models import IdempotencyKey, Metric
+from src.utils.datetime_helper import utc_now
+from src.utils.instrumentation import registry
+from src.utils.latest_metrics import repair_latest_metrics
+from src.utils.logging_config import logger
+
+DEFAULT_RULE = "*"
+
+registry.describe("retention_rows_deleted_total", "Metrics deleted by the retention job, by rule.")
+registry.describe("retention_bytes_reclaimed_total", "Bytes returned to the file system by incremental vacuum.")
+registry.describe("retention_runs_total", "Retention runs completed.")
+registry.describe("retention_idempotency_keys_deleted_total", "Expired idempotency keys deleted.")
+
+# Retention rules as comma-separated metric_type=days pairs; "*" is the default
+RETENTION_RULES = os.getenv("RETENTION_RULES", "*=90")
+# Minutes between background retention runs; 0 disables the job
+RETENTION_INTERVAL_MINUTES = float(os.getenv("RETENTION_INTERVAL_MINUTES", "0"))
+# Rows deleted per transaction
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "5000"))
+# Hours a batch upload's idempotency key is remembered
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+# Pages released per incremental vacuum step
+VACUUM_PAGES_PER_STEP = 1000
+
+
+class RetentionReport(NamedTuple):
+    """Outcome of one retention run."""
+    rows_deleted: Dict[str, int]
+    bytes_reclaimed: int
+    duration: float
+
+
+def parse_retention_rules(text: str) -> Dict[str, Optional[int]]:
+    """
+    Parse retention rules into a mapping of metric type to maximum age in days.
+
+    A value of "forever" (or "none") keeps the rows indefinitely, represented by None.
+
+    Raises:
+        ValueError: If a rule is malformed or its day count is negative
+    """
+    rules = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        metric_type, separator, days = item.partition("=")
+        if not separator or not metric_type.strip():
+            raise ValueError(f"Invalid retention rule: {item}")
+        days = days.strip().lower()
+        if days in ("forever", "none"):
+            rules[metric_type.strip()] = None
+            continue
+        try:
+            days = int(days)
+        except ValueError:
+            raise ValueError(f"Invalid retention period in rule: {item}") from None
+        if days < 0:
+            raise ValueError(f"Retention period must not be negative: {item}")
+        rules[metric_type.strip()] = days
+    return rules
+
+
+def delete_expired_metrics(target_engine, rules: Dict[str, Optional[int]], chunk_size: int, now=None) -> Dict[str, int]:
+    """
+    Delete metrics older than their rule allows, chunk_size rows per transaction.
+
+    latest_metrics rows pointing at deleted readings are repaired in the same
+    transaction, so they never refer to rows that are gone.
+
+    Returns:
+        Dict[str, int]: Rows deleted per rule
+    """
+    now = now or utc_now()
+    explicit_types = [metric_type for metric_type in rules if metric_type != DEFAULT_RULE]
+
+    deleted = {}
+    for metric_type, days in rules.items():
+        if days is None:
+            continue
+
+        condition = Metric.timestamp < now - timedelta(days=days)
+        if metric_type == DEFAULT_RULE:
+            if explicit_types:
+                condition = condition & Metric.metric_type.not_in(explicit_types)
+        else:
+            condition = condition & (Metric.metric_type == metric_type)
+
+        chunk = select(Metric.id).where(condition).limit(chunk_size).scalar_subquery()
+        statement = delete(Metric).where(Metric.id.in_(chunk))
+
+        deleted[metric_type] = 0
+        while True:
+            with target_engine.begin() as connection:
+                count = connection.execute(statement).rowcount
+                if count:
+                    repair_latest_metrics(connection)
+            deleted[metric_type] += count
+            if count < chunk_size:
+                break
+    return deleted
+
+
+def delete_expired_idempotency_keys(target_engine, now=None) -> int:
+    """Forget idempotency keys older than IDEMPOTENCY_KEY_TTL_HOURS."""
+    cutoff = (now or utc_now()) - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    with target_engine.begin() as connection:
+        return connection.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)).rowcount
+
+
+def incremental_vacuum(target_engine, pages_per_step: int = VACUUM_PAGES_PER_STEP) -> int:
+    """
+    Release free pages to the file system in small steps.
+
+    Does nothing unless the database uses auto_vacuum=INCREMENTAL.
+
+    Returns:
+        int: Number of bytes reclaimed
+    """
+    with target_engine.connect() as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return 0
+        page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+        pages_before = connection.exec_driver_sql("PRAGMA page_count").scalar()
+
+        # Each step is its own short write transaction. executescript runs the
+        # pragma to completion, while a plain execute frees a single page.
+        dbapi_connection = connection.connection.dbapi_connection
+        while connection.exec_driver_sql("PRAGMA freelist_count").scalar():
+            connection.commit()
+            dbapi_connection.executescript(f"PRAGMA incremental_vacuum({int(pages_per_step)});")
+
+        pages_after = connection.exec_driver_sql("PRAGMA page_count").scalar()
+    return (pages_before - pages_after) * page_size
+
+
+def enable_incremental_vacuum(target_engine) -> None:
+    """Convert an existing database to auto_vacuum=INCREMENTAL with a one-off full VACUUM."""
+    with target_engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+
+
+def apply_retention(target_engine, rules=None, chunk_size: int = None, now=None) -> RetentionReport:
+    """Delete expired metrics and reclaim their space, reporting what was done."""
+    rules = parse_retention_rules(RETENTION_RULES) if rules is None else rules
+    started = time.perf_counter()
+
+    deleted = delete_expired_metrics(target_engine, rules, chunk_size or RETENTION_CHUNK_SIZE, now)
+    registry.inc("retention_idempotency_keys_deleted_total", amount=delete_expired_idempotency_keys(target_engine, now))
+    reclaimed = incremental_vacuum(target_engine) if any(deleted.values()) else 0
+
+    report = RetentionReport(deleted, reclaimed, time.perf_counter() - started)
+    for metric_type, count in deleted.items():
+        registry.inc("retention_rows_deleted_total", (("rule", metric_type),), count)
+    registry.inc("retention_bytes_reclaimed_total", amount=reclaimed)
+    registry.inc("retention_runs_total")
+    logger.info(
+        "Retention run deleted %d rows %s and reclaimed %d bytes in %.2f s",
+        sum(deleted.values()), deleted, reclaimed, report.duration
+    )
+    return report
+
+
+class RetentionJob:
+    """Background thread applying the retention rules at a fixed interval."""
+
+    def __init__(self, target_engine, interval_minutes: float, rules: str = None):
+        self.engine = target_engine
+        self.interval = interval_minutes * 60
+        self.rules_text = RETENTION_RULES if rules is None else rules
+        self.rules: Optional[Dict[str, Optional[int]]] = None
+        self.reports: List[RetentionReport] = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """
+        Start the background thread if an interval is configured.
+
+        Raises:
+            ValueError: If the retention rules are invalid, so bad configuration fails at startup
+        """
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self.rules = parse_retention_rules(self.rules_text)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention-job", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.reports = (self.reports + [apply_retention(self.engine, self.rules)])[-10:]
+            # incremental_vacuum runs on the driver connection, so its errors are not wrapped by SQLAlchemy
+            except (SQLAlchemyError, sqlite3.Error) as e:
+                logger.error("Retention run failed: %s", e)
+
+
+retention_job = RetentionJob(engine, RETENTION_INTERVAL_MINUTES)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete metrics past their retention period.")
+    parser.add_argument("--rules", default=RETENTION_RULES, help="Rules such as '*=90,rainfall=forever'")
+    parser.add_argument("--chunk-size", type=int, default=RETENTION_CHUNK_SIZE)
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Convert the database to auto_vacuum=INCREMENTAL first (runs a full VACUUM once)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.enable_incremental_vacuum:
+            enable_incremental_vacuum(engine)
+        report = apply_retention(engine, parse_retention_rules(args.rules), args.chunk_size)
+    except (SQLAlchemyError, sqlite3.Error, ValueError) as e:
+        logger.error("Retention run failed: %s", e)
+        print("Retention run failed. Check the logs for details.")
+        return 1
+
+    print(f"Deleted {sum(report.rows_deleted.values())} rows {report.rows_deleted}, "
+          f"reclaimed {report.bytes_reclaimed} bytes in {report.duration:.2f} s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,64 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
 
-from src.database.database import Base, engine
-from src.routers import sensors, metrics, queries, test
-from src.utils.logging_config import logger
+from src.database.database import engine
+from src.database.init_db import ensure_schema
+from src.database.retention import retention_job
+from src.routers import sensors, metrics, queries, test, internal
+from src.utils.admission import AdmissionControlMiddleware
+from src.utils.compression import CompressionMiddleware
+from src.utils.instrumentation import RequestMetricsMiddleware
+from src.utils.logging_config import logger, setup_logger
+from src.utils.profiling import ProfilingMiddleware
+from src.utils.rate_limit import RateLimitMiddleware
+from src.utils.sensor_cache import sensor_cache
+
+
+def prepare_database():
+    """Create or upgrade the schema if needed and load the known sensor ids."""
+    try:
+        if ensure_schema(engine):
+            logger.info("Database schema created or upgraded successfully")
+    except SQLAlchemyError as e:
+        logger.error("Failed to create database tables: %s", e)
+        # Application can still start, but will log the error
+    try:
+        # Load the known sensor ids so ingestion does not have to look them up
+        with engine.connect() as connection:
+            logger.info("Cached %d sensor ids", sensor_cache(engine).warm(connection))
+    except SQLAlchemyError as e:
+        logger.error("Failed to warm the sensor cache: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing touches the file system or the database on import, so workers,
+    # test collection and tooling that only import the app start quickly
+    setup_logger()
+    prepare_database()
+    # Enforce the retention rules in the background when RETENTION_INTERVAL_MINUTES is set
+    retention_job.start()
+    try:
+        yield
+    finally:
+        retention_job.stop()
+
 
-app = FastAPI(title="Weather Sensor API")
+app = FastAPI(title="Weather Sensor API", lifespan=lifespan)
+
+# Bound in-flight ingestion and query requests, rejecting with 503 and Retry-After once
+# the expected wait is too long. Added first so CORS headers and request metrics cover rejections.
+app.add_middleware(AdmissionControlMiddleware)
+
+# Per-client token buckets, checked before a request can take an admission slot
+app.add_middleware(RateLimitMiddleware)
+
+# Compress large and streamed responses with the best encoding the client accepts
+app.add_middleware(CompressionMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -18,30 +69,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route latency and SQL statement counts, exposed at /internal/stats/
+app.add_middleware(RequestMetricsMiddleware)
+
+# Profile requests carrying the X-Admin-Token header or picked by the sampler
+app.add_middleware(ProfilingMiddleware)
+
 # Global exception handler for SQLAlchemy errors
 @app.exception_handler(SQLAlchemyError)
 async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError):
-    logger.error(f"Database error: {str(exc)}")
+    logger.error("Database error: %s", exc)
     return JSONResponse(
         status_code=500,
         content={"detail": "An error occurred with the database connection. Please try again later."},
     )
 
-# Initialize the database
-try:
-    logger.info("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-except SQLAlchemyError as e:
-    logger.error(f"Failed to create database tables: {str(e)}")
-    # Application can still start, but will log the error
-
 # FastAPI typically likes routers in main file , i might have moved to routers/init.
 # Include routers
 app.include_router(sensors.router)
 app.include_router(metrics.router)
 app.include_router(queries.router)
 app.include_router(test.router)
+app.include_router(internal.router)
 
 # Root endpoint
 @app.get("/")
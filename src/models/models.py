@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text
 from sqlalchemy.orm import relationship
 
 from src.database.database import Base
@@ -27,4 +27,23 @@ class Metric(Base):
     timestamp = Column(DateTime, default=utc_now, index=True)
 
     # Relationship to sensor
-    sensor = relationship("Sensor", back_populates="metrics")
\ No newline at end of file
+    sensor = relationship("Sensor", back_populates="metrics")
+
+class LatestMetric(Base):
+    """Most recent reading per sensor and metric type, upserted on every ingest."""
+    __tablename__ = "latest_metrics"
+
+    sensor_id = Column(Integer, ForeignKey("sensors.id"), primary_key=True)
+    metric_type = Column(String, primary_key=True)
+    metric_id = Column(Integer, ForeignKey("metrics.id"))
+    value = Column(Float)
+    timestamp = Column(DateTime, index=True)
+
+
+class IdempotencyKey(Base):
+    """Response of a batch upload, replayed when the same key is sent again."""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    response = Column(Text)
+    created_at = Column(DateTime, default=utc_now, index=True)
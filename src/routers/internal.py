@@ -0,0 +1,48 @@
+import sqlite3
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from src.database.database import get_db
+from src.routers.queries import query_flights, weekly_average_flights
+from src.utils.admin import require_admin
+from src.utils.instrumentation import registry
+from src.utils.logging_config import logger
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"]
+)
+
+registry.describe("query_coalesced_total", "Requests served by joining an identical in-flight computation.")
+
+
+@router.get("/stats/", response_class=PlainTextResponse)
+def get_stats():
+    """
+    Expose request latency, SQL statement and coalescing metrics in the
+    Prometheus text exposition format.
+    """
+    registry.set_counter("query_coalesced_total", query_flights.coalesced, (("endpoint", "query"),))
+    registry.set_counter(
+        "query_coalesced_total", weekly_average_flights.coalesced, (("endpoint", "weekly_averages"),)
+    )
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.post("/backup/", status_code=201, dependencies=[Depends(require_admin)])
+def create_backup(compress: bool = False, db: Session = Depends(get_db)):
+    """
+    Take a consistent online snapshot of the database into BACKUP_DIR.
+    Pages are copied in throttled steps so ingestion is not blocked.
+    """
+    # Only loaded when a backup is taken, to keep it out of the API's startup
+    from src.database.backup import backup_database, default_backup_path
+
+    try:
+        report = backup_database(db.get_bind(), default_backup_path(compress), compress=compress)
+    except (sqlite3.Error, OSError) as e:
+        logger.error("Backup failed: %s", e)
+        raise HTTPException(status_code=500, detail="The backup could not be completed.")
+    return report._asdict()
@@ -1,11 +1,18 @@
+import asyncio
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from src.database.database import get_db
-from src.models.models import Metric, Sensor
-from src.schemas.schemas import MetricCreate, MetricResponse
+from src.models.models import Metric
+from src.schemas.schemas import MetricCreate, MetricResponse, MetricType
+from src.utils import ingest
+from src.utils.logging_config import logger
+from src.utils.sensor_cache import sensor_cache
+from src.utils.subscriptions import broker
 
 router = APIRouter(
     prefix="/metrics",
@@ -15,16 +22,12 @@ router = APIRouter(
 
 @router.post("/", response_model=MetricResponse, status_code=201)
 def create_metric(metric: MetricCreate, db: Session = Depends(get_db)):
-    # Check if sensor exists
-    sensor = db.query(Sensor).filter(Sensor.id == metric.sensor_id).first()
-    if sensor is None:
+    # Known sensors are answered from the cache, so a valid reading costs the metrics INSERT
+    # and the latest_metrics upsert, with no sensor lookup
+    if not sensor_cache(db).exists(db, metric.sensor_id):
         raise HTTPException(status_code=404, detail="Sensor not found")
 
-    db_metric = Metric(**metric.model_dump())
-    db.add(db_metric)
-    db.commit()
-    db.refresh(db_metric)
-    return db_metric
+    return ingest.store_metric(db, metric)
 
 
 @router.get("/", response_model=List[MetricResponse])
@@ -38,4 +41,162 @@ def get_metrics(
     if sensor_id:
         query = query.filter(Metric.sensor_id == sensor_id)
     metrics = query.offset(skip).limit(limit).all()
-    return metrics
\ No newline at end of file
+    return metrics
+
+@router.websocket("/subscribe/")
+async def subscribe_metrics(
+        websocket: WebSocket,
+        sensor_ids: Optional[List[int]] = Query(default=None),
+        metric_types: Optional[List[MetricType]] = Query(default=None),
+        readings: bool = True,
+        aggregate_seconds: Optional[float] = Query(default=None, gt=0)
+):
+    """
+    Stream new readings and periodic aggregates for the selected sensors and metric types.
+
+    Readings are sent as they are ingested unless readings=false; aggregates of
+    the readings received in each interval are sent every aggregate_seconds.
+    Clients that fall too far behind are disconnected with code 1013.
+    """
+    await websocket.accept()
+    subscription = broker.subscribe(
+        sensor_ids, [metric_type.value for metric_type in metric_types or []], readings
+    )
+    sender = asyncio.create_task(subscription.stream(websocket.send_text, aggregate_seconds))
+    receiver = asyncio.create_task(_wait_for_disconnect(websocket))
+    try:
+        done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        if sender in done and sender.exception() is None:
+            await websocket.close(code=1013, reason="Slow consumer")
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        broker.unsubscribe(subscription)
+
+
+async def _wait_for_disconnect(websocket: WebSocket):
+    # Subscribers only listen, so anything they send is ignored
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@router.post("/batch/", status_code=201)
+async def create_metrics_batch(
+        request: Request,
+        response: Response,
+        idempotency_key: Optional[str] = Header(default=None, max_length=255),
+        db: Session = Depends(get_db)
+):
+    """
+    Record many readings in one request.
+
+    The body is either a JSON list of readings or, with the
+    application/x-weather-metrics content type, packed binary records (see
+    src/utils/ingest.py for the layout). Bodies over METRICS_BATCH_MAX_BYTES
+    are rejected with 413. Readings that cannot be stored are listed by index
+    in the response. Uploads retried with the same Idempotency-Key header are
+    stored once and answered with the original response.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in (ingest.BINARY_CONTENT_TYPE, "application/json"):
+        raise HTTPException(status_code=415, detail="Unsupported content type")
+    body = await _read_body(request, ingest.METRICS_BATCH_MAX_BYTES)
+
+    try:
+        # Parsing, validation and decoding are CPU-bound, so they stay off the event loop with the insert
+        body, replayed = await run_in_threadpool(_store_upload, db, content_type, body, idempotency_key)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("Error storing metric batch: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred with the database connection. Please try again later."
+        )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return body
+
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    """Read a request body, rejecting it with 413 as soon as it is known to exceed limit bytes."""
+    too_large = HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+        raise too_large
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _store_upload(db: Session, content_type: str, body: bytes, idempotency_key: Optional[str]):
+    batch = ingest.IngestBatch()
+    if content_type == ingest.BINARY_CONTENT_TYPE:
+        batch.add_binary(0, body)
+    else:
+        batch.add_json(0, body)
+    return ingest.store_batch(db, batch, idempotency_key)
+
+
+@router.websocket("/ingest/")
+async def ingest_metrics(websocket: WebSocket, db: Session = Depends(get_db)):
+    """
+    Accept a stream of readings over a long-lived connection.
+
+    Each text frame holds one reading or a JSON list of readings, and each
+    binary frame holds packed records. Readings are buffered and written in
+    batches of up to INGEST_BATCH_SIZE, at most INGEST_FLUSH_MS after they
+    arrive, and every batch is acknowledged with the number of frames it
+    covers and any readings that were rejected. Readings are only guaranteed
+    to be stored once acknowledged.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    frames = 0
+    batch = ingest.IngestBatch()
+    deadline = None
+
+    async def flush():
+        nonlocal batch, deadline
+        try:
+            accepted, rejected = await run_in_threadpool(batch.store, db)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error("Error storing streamed metrics: %s", e)
+            await websocket.send_json({
+                "type": "error",
+                "detail": "An error occurred with the database connection. Please try again later.",
+                "frames": frames,
+            })
+            raise
+        await websocket.send_json({"type": "ack", "frames": frames, "accepted": accepted, "rejected": rejected})
+        batch, deadline = ingest.IngestBatch(), None
+
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                message = await asyncio.wait_for(websocket.receive(), timeout)
+            except asyncio.TimeoutError:
+                await flush()
+                continue
+            if message["type"] == "websocket.disconnect":
+                # Pending readings were never acknowledged, so the gateway sends them again
+                return
+
+            frames += 1
+            if message.get("bytes") is not None:
+                batch.add_binary(frames, message["bytes"])
+            else:
+                batch.add_json(frames, message.get("text") or "")
+            if deadline is None:
+                deadline = loop.time() + ingest.INGEST_FLUSH_MS / 1000
+            if len(batch) >= ingest.INGEST_BATCH_SIZE:
+                await flush()
+    except SQLAlchemyError:
+        await websocket.close(code=1011)
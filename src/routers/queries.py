@@ -1,6 +1,6 @@
 from typing import List, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
@@ -12,17 +12,45 @@ from src.schemas.schemas import (
     MultiSensorQueryResult,
     MetricType
 )
+from src.utils import parallel_query
 from src.utils.datetime_helper import get_date_range
 from src.utils.helpers import get_statistic_query, create_query_result_object
 from src.utils.logging_config import logger
+from src.utils.query_planner import QUERY_BATCH_MAX_QUERIES, execute_batch
+from src.utils.singleflight import SingleFlight
 
 router = APIRouter(
     tags=["queries"]
 )
 
+# Concurrent identical requests share a single in-flight computation
+query_flights = SingleFlight()
+weekly_average_flights = SingleFlight()
+
+
+def _query_key(query_params: QueryParams):
+    """Normalize query parameters so equivalent queries coalesce."""
+    sensor_ids = tuple(sorted(set(query_params.sensor_ids))) if query_params.sensor_ids else None
+    return (
+        sensor_ids,
+        tuple(query_params.metric_types),
+        query_params.statistic,
+        query_params.start_date,
+        query_params.end_date,
+    )
+
+
 @router.post("/query/", response_model=List[Union[SingleSensorQueryResult, MultiSensorQueryResult]])
 def query_metrics(query_params: QueryParams, db: Session = Depends(get_db)):
+    return query_flights.do(_query_key(query_params), lambda: _run_query(query_params, db))
+
+
+def _run_query(query_params: QueryParams, db: Session):
     try:
+        # Large explicit ranges can be split into partitions aggregated concurrently
+        if parallel_query.QUERY_PARALLELISM > 1 and query_params.start_date and query_params.end_date:
+            return parallel_query.parallel_query(db.get_bind(), query_params)
+
         query = db.query(Metric)
 
         if query_params.sensor_ids:
@@ -44,7 +72,7 @@ def query_metrics(query_params: QueryParams, db: Session = Depends(get_db)):
                 metric_query = query.filter(Metric.metric_type == metric_type)
 
                 if not metric_query.first():
-                    logger.info(f"No data found for metric type: {metric_type}")
+                    logger.info("No data found for metric type: %s", metric_type)
                     continue
 
                 stat_result = get_statistic_query(metric_query, query_params.statistic)
@@ -66,25 +94,59 @@ def query_metrics(query_params: QueryParams, db: Session = Depends(get_db)):
                     )
                     results.append(query_result)
             except SQLAlchemyError as e:
-                logger.error(f"Error processing metric {metric_type}: {str(e)}")
+                logger.error("Error processing metric %s: %s", metric_type, e)
 
         if not results:
             logger.info("Query returned no results")
 
         return results
     except SQLAlchemyError as e:
-        logger.error(f"Database error in query endpoint: {str(e)}")
+        logger.error("Database error in query endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail="A database error occurred. This might be due to missing tables or connection issues."
         )
 
+@router.post("/query/batch/", response_model=List[List[Union[SingleSensorQueryResult, MultiSensorQueryResult]]])
+def query_metrics_batch(
+        queries: List[QueryParams] = Body(max_length=QUERY_BATCH_MAX_QUERIES),
+        db: Session = Depends(get_db)
+):
+    """
+    Run up to QUERY_BATCH_MAX_QUERIES queries in one request. Queries with
+    overlapping time windows are answered from a single grouped scan; results
+    are returned in request order.
+    """
+    try:
+        return execute_batch(db, queries)
+    except SQLAlchemyError as e:
+        logger.error("Database error in batch query endpoint: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail="A database error occurred. This might be due to missing tables or connection issues."
+        )
+
+@router.get("/query/stats/")
+def get_query_stats():
+    """Report how many requests were served by joining an in-flight computation."""
+    return {
+        "coalesced_queries": query_flights.coalesced,
+        "coalesced_weekly_averages": weekly_average_flights.coalesced,
+    }
+
 @router.get("/sensors/{sensor_id}/weekly-averages/")
 def get_weekly_averages(
         sensor_id: int,
         metrics: List[MetricType] = Query(default=[MetricType.TEMPERATURE, MetricType.HUMIDITY]),
         db: Session = Depends(get_db)
 ):
+    return weekly_average_flights.do(
+        (sensor_id, tuple(metrics)),
+        lambda: _compute_weekly_averages(sensor_id, metrics, db)
+    )
+
+
+def _compute_weekly_averages(sensor_id: int, metrics: List[MetricType], db: Session):
     try:
         sensor = db.query(Sensor).filter(Sensor.id == sensor_id).first()
         if sensor is None:
@@ -125,7 +187,7 @@ def get_weekly_averages(
                     }
                     results.append(result)
             except SQLAlchemyError as e:
-                logger.error(f"Database error in weekly averages for {metric_type}: {str(e)}")
+                logger.error("Database error in weekly averages for %s: %s", metric_type, e)
                 result = {
                     "sensor_ids": [sensor_id],
                     "metric_type": metric_type,
@@ -142,7 +204,7 @@ def get_weekly_averages(
 
         return results
     except SQLAlchemyError as e:
-        logger.error(f"Database error in weekly averages endpoint: {str(e)}")
+        logger.error("Database error in weekly averages endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail="A database error occurred. This might be due to missing tables or connection issues."
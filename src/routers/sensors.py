@@ -1,11 +1,14 @@
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from src.database.database import get_db
 from src.models.models import Sensor
-from src.schemas.schemas import SensorCreate, SensorResponse
+from src.schemas.schemas import LatestMetricResponse, SensorCreate, SensorResponse
+from src.utils.latest_metrics import get_latest_metrics
+from src.utils.sensor_cache import sensor_cache
 
 router = APIRouter(
     prefix="/sensors",
@@ -14,17 +17,35 @@ router = APIRouter(
 
 @router.post("/", response_model=SensorResponse, status_code=201)
 def create_sensor(sensor: SensorCreate, db: Session = Depends(get_db)):
-    db_sensor = Sensor(**sensor.model_dump())
-    db.add(db_sensor)
+    # RETURNING reads back the id and created_at in the INSERT itself, with no refresh SELECT
+    created = db.execute(
+        insert(Sensor).values(**sensor.model_dump())
+        .returning(Sensor.id, Sensor.name, Sensor.location, Sensor.created_at)
+    ).one()
     db.commit()
-    db.refresh(db_sensor)
-    return db_sensor
+    sensor_cache(db).add(created.id)
+    return created
 
 @router.get("/", response_model=List[SensorResponse])
 def get_sensors(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     sensors = db.query(Sensor).offset(skip).limit(limit).all()
     return sensors
 
+@router.get("/latest/", response_model=List[LatestMetricResponse])
+# Registered without the slash too, or /{sensor_id} would try to parse "latest" as an id
+@router.get("/latest", response_model=List[LatestMetricResponse], include_in_schema=False)
+def get_all_latest_metrics(db: Session = Depends(get_db)):
+    """Return the latest reading of every metric type for every sensor."""
+    return get_latest_metrics(db)
+
+@router.get("/{sensor_id}/latest/", response_model=List[LatestMetricResponse])
+def get_sensor_latest_metrics(sensor_id: int, db: Session = Depends(get_db)):
+    """Return the latest reading of every metric type for one sensor."""
+    sensor = db.query(Sensor).filter(Sensor.id == sensor_id).first()
+    if sensor is None:
+        raise HTTPException(status_code=404, detail="Sensor not found")
+    return get_latest_metrics(db, sensor_id)
+
 @router.get("/{sensor_id}", response_model=SensorResponse)
 def get_sensor(sensor_id: int, db: Session = Depends(get_db)):
     sensor = db.query(Sensor).filter(Sensor.id == sensor_id).first()
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from random import uniform
 
 from fastapi import APIRouter, Depends
@@ -6,7 +7,8 @@ from sqlalchemy.orm import Session
 from src.database.database import get_db
 from src.models.models import Sensor, Metric
 from src.utils.datetime_helper import get_date_range
-from src.utils.helpers import get_sample_metric_ranges, generate_timestamp_range
+from src.utils.helpers import get_sample_metric_ranges, iter_timestamp_range
+from src.utils.latest_metrics import upsert_latest_metrics
 
 router = APIRouter(
     prefix="/test",
@@ -31,8 +33,8 @@ def create_sample_data(db: Session = Depends(get_db)):
     # Generate sample metrics for the past week
     start_date, end_date = get_date_range(days_ago=7)
 
-    # Create a series of timestamps (one reading every 3 hours)
-    timestamps = generate_timestamp_range(start_date, end_date, interval_hours=3)
+    # Stream a series of timestamps (one reading every 3 hours)
+    timestamps = iter_timestamp_range(start_date, end_date, timedelta(hours=3))
 
     # Get sample metric ranges
     metric_ranges = get_sample_metric_ranges()
@@ -52,6 +54,8 @@ def create_sample_data(db: Session = Depends(get_db)):
 
     # Add all metrics to the database
     db.add_all(metrics)
+    db.flush()
+    upsert_latest_metrics(db, metrics)
     db.commit()
 
     return {
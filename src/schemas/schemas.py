@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from typing import List, Optional
 
@@ -25,10 +25,28 @@ class SensorCreate(BaseModel):
     location: str
 
 
+# How far ahead of the server clock a reading timestamp may be
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
 class MetricCreate(BaseModel):
     sensor_id: int
     metric_type: MetricType
     value: float
+    # Time of the reading as ISO-8601 or epoch seconds/milliseconds; defaults to the time received
+    timestamp: Optional[datetime] = None
+
+    @field_validator('timestamp')
+    @classmethod
+    def normalize_timestamp(cls, value):
+        if value is None:
+            return None
+
+        # Timestamps are stored as UTC; readings without an offset are taken to be UTC already
+        value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+        if value > datetime.now(timezone.utc) + MAX_CLOCK_SKEW:
+            raise ValueError("timestamp must not be in the future")
+        return value
 
 
 class SensorResponse(BaseModel):
@@ -54,6 +72,17 @@ class MetricResponse(BaseModel):
     }
 
 
+class LatestMetricResponse(BaseModel):
+    sensor_id: int
+    metric_type: str
+    value: float
+    timestamp: datetime
+
+    model_config = {
+        "from_attributes": True
+    }
+
+
 class QueryParams(BaseModel):
     sensor_ids: Optional[List[int]] = None
     metric_types: List[MetricType]
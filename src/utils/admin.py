@@ -0,0 +1,30 @@
+"""
+Access control for administrative endpoints.
+
+ADMIN_TOKEN is the single credential for admin features: the /internal/
+endpoints and header-triggered request profiling both require its value in
+the X-Admin-Token header, and are disabled while it is unset.
+"""
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_HEADER = "X-Admin-Token"
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Return whether a header value matches ADMIN_TOKEN; always False while it is unset."""
+    if not ADMIN_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Dependency rejecting requests without the admin token."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
@@ -0,0 +1,177 @@
+"""
+Admission control for ingestion and query requests.
+
+Under a burst, requests would otherwise pile up in the server and in
+Starlette's threadpool until clients time out and retry, adding to the
+burst. AdmissionControlMiddleware bounds the requests in flight per route
+class. Requests beyond the bound wait in a FIFO queue, and each one is
+handed the slot of a finishing request. The expected wait of a new
+request is estimated from the queue length and a moving average of how long
+requests of that class hold a slot. If the estimate exceeds
+ADMISSION_MAX_WAIT_MS, the request is rejected at once with 503 and a
+Retry-After header instead of being queued. Queued requests that still wait
+longer than that are rejected the same way.
+
+Ingestion (POST under /metrics/) and queries (everything else under
+/metrics/, /sensors/ and /query/) have separate limits, so a flood of one
+cannot starve the other. Internal, test and root endpoints are never
+limited, so stats stay reachable under overload.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+from src.utils.instrumentation import registry
+
+# Requests of each class served concurrently; 0 disables the limit
+ADMISSION_INGEST_CONCURRENCY = int(os.getenv("ADMISSION_INGEST_CONCURRENCY", "24"))
+ADMISSION_QUERY_CONCURRENCY = int(os.getenv("ADMISSION_QUERY_CONCURRENCY", "16"))
+# Longest a request may wait for a slot before it is rejected
+ADMISSION_MAX_WAIT_MS = float(os.getenv("ADMISSION_MAX_WAIT_MS", "1000"))
+
+QUEUE_BUCKETS = (0.0, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Weight of the latest request in the moving average of slot hold times
+SERVICE_TIME_ALPHA = 0.2
+
+registry.describe("admission_shed_total", "Requests rejected with 503 by admission control, by route class and reason.")
+registry.describe("admission_queue_seconds", "Time admitted requests waited for a slot, by route class.")
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted."""
+
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionLimiter:
+    """
+    Bounded concurrency with a FIFO wait queue and wait-time estimation.
+
+    Used from a single event loop, so the counters need no lock.
+    """
+
+    def __init__(self, limit: int, max_wait: float, initial_service_time: float = 0.01):
+        self.limit = limit
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.service_time = initial_service_time
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    def estimated_wait(self) -> float:
+        """Seconds a request arriving now is expected to wait for a slot."""
+        if self.in_flight < self.limit and not self.waiters:
+            return 0.0
+        # Every slot frees up once per service time, and the queue ahead goes first
+        return (len(self.waiters) + 1) * self.service_time / self.limit
+
+    async def acquire(self) -> float:
+        """
+        Take a slot, waiting in line if every slot is in use.
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            Overloaded: If the wait is expected to exceed max_wait, or did
+        """
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            return 0.0
+
+        estimate = self.estimated_wait()
+        if estimate > self.max_wait:
+            raise Overloaded(estimate, "estimated_wait")
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended, so pass it on
+                self.release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded(self.estimated_wait(), "timeout") from None
+            raise
+        return time.perf_counter() - started
+
+    def release(self, held: Optional[float] = None) -> None:
+        """
+        Give a slot back, handing it to the longest waiting request if there is one.
+
+        Args:
+            held (float): Seconds the slot was held, folded into the service time estimate
+        """
+        if held is not None:
+            self.service_time += SERVICE_TIME_ALPHA * (held - self.service_time)
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Return the admission class of a request, or None if it is never limited."""
+    if path.startswith("/metrics/") or path == "/metrics":
+        return "ingest" if method == "POST" else "query"
+    if path.startswith(("/sensors", "/query")):
+        return "query"
+    return None
+
+
+def build_limiters() -> Dict[str, AdmissionLimiter]:
+    max_wait = ADMISSION_MAX_WAIT_MS / 1000
+    limits = {"ingest": ADMISSION_INGEST_CONCURRENCY, "query": ADMISSION_QUERY_CONCURRENCY}
+    return {name: AdmissionLimiter(limit, max_wait) for name, limit in limits.items() if limit > 0}
+
+
+limiters = build_limiters()
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying the per-class limiters to HTTP requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limiter = None
+        if scope["type"] == "http":
+            name = route_class(scope["method"], scope["path"])
+            limiter = limiters.get(name)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        labels = (("route_class", name),)
+        try:
+            waited = await limiter.acquire()
+        except Overloaded as e:
+            registry.inc("admission_shed_total", labels + (("reason", e.reason),))
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "The server is overloaded. Please retry later."},
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        registry.observe("admission_queue_seconds", waited, labels, QUEUE_BUCKETS)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
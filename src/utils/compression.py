@@ -0,0 +1,228 @@
+"""
+Compression of HTTP responses.
+
+CompressionMiddleware compresses responses with the first encoding in
+COMPRESSION_ENCODINGS that the client accepts. gzip is always available.
+zstd and br need the optional zstandard and brotli packages; if they are
+configured but not installed they are skipped with a warning.
+
+A response sent in one piece is only compressed when its body reaches
+COMPRESSION_MIN_SIZE. Below that, the CPU time and added latency cost more
+than the bytes saved. Streaming responses are compressed as they are
+produced, with each chunk flushed so clients receive data without waiting
+for the end of the stream. Routes named in COMPRESSION_SKIP_ROUTES are never
+compressed. This suits small, latency-sensitive endpoints such as
+get_sensor. Routes are matched by endpoint name once routing has run, so the
+setting does not depend on URL layouts.
+"""
+import os
+import zlib
+from typing import List, Optional
+
+from src.utils.logging_config import logger
+
+# Encodings offered, in order of preference
+COMPRESSION_ENCODINGS = [
+    encoding.strip() for encoding in os.getenv("COMPRESSION_ENCODINGS", "gzip").split(",") if encoding.strip()
+]
+# Smallest complete body worth compressing, in bytes
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = os.getenv("COMPRESSION_LEVEL")
+# Endpoint names whose responses are sent uncompressed
+COMPRESSION_SKIP_ROUTES = {
+    name.strip() for name in os.getenv("COMPRESSION_SKIP_ROUTES", "get_sensor").split(",") if name.strip()
+}
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/xml", "application/javascript")
+
+# Level used by each encoding when COMPRESSION_LEVEL is not set
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3, "br": 4}
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        # wbits=31 selects the gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        import zstandard
+
+        self._zstandard = zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(self._zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(self._zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, level: int):
+        import brotli
+
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+COMPRESSORS = {"gzip": GzipCompressor, "zstd": ZstdCompressor, "br": BrotliCompressor}
+OPTIONAL_MODULES = {"zstd": "zstandard", "br": "brotli"}
+
+
+def available_encodings(encodings: List[str]) -> List[str]:
+    """Return the configured encodings that are known and whose package is installed."""
+    available = []
+    for encoding in encodings:
+        if encoding not in COMPRESSORS:
+            logger.warning("Ignoring unknown compression encoding %r", encoding)
+            continue
+        module = OPTIONAL_MODULES.get(encoding)
+        if module is not None:
+            try:
+                __import__(module)
+            except ImportError:
+                logger.warning("Compression with %s needs the %s package, which is not installed", encoding, module)
+                continue
+        available.append(encoding)
+    return available
+
+
+def choose_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """
+    Pick the first of our encodings that the Accept-Encoding header allows.
+
+    Args:
+        accept_encoding (str): Value of the request's Accept-Encoding header
+        encodings (List[str]): Encodings we offer, in order of preference
+
+    Returns:
+        Optional[str]: The encoding to use, or None to send the response as is
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, parameters = item.strip().partition(";")
+        quality = 1.0
+        parameter = parameters.strip()
+        if parameter.startswith("q="):
+            try:
+                quality = float(parameter[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing HTTP responses the client accepts compressed."""
+
+    def __init__(self, app, encodings: List[str] = None, minimum_size: int = None, skip_routes=None):
+        self.app = app
+        self.encodings = available_encodings(COMPRESSION_ENCODINGS if encodings is None else encodings)
+        self.minimum_size = COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        self.skip_routes = COMPRESSION_SKIP_ROUTES if skip_routes is None else set(skip_routes)
+
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope["type"] == "http" and self.encodings:
+            accept_encoding = _header(scope["headers"], b"accept-encoding")
+            if accept_encoding:
+                encoding = choose_encoding(accept_encoding.decode("latin-1"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        # None until the first body message decides whether to compress
+        compressing = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, compressing
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = message.get("headers", [])
+                route = scope.get("route")
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                if (
+                    (route is not None and getattr(route, "name", None) in self.skip_routes)
+                    or _header(headers, b"content-encoding") is not None
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                ):
+                    compressing = False
+                    await send(start_message)
+                return
+
+            if message["type"] != "http.response.body" or compressing is False:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressing is None:
+                if not more_body and len(body) < self.minimum_size:
+                    compressing = False
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressing = True
+                compressor = COMPRESSORS[encoding](_level(encoding))
+                headers = [
+                    (key, value) for key, value in start_message.get("headers", [])
+                    if key.lower() != b"content-length"
+                ]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start_message, "headers": headers})
+
+            if more_body:
+                # Flush every chunk so a slow stream still reaches the client promptly
+                data = compressor.compress(body) + compressor.flush()
+            else:
+                data = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _level(encoding: str) -> int:
+    return int(COMPRESSION_LEVEL) if COMPRESSION_LEVEL else DEFAULT_LEVELS[encoding]
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 
 from sqlalchemy import func
 
@@ -19,12 +19,84 @@ def generate_timestamp_range(start_date: datetime, end_date: datetime, interval_
     Returns:
         List[datetime]: List of timestamps
     """
-    timestamps = []
+    return list(iter_timestamp_range(start_date, end_date, timedelta(hours=interval_hours)))
+
+
+def iter_timestamp_range(
+        start_date: datetime,
+        end_date: datetime,
+        interval: timedelta = timedelta(hours=3)
+) -> Iterator[datetime]:
+    """
+    Lazily yield timestamps from start_date to end_date at specified intervals
+
+    Unlike generate_timestamp_range, memory use does not grow with the range.
+
+    Args:
+        start_date (datetime): The starting datetime
+        end_date (datetime): The ending datetime
+        interval (timedelta): Time between each timestamp
+
+    Returns:
+        Iterator[datetime]: Timestamps in ascending order
+    """
+    if interval <= timedelta(0):
+        raise ValueError("interval must be positive")
+
     current = start_date
     while current <= end_date:
-        timestamps.append(current)
-        current += timedelta(hours=interval_hours)
-    return timestamps
+        yield current
+        current += interval
+
+
+def epoch_timestamp_range(start_date: datetime, end_date: datetime, interval_seconds: int):
+    """
+    Generate epoch-second timestamps from start_date to end_date as a NumPy array
+
+    Args:
+        start_date (datetime): The starting datetime
+        end_date (datetime): The ending datetime
+        interval_seconds (int): Seconds between each timestamp
+
+    Returns:
+        np.ndarray: int64 epoch seconds; use .astype("datetime64[s]") for datetime64 values
+    """
+    # NumPy is only needed by the bulk data paths, so it is not loaded with the API
+    import numpy as np
+
+    if interval_seconds <= 0:
+        raise ValueError("interval_seconds must be positive")
+
+    start = int(start_date.timestamp())
+    return np.arange(start, int(end_date.timestamp()) + 1, interval_seconds, dtype=np.int64)
+
+
+def iter_epoch_chunks(start_date: datetime, end_date: datetime, interval_seconds: int, chunk_size: int):
+    """
+    Lazily yield epoch-second timestamps from start_date to end_date in NumPy arrays
+
+    Each array holds at most chunk_size timestamps, so a backfill can stream
+    any range with constant memory.
+
+    Args:
+        start_date (datetime): The starting datetime
+        end_date (datetime): The ending datetime
+        interval_seconds (int): Seconds between each timestamp
+        chunk_size (int): Maximum number of timestamps per array
+
+    Returns:
+        Iterator[np.ndarray]: int64 epoch-second arrays in ascending order
+    """
+    import numpy as np
+
+    if interval_seconds <= 0 or chunk_size <= 0:
+        raise ValueError("interval_seconds and chunk_size must be positive")
+
+    start = int(start_date.timestamp())
+    stop = int(end_date.timestamp()) + 1
+    chunk_span = interval_seconds * chunk_size
+    for chunk_start in range(start, stop, chunk_span):
+        yield np.arange(chunk_start, min(chunk_start + chunk_span, stop), interval_seconds, dtype=np.int64)
 
 
 def get_sample_metric_ranges() -> Dict[str, Tuple[float, float]]:
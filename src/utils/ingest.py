@@ -0,0 +1,411 @@
+"""
+Bulk ingestion of metric readings.
+
+Used by the streaming ingestion channel and the batch endpoint, where many
+readings arrive together. JSON frames are validated as a whole and readings
+are written in batches with one multi-row INSERT ... RETURNING and commit
+per batch, checking sensors against the sensor cache, instead of one request, query and
+transaction per reading. With INGEST_DEDUP set, duplicates of stored
+readings are resolved by the same statement with ON CONFLICT.
+
+Readings can also be sent in a packed binary layout, which is decoded with
+NumPy into columns and inserted without creating a Pydantic model or ORM
+object per reading. Each record is 21 bytes, little-endian, with no padding:
+
+    offset  size  field
+    0       4     sensor_id    unsigned 32-bit integer
+    4       1     metric code  unsigned 8-bit integer, index into METRIC_CODES
+    5       8     timestamp    signed 64-bit integer, microseconds since the Unix epoch (0 = time received)
+    13      8     value        64-bit IEEE 754 float
+"""
+import json
+import os
+from datetime import datetime
+from itertools import chain
+from typing import List, NamedTuple, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.models.models import IdempotencyKey, Metric
+from src.schemas.schemas import MAX_CLOCK_SKEW, MetricCreate, MetricType
+from src.utils.datetime_helper import utc_now
+from src.utils.instrumentation import registry
+from src.utils.latest_metrics import upsert_latest_metrics
+from src.utils.sensor_cache import sensor_cache
+from src.utils.subscriptions import broker
+
+# Readings buffered before they are written, and the longest they wait
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_MS = float(os.getenv("INGEST_FLUSH_MS", "50"))
+
+# Largest body accepted by POST /metrics/batch/
+METRICS_BATCH_MAX_BYTES = int(os.getenv("METRICS_BATCH_MAX_BYTES", str(10 * 1024 * 1024)))
+
+BINARY_CONTENT_TYPE = "application/x-weather-metrics"
+# Metric codes of the binary layout; new metric types must only ever be appended
+METRIC_CODES = [metric_type.value for metric_type in MetricType]
+RECORD_SIZE = 21
+
+# Handling of readings already stored for the same sensor, metric type and timestamp:
+# "off" stores them again, "ignore" keeps the first and "replace" keeps the last
+INGEST_DEDUP = os.getenv("INGEST_DEDUP", "off")
+_CONFLICT_CLAUSES = {
+    "off": "",
+    "ignore": " ON CONFLICT (sensor_id, metric_type, timestamp) DO NOTHING",
+    "replace": " ON CONFLICT (sensor_id, metric_type, timestamp) DO UPDATE SET value = excluded.value",
+}
+if INGEST_DEDUP not in _CONFLICT_CLAUSES:
+    raise ValueError(f"INGEST_DEDUP must be one of {', '.join(_CONFLICT_CLAUSES)}")
+# Rows per INSERT statement, within SQLite's limit of 32766 bound parameters
+INSERT_CHUNK_ROWS = 5000
+
+registry.describe("ingest_duplicates_total", "Readings skipped as duplicates of stored readings.")
+
+_frame_adapter = TypeAdapter(List[MetricCreate])
+_reading_adapter = TypeAdapter(MetricCreate)
+
+
+def parse_frame(data) -> Tuple[List[Tuple[int, MetricCreate]], List[Tuple[int, str]]]:
+    """
+    Validate a JSON frame holding one reading or a list of readings.
+
+    The whole frame is validated in one pass; only when that fails are the
+    readings validated one by one to find the invalid ones.
+
+    Args:
+        data: Text or bytes of the frame
+
+    Returns:
+        Tuple of the valid readings and the errors, each paired with its index in the frame
+    """
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return [], [(0, "Invalid JSON")]
+
+    items = payload if isinstance(payload, list) else [payload]
+    try:
+        return list(enumerate(_frame_adapter.validate_python(items))), []
+    except ValidationError:
+        pass
+
+    readings, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            readings.append((index, _reading_adapter.validate_python(item)))
+        except ValidationError as e:
+            errors.append((index, e.errors(include_url=False)[0]["msg"]))
+    return readings, errors
+
+
+class Reading(NamedTuple):
+    """A stored reading, for code that only needs a metric's attributes."""
+    id: int
+    sensor_id: int
+    metric_type: str
+    value: float
+    # Naive UTC, as the ORM loads DateTime columns, so every endpoint serializes it the same way
+    timestamp: datetime
+
+    @classmethod
+    def from_row(cls, row) -> "Reading":
+        """Build a reading from an (id, sensor_id, metric_type, value, timestamp text) row."""
+        metric_id, sensor_id, metric_type, value, timestamp = row
+        return cls(metric_id, sensor_id, metric_type, value, datetime.fromisoformat(timestamp))
+
+
+def format_timestamp(value: datetime) -> str:
+    """Format a UTC datetime the way SQLAlchemy stores DateTime columns in SQLite."""
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def conflict_clause(dedup: str = None) -> str:
+    """Return the ON CONFLICT clause of an INSERT INTO metrics for a dedup mode (defaults to INGEST_DEDUP)."""
+    return _CONFLICT_CLAUSES[dedup or INGEST_DEDUP]
+
+
+def insert_rows(db: Session, rows: List[tuple], dedup: str = None) -> List[Reading]:
+    """
+    Insert readings with INSERT ... RETURNING, one statement per chunk of rows.
+
+    With dedup "ignore", readings already stored for the same sensor, metric
+    type and timestamp are skipped; with "replace" their value is overwritten.
+    Both rely on the unique reading index from src/database/dedup.py.
+
+    Args:
+        db: Database session
+        rows: (sensor_id, metric_type, value, timestamp text) tuples
+        dedup (str): "off", "ignore" or "replace" (defaults to INGEST_DEDUP)
+
+    Returns:
+        List[Reading]: Rows inserted or updated, ordered by id
+    """
+    conflict = conflict_clause(dedup)
+    connection = db.connection()
+    stored = {}
+    for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+        chunk = rows[start:start + INSERT_CHUNK_ROWS]
+        statement = (
+            "INSERT INTO metrics (sensor_id, metric_type, value, timestamp) VALUES "
+            + ", ".join(["(?, ?, ?, ?)"] * len(chunk)) + conflict
+            + " RETURNING id, sensor_id, metric_type, value, timestamp"
+        )
+        # A reading repeated within the batch is returned once per write; keep the last
+        for row in connection.exec_driver_sql(statement, tuple(chain.from_iterable(chunk))):
+            stored[row[0]] = row
+
+    if len(stored) < len(rows):
+        registry.inc("ingest_duplicates_total", amount=len(rows) - len(stored))
+    return [Reading.from_row(row) for row in sorted(stored.values())]
+
+
+def _known_sensors(db: Session, sensor_ids) -> set:
+    return sensor_cache(db).known(db, sensor_ids)
+
+
+def _prepare_metrics(db: Session, readings: List[MetricCreate]) -> Tuple[List[tuple], List[int]]:
+    """Turn validated readings into insert rows, skipping readings for unknown sensors."""
+    known = _known_sensors(db, {reading.sensor_id for reading in readings})
+    received = format_timestamp(utc_now())
+
+    rows, rejected = [], []
+    for position, reading in enumerate(readings):
+        if reading.sensor_id not in known:
+            rejected.append(position)
+            continue
+        timestamp = received if reading.timestamp is None else format_timestamp(reading.timestamp)
+        rows.append((reading.sensor_id, reading.metric_type.value, reading.value, timestamp))
+    return rows, rejected
+
+
+def decode_records(data: bytes):
+    """
+    Decode packed binary readings into a NumPy structured array.
+
+    Raises:
+        ValueError: If the payload is not a whole number of records
+    """
+    # NumPy is only needed by the bulk data paths, so it is not loaded with the API
+    import numpy as np
+
+    if len(data) % RECORD_SIZE:
+        raise ValueError(f"Binary payload length must be a multiple of {RECORD_SIZE} bytes")
+    dtype = np.dtype([("sensor_id", "<u4"), ("metric_code", "u1"), ("timestamp", "<i8"), ("value", "<f8")])
+    return np.frombuffer(data, dtype=dtype)
+
+
+def _prepare_records(db: Session, records) -> Tuple[List[tuple], List[int]]:
+    """
+    Turn decoded binary readings into insert rows with vectorized checks.
+
+    Records with an unknown metric code or sensor, or a timestamp before the epoch or
+    in the future, are skipped.
+    """
+    import numpy as np
+
+    sensor_ids = records["sensor_id"].astype(np.int64)
+    codes = records["metric_code"]
+    known = list(_known_sensors(db, np.unique(sensor_ids).tolist()))
+    now = int(utc_now().timestamp() * 1_000_000)
+    valid = (
+        (codes < len(METRIC_CODES)) & np.isin(sensor_ids, known) & (records["timestamp"] >= 0)
+        & (records["timestamp"] <= now + int(MAX_CLOCK_SKEW.total_seconds() * 1_000_000))
+    )
+    rejected = np.flatnonzero(~valid).tolist()
+    if not valid.any():
+        return [], rejected
+
+    timestamps = np.where(records["timestamp"][valid] == 0, now, records["timestamp"][valid])
+    # Same text format SQLAlchemy uses for DateTime columns in SQLite
+    timestamp_text = np.char.replace(np.datetime_as_string(timestamps.astype("datetime64[us]"), unit="us"), "T", " ")
+    rows = list(zip(
+        sensor_ids[valid].tolist(),
+        np.array(METRIC_CODES)[codes[valid]].tolist(),
+        records["value"][valid].tolist(),
+        timestamp_text.tolist(),
+    ))
+    return rows, rejected
+
+
+def _write(db: Session, rows: List[tuple]):
+    """Insert rows and update latest_metrics, returning the prepared subscriber messages."""
+    readings = insert_rows(db, rows)
+    upsert_latest_metrics(db, readings)
+    return broker.prepare(readings)
+
+
+def store_metrics(db: Session, readings: List[MetricCreate]) -> Tuple[int, List[int]]:
+    """
+    Insert validated readings in one transaction and publish them to subscribers.
+
+    Readings for sensors that do not exist are skipped.
+
+    Args:
+        db: Database session
+        readings: Validated readings
+
+    Returns:
+        Tuple of the number of readings accepted and the positions of the skipped ones
+    """
+    rows, rejected = _prepare_metrics(db, readings)
+    batches = _write(db, rows) if rows else {}
+    db.commit()
+    broker.send(batches)
+    return len(rows), rejected
+
+
+def store_metric(db: Session, metric: MetricCreate) -> Reading:
+    """
+    Insert a single reading for an existing sensor and publish it to subscribers.
+
+    Returns:
+        Reading: The stored reading, or the one already stored when INGEST_DEDUP ignored a duplicate
+    """
+    timestamp = format_timestamp(metric.timestamp or utc_now())
+    readings = insert_rows(db, [(metric.sensor_id, metric.metric_type.value, metric.value, timestamp)])
+    if not readings:
+        # Look the stored reading up by the timestamp text bound above, which is also
+        # the time of receipt when the client sent no timestamp
+        stored = db.connection().exec_driver_sql(
+            "SELECT id, sensor_id, metric_type, value, timestamp FROM metrics "
+            "WHERE sensor_id = ? AND metric_type = ? AND timestamp = ?",
+            (metric.sensor_id, metric.metric_type.value, timestamp)
+        ).one()
+        db.commit()
+        return Reading.from_row(stored)
+
+    upsert_latest_metrics(db, readings)
+    batches = broker.prepare(readings)
+    db.commit()
+    broker.send(batches)
+    return readings[0]
+
+
+def store_records(db: Session, records) -> Tuple[int, List[int]]:
+    """
+    Insert decoded binary readings in one transaction and publish them to subscribers.
+
+    Args:
+        db: Database session
+        records: Structured array returned by decode_records
+
+    Returns:
+        Tuple of the number of readings accepted and the positions of the skipped ones
+    """
+    rows, rejected = _prepare_records(db, records)
+    batches = _write(db, rows) if rows else {}
+    db.commit()
+    broker.send(batches)
+    return len(rows), rejected
+
+
+class IngestBatch:
+    """Readings from several frames waiting to be written together."""
+
+    def __init__(self):
+        self.readings: List[MetricCreate] = []
+        # (frame, index) of each JSON reading
+        self.origins: List[Tuple[int, int]] = []
+        self.records = []
+        self.record_frames: List[int] = []
+        self.rejected: List[dict] = []
+
+    def __len__(self):
+        return len(self.readings) + sum(len(records) for records in self.records)
+
+    def add_json(self, frame: int, data) -> None:
+        readings, errors = parse_frame(data)
+        self.readings.extend(reading for _, reading in readings)
+        self.origins.extend((frame, index) for index, _ in readings)
+        self.rejected.extend({"frame": frame, "index": index, "error": error} for index, error in errors)
+
+    def add_binary(self, frame: int, data: bytes) -> None:
+        try:
+            self.records.append(decode_records(data))
+            self.record_frames.append(frame)
+        except ValueError as e:
+            self.rejected.append({"frame": frame, "index": 0, "error": str(e)})
+
+    def write(self, db: Session):
+        """
+        Insert the pending readings without committing.
+
+        Returns:
+            Tuple of the number of readings accepted, every rejected reading with its
+            frame and index, and the subscriber messages to send after commit
+        """
+        accepted = 0
+        rejected = self.rejected
+        messages = []
+        if self.readings:
+            rows, skipped = _prepare_metrics(db, self.readings)
+            if rows:
+                messages.append(_write(db, rows))
+            accepted += len(rows)
+            rejected.extend(
+                {"frame": self.origins[i][0], "index": self.origins[i][1], "error": "Sensor not found"}
+                for i in skipped
+            )
+        if self.records:
+            import numpy as np
+
+            rows, skipped = _prepare_records(db, np.concatenate(self.records))
+            if rows:
+                messages.append(_write(db, rows))
+            accepted += len(rows)
+            starts = np.cumsum([0] + [len(records) for records in self.records])
+            for position in skipped:
+                segment = int(np.searchsorted(starts, position, side="right")) - 1
+                rejected.append({
+                    "frame": self.record_frames[segment],
+                    "index": position - int(starts[segment]),
+                    "error": "Unknown sensor or metric code, or invalid timestamp",
+                })
+        return accepted, rejected, messages
+
+    def store(self, db: Session) -> Tuple[int, List[dict]]:
+        """
+        Write the pending readings in one transaction.
+
+        Returns:
+            Tuple of the number of readings accepted and every rejected reading with its frame and index
+        """
+        accepted, rejected, messages = self.write(db)
+        db.commit()
+        for batches in messages:
+            broker.send(batches)
+        return accepted, rejected
+
+
+def store_batch(db: Session, batch: IngestBatch, idempotency_key: Optional[str] = None) -> Tuple[dict, bool]:
+    """
+    Store a batch upload, or replay the response of an earlier upload with the same idempotency key.
+
+    The key is claimed in the same transaction that inserts the readings, so a
+    retried upload is either stored exactly once or answered from the first
+    attempt, even when both arrive at the same time.
+
+    Returns:
+        Tuple of the response body and whether it was replayed
+    """
+    if idempotency_key is not None:
+        claimed = db.execute(
+            sqlite_insert(IdempotencyKey).values(key=idempotency_key, created_at=utc_now()).on_conflict_do_nothing()
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            return json.loads(db.get(IdempotencyKey, idempotency_key).response), True
+
+    accepted, rejected, messages = batch.write(db)
+    response = {"accepted": accepted, "rejected": [{"index": item["index"], "error": item["error"]} for item in rejected]}
+    if idempotency_key is not None:
+        db.execute(
+            update(IdempotencyKey).where(IdempotencyKey.key == idempotency_key).values(response=json.dumps(response))
+        )
+    db.commit()
+    for batches in messages:
+        broker.send(batches)
+    return response, False
@@ -0,0 +1,213 @@
+"""
+Request timing and SQL statement instrumentation.
+
+RequestMetricsMiddleware records a latency histogram per route, and SQLAlchemy
+cursor hooks count the statements and database time of the request being
+served. Everything is collected in a process-wide registry that renders the
+Prometheus text exposition format. Statements slower than SLOW_QUERY_MS are
+written to the log.
+"""
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.utils.logging_config import logger
+
+# Statements taking longer than this many milliseconds are logged
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds, as used by Prometheus."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name: str, labels: Labels) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {self.total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestStats:
+    """Statement count and database time accumulated while serving one request."""
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        # Parallel query partitions record statements from several threads
+        self._lock = threading.Lock()
+
+    def record(self, elapsed: float) -> None:
+        with self._lock:
+            self.statements += 1
+            self.db_time += elapsed
+
+
+class MetricsRegistry:
+    """Thread-safe store of the counters and histograms exposed at /internal/stats/."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.help: Dict[str, str] = {}
+
+    def describe(self, name: str, text: str) -> None:
+        self.help[name] = text
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def set_counter(self, name: str, value: float, labels: Labels = ()) -> None:
+        """Record a counter that is maintained elsewhere, such as coalescing totals."""
+        with self._lock:
+            self.counters.setdefault(name, {})[labels] = value
+
+    def render(self) -> str:
+        """Render every series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    lines.extend(histogram.render(name, labels))
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+registry = MetricsRegistry()
+registry.describe("http_requests_total", "Requests served, by method, route and status code.")
+registry.describe("http_request_duration_seconds", "Request latency, by method and route.")
+registry.describe("db_statements_per_request", "SQL statements executed per request, by method and route.")
+registry.describe("db_time_per_request_seconds", "Time spent executing SQL per request, by method and route.")
+registry.describe("db_statements_total", "SQL statements executed.")
+registry.describe("db_time_seconds_total", "Time spent executing SQL.")
+registry.describe("db_slow_statements_total", "SQL statements slower than SLOW_QUERY_MS.")
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+
+    registry.inc("db_statements_total")
+    registry.inc("db_time_seconds_total", amount=elapsed)
+
+    stats = _current_request.get()
+    if stats is not None:
+        stats.record(elapsed)
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        registry.inc("db_slow_statements_total")
+        # Bulk inserts can carry thousands of placeholders, so only log the start
+        logger.warning("Slow query (%.1f ms): %.500s", elapsed * 1000, statement)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # after_cursor_execute is skipped for failed statements, so drop their start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording latency and SQL usage for every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_request.reset(token)
+
+            # Label by route template so /sensors/1 and /sensors/2 share a series
+            route = scope.get("route")
+            labels = (("method", scope["method"]), ("route", route.path if route else "unmatched"))
+
+            registry.inc("http_requests_total", labels + (("status", str(status_code)),))
+            registry.observe("http_request_duration_seconds", elapsed, labels)
+            registry.observe("db_statements_per_request", stats.statements, labels, STATEMENT_BUCKETS)
+            registry.observe("db_time_per_request_seconds", stats.db_time, labels)
@@ -0,0 +1,128 @@
+"""
+Maintenance of the latest_metrics table.
+
+The table keeps the newest reading for every (sensor, metric type) pair so
+current conditions can be served without scanning the metrics table.
+"""
+from typing import Iterable, List
+
+from sqlalchemy import delete, exists, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.models.models import LatestMetric, Metric
+
+
+def upsert_latest_metrics(db: Session, metrics: Iterable[Metric]) -> None:
+    """
+    Record flushed metrics as the latest readings of their sensor and metric type.
+
+    A stored reading is only replaced by one with an equal or newer timestamp,
+    so late or out-of-order readings never overwrite current conditions.
+    The caller is responsible for committing.
+
+    Args:
+        db: Database session
+        metrics: Metric objects that already have an id and timestamp
+    """
+    newest = {}
+    for metric in metrics:
+        key = (metric.sensor_id, metric.metric_type)
+        current = newest.get(key)
+        if current is None or metric.timestamp >= current.timestamp:
+            newest[key] = metric
+
+    if not newest:
+        return
+
+    stmt = sqlite_insert(LatestMetric).values([
+        {
+            "sensor_id": metric.sensor_id,
+            "metric_type": metric.metric_type,
+            "metric_id": metric.id,
+            "value": metric.value,
+            "timestamp": metric.timestamp,
+        }
+        for metric in newest.values()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LatestMetric.sensor_id, LatestMetric.metric_type],
+        set_={
+            "metric_id": stmt.excluded.metric_id,
+            "value": stmt.excluded.value,
+            "timestamp": stmt.excluded.timestamp,
+        },
+        where=LatestMetric.timestamp <= stmt.excluded.timestamp
+    )
+    db.execute(stmt)
+
+
+def rebuild_latest_metrics(connection) -> None:
+    """
+    Repopulate latest_metrics from the full metrics table.
+
+    Used when initializing a database that already holds readings.
+
+    Args:
+        connection: SQLAlchemy connection or session inside a transaction
+    """
+    ranked = select(
+        Metric.sensor_id,
+        Metric.metric_type,
+        Metric.id.label("metric_id"),
+        Metric.value,
+        Metric.timestamp,
+        func.row_number().over(
+            partition_by=(Metric.sensor_id, Metric.metric_type),
+            order_by=(Metric.timestamp.desc(), Metric.id.desc())
+        ).label("position")
+    ).subquery()
+
+    columns = ["sensor_id", "metric_type", "metric_id", "value", "timestamp"]
+    connection.execute(delete(LatestMetric))
+    connection.execute(
+        insert(LatestMetric).from_select(
+            columns,
+            select(*(ranked.c[name] for name in columns)).where(ranked.c.position == 1)
+        )
+    )
+
+
+def repair_latest_metrics(connection) -> None:
+    """
+    Repoint latest_metrics rows whose reading was deleted to the newest remaining one.
+
+    Rows left without any reading are removed. Used after deleting metrics,
+    in the same transaction.
+
+    Args:
+        connection: SQLAlchemy connection or session inside a transaction
+    """
+    newest = select(Metric).where(
+        Metric.sensor_id == LatestMetric.sensor_id,
+        Metric.metric_type == LatestMetric.metric_type
+    ).order_by(Metric.timestamp.desc(), Metric.id.desc()).limit(1)
+
+    connection.execute(
+        update(LatestMetric)
+        .where(~exists().where(Metric.id == LatestMetric.metric_id))
+        .values(
+            metric_id=newest.with_only_columns(Metric.id).scalar_subquery(),
+            value=newest.with_only_columns(Metric.value).scalar_subquery(),
+            timestamp=newest.with_only_columns(Metric.timestamp).scalar_subquery(),
+        )
+    )
+    connection.execute(delete(LatestMetric).where(LatestMetric.metric_id.is_(None)))
+
+
+def get_latest_metrics(db: Session, sensor_id: int = None) -> List[LatestMetric]:
+    """
+    Return the latest reading per metric type, optionally for a single sensor.
+
+    Returns:
+        List[LatestMetric]: Latest readings ordered by sensor and metric type
+    """
+    query = db.query(LatestMetric)
+    if sensor_id is not None:
+        query = query.filter(LatestMetric.sensor_id == sensor_id)
+    return query.order_by(LatestMetric.sensor_id, LatestMetric.metric_type).all()
@@ -1,22 +1,44 @@
+import atexit
+import json
 import logging
+import os
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from queue import SimpleQueue
 
-# Create logs directory if it doesn't exist
-log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
+# Created when logging is set up, not on import
+log_dir = Path(os.getenv("LOG_DIR", "logs"))
 
+# Set LOG_FORMAT=json to write the log file as one JSON object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            "timestamp": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
 
-# Configure logging
-def setup_logger():
-    logger = logging.getLogger("weather_api")
-    logger.setLevel(logging.INFO)
 
+def create_handlers(json_format=False):
+    """Create the console and rotating file handlers that emit log records."""
     # Create formatters
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    if json_format:
+        file_formatter = JsonFormatter()
+    else:
+        file_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
     console_formatter = logging.Formatter(
         '%(levelname)s: %(message)s'
     )
@@ -34,12 +56,59 @@ def setup_logger():
     file_handler.setFormatter(file_formatter)
     file_handler.setLevel(logging.INFO)
 
-    # Add handlers to logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    return [console_handler, file_handler]
+
+
+class _SetupOnFirstRecord(logging.Handler):
+    """
+    Placeholder handler that sets up logging when the first record arrives.
+
+    Importing this module creates no directories, files or threads, so tools
+    that only import the app stay fast. Scripts that log still get the
+    console and file output without setting anything up themselves.
+    """
+
+    def handle(self, record):
+        setup_logger()
+        # The queue handler replaced this one after the logger started dispatching the record
+        for handler in logger.handlers:
+            if handler is not self:
+                handler.handle(record)
+        return True
+
+    def emit(self, record):
+        pass
+
+
+# Configure logging
+def setup_logger():
+    """
+    Configure the application logger. Safe to call more than once.
+
+    Request threads only put records on a queue; a background QueueListener
+    thread does the console and file I/O, including rotation checks.
+    """
+    global listener
+    with _setup_lock:
+        if listener is not None:
+            return logger, listener
+
+        log_dir.mkdir(exist_ok=True)
+        log_queue = SimpleQueue()
+        listener = QueueListener(log_queue, *create_handlers(LOG_FORMAT == "json"), respect_handler_level=True)
+        listener.start()
+        # Flush queued records before the interpreter exits
+        atexit.register(listener.stop)
 
-    return logger
+        logger.removeHandler(_placeholder)
+        logger.addHandler(QueueHandler(log_queue))
+        return logger, listener
 
 
-# Create a global logger instance
-logger = setup_logger()
\ No newline at end of file
+# Create a global logger instance; handlers are set up by the app's lifespan or the first record
+logger = logging.getLogger("weather_api")
+logger.setLevel(logging.INFO)
+listener = None
+_setup_lock = threading.Lock()
+_placeholder = _SetupOnFirstRecord()
+logger.addHandler(_placeholder)
@@ -0,0 +1,139 @@
+"""
+Parallel execution mode for metric queries over large date ranges.
+
+The query window is split into contiguous sub-ranges that are aggregated
+concurrently, each on its own read-only connection. SQLite releases the GIL
+while it executes a statement, so a thread pool keeps several cores busy.
+The per-partition (count, sum, min, max) partials are merged afterwards.
+
+Partitions run on one thread pool shared by every request, with
+QUERY_PARALLEL_WORKERS threads, so concurrent queries cannot multiply the
+number of threads. Their connections come from a separate engine of the same
+database whose connections are read-only from the moment they are opened,
+and never return to the application's pool. Each partition runs in a copy of
+the request's context, so its statements count towards the request's stats.
+"""
+import contextvars
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from src.schemas.schemas import QueryParams
+from src.utils.query_planner import PartialAggregate, TimeWindow, answer_query, merge_partials, scan_window
+
+# Number of partitions aggregated concurrently; 1 keeps queries on the serial path
+QUERY_PARALLELISM = int(os.getenv("QUERY_PARALLELISM", "1"))
+# Threads shared by all parallel queries of the process
+QUERY_PARALLEL_WORKERS = int(os.getenv("QUERY_PARALLEL_WORKERS", "0")) or max(QUERY_PARALLELISM, os.cpu_count() or 1)
+
+# Threads are only started once partitions are submitted
+_executor = ThreadPoolExecutor(max_workers=QUERY_PARALLEL_WORKERS, thread_name_prefix="parallel-query")
+
+_read_engines: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_read_engines_lock = threading.Lock()
+
+
+def _set_query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+
+
+def read_engine(engine: Engine) -> Engine:
+    """
+    Return an engine of the same database whose connections are read-only.
+
+    In-memory databases are private to their connections, so their own
+    engine is returned instead.
+
+    Args:
+        engine: Engine of the database to read
+
+    Returns:
+        Engine: Engine shared by every parallel query of that database
+    """
+    if engine.url.database in (None, "", ":memory:"):
+        return engine
+    with _read_engines_lock:
+        reader = _read_engines.get(engine)
+        if reader is None:
+            reader = _read_engines[engine] = create_engine(
+                engine.url, connect_args={"check_same_thread": False}, pool_size=QUERY_PARALLEL_WORKERS
+            )
+            event.listen(reader, "connect", _set_query_only)
+        return reader
+
+
+def split_time_range(start_date: datetime, end_date: datetime, partitions: int) -> List[TimeWindow]:
+    """
+    Split a date range into contiguous sub-ranges of equal length.
+
+    Args:
+        start_date (datetime): Start of the range
+        end_date (datetime): End of the range
+        partitions (int): Number of sub-ranges to produce
+
+    Returns:
+        List[TimeWindow]: Sub-ranges covering start_date to end_date in order
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+
+    step = (end_date - start_date) / partitions
+    bounds = [start_date + step * i for i in range(partitions)] + [end_date]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def aggregate_partition(
+        engine: Engine,
+        window: TimeWindow,
+        query_params: QueryParams,
+        include_end: bool
+) -> Dict[Tuple[int, str], PartialAggregate]:
+    """
+    Aggregate one partition of a query on a dedicated read-only connection.
+
+    Returns:
+        Dict[Tuple[int, str], PartialAggregate]: Partials keyed by (sensor_id, metric_type)
+    """
+    with Session(bind=read_engine(engine)) as session:
+        return scan_window(session, window, [query_params], include_end=include_end)
+
+
+def parallel_query(engine: Engine, query_params: QueryParams, parallelism: int = None) -> list:
+    """
+    Run a query with an explicit date range by aggregating sub-ranges concurrently.
+
+    Args:
+        engine: Engine the partition connections are opened from
+        query_params: Query with both start_date and end_date set
+        parallelism: Number of partitions (defaults to QUERY_PARALLELISM)
+
+    Returns:
+        list: The same results query_metrics returns for the query
+    """
+    if not (query_params.start_date and query_params.end_date):
+        raise ValueError("Parallel queries require both start_date and end_date")
+
+    parallelism = parallelism or QUERY_PARALLELISM
+    windows = split_time_range(query_params.start_date, query_params.end_date, parallelism)
+
+    # Only the last partition includes its end bound so rows are counted once.
+    # A context can only be entered by one thread at a time, so each partition gets its own copy.
+    futures = [
+        _executor.submit(
+            contextvars.copy_context().run,
+            aggregate_partition, engine, window, query_params, index == len(windows) - 1
+        )
+        for index, window in enumerate(windows)
+    ]
+    partial_sets = [future.result() for future in futures]
+
+    return answer_query(query_params, merge_partials(partial_sets))
@@ -0,0 +1,152 @@
+"""
+On-demand statistical profiling of individual requests.
+
+A request is profiled when it carries the admin token (see src.utils.admin)
+in its X-Admin-Token header, or when it is picked by the PROFILE_SAMPLE_RATE sampler.
+While the request is in flight a background thread samples the Python stacks
+of every thread, so the event loop, the threadpool workers running the
+get_db dependency and the endpoint, SQLAlchemy execution and response
+serialization all appear in one profile. Samples are written to PROFILE_DIR
+in collapsed-stack format (one "frame;frame;frame count" line per stack),
+which flame graph tools read directly, off the event loop. The file name is
+returned in the X-Profile-File response header of requests that asked for a
+profile with the token; sampled requests never get it, so the profile
+location is not disclosed to ordinary clients.
+
+Concurrent requests served while a profile is recorded show up in it too,
+so profiles are best taken on a quiet worker.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from src.utils import admin
+from src.utils.logging_config import logger
+
+# Fraction of all requests profiled without a header, from 0.0 to 1.0
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+
+# Header-triggered profiling is disabled unless ADMIN_TOKEN is configured
+PROFILE_HEADER = admin.ADMIN_HEADER.lower().encode()
+
+# Leaf frames of threads that are parked waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+
+class StackSampler:
+    """Background thread collecting the stacks of all other threads at a fixed interval."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._sample(frame)
+
+    def _sample(self, frame) -> None:
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return
+
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_filename}:{code.co_name}")
+            frame = frame.f_back
+        self.stacks[";".join(reversed(names))] += 1
+
+    def collapsed(self) -> str:
+        """Return the samples in collapsed-stack format."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_token(headers) -> Optional[bool]:
+    """Return whether the request carries the admin token, or None if it sends no token header."""
+    if admin.ADMIN_TOKEN:
+        for name, value in headers:
+            if name == PROFILE_HEADER:
+                return admin.is_admin_token(value.decode("latin-1"))
+    return None
+
+
+def should_profile(headers) -> bool:
+    """Decide whether a request is profiled from its headers and the sample rate."""
+    requested = profile_token(headers)
+    if requested is not None:
+        return requested
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def profile_file_name(method: str, path: str) -> str:
+    slug = path.strip("/").replace("/", "_") or "root"
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{time.perf_counter_ns() % 1000000:06d}-{method}-{slug}.collapsed"
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests selected by should_profile."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not should_profile(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        file_name = profile_file_name(scope["method"], scope["path"])
+        sampler = StackSampler(PROFILE_INTERVAL_MS / 1000)
+
+        async def send_with_profile_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-file", file_name.encode())
+                ]
+            await send(message)
+
+        # Only a client that asked for the profile with the token learns where it is
+        requested = profile_token(scope["headers"])
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_header if requested else send)
+        finally:
+            sampler.stop()
+            await run_in_threadpool(save_profile, file_name, sampler)
+
+
+def save_profile(file_name: str, sampler: StackSampler) -> Optional[Path]:
+    """Write a profile to PROFILE_DIR, returning its path."""
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / file_name
+        path.write_text(sampler.collapsed())
+    except OSError as e:
+        logger.error("Failed to save profile %s: %s", file_name, e)
+        return None
+    logger.info("Saved request profile %s (%d samples)", path, sum(sampler.stacks.values()))
+    return path
@@ -0,0 +1,261 @@
+"""
+Planner for batched metric queries.
+
+Sub-queries whose time windows overlap are merged into a single grouped scan
+over the union of their windows, sensors and metric types. Each sub-query is
+then answered from the per-(sensor, metric type) partial aggregates of that
+scan, so a batch costs one database round trip per group of overlapping
+windows. When the windows in a group differ, the scan also groups rows by the
+segment between window boundaries they fall in, and each sub-query only
+merges the segments inside its own window. Batches hold at most
+QUERY_BATCH_MAX_QUERIES queries.
+"""
+import os
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from src.models.models import Metric
+from src.schemas.schemas import QueryParams, StatisticType
+from src.utils.datetime_helper import get_date_range
+from src.utils.helpers import create_query_result_object
+
+# (start, end) filter applied to Metric.timestamp; end is None for open windows
+TimeWindow = Tuple[datetime, Optional[datetime]]
+
+# Most queries accepted in one batch request
+QUERY_BATCH_MAX_QUERIES = int(os.getenv("QUERY_BATCH_MAX_QUERIES", "100"))
+
+
+class PartialAggregate(NamedTuple):
+    """Count, sum, min and max of the values of one sensor and metric type."""
+    count: int
+    total: float
+    minimum: float
+    maximum: float
+
+
+def resolve_time_window(query_params: QueryParams, default_window: TimeWindow) -> TimeWindow:
+    """
+    Return the timestamp window a query filters on.
+
+    Mirrors query_metrics: an explicit date range is used only when both
+    dates are given, otherwise the query covers the default window.
+    """
+    if query_params.start_date and query_params.end_date:
+        return query_params.start_date, query_params.end_date
+    return default_window
+
+
+def _naive(point: Optional[datetime]) -> Optional[datetime]:
+    """Drop the time zone, which SQLite ignores when comparing timestamps, so windows can be ordered."""
+    return None if point is None else point.replace(tzinfo=None)
+
+
+def plan_batch(queries: Sequence[QueryParams], default_window: TimeWindow) -> Dict[TimeWindow, List[int]]:
+    """
+    Group the indexes of the queries that can share a scan.
+
+    Queries whose windows overlap or touch end up in the same group, keyed
+    by the window covering all of theirs.
+
+    Returns:
+        Dict[TimeWindow, List[int]]: Mapping of covering time windows to query indexes
+    """
+    windows = [resolve_time_window(query_params, default_window) for query_params in queries]
+
+    # Sorted by start, a window joins the group before it unless it starts after the group ends
+    groups: List[Tuple[TimeWindow, List[int]]] = []
+    for index in sorted(range(len(queries)), key=lambda i: _naive(windows[i][0])):
+        start, end = windows[index]
+        if groups:
+            (group_start, group_end), indexes = groups[-1]
+            if group_end is None or _naive(start) <= _naive(group_end):
+                if group_end is not None and (end is None or _naive(end) > _naive(group_end)):
+                    group_end = end
+                groups[-1] = ((group_start, group_end), indexes + [index])
+                continue
+        groups.append(((start, end), [index]))
+    return {window: sorted(indexes) for window, indexes in groups}
+
+
+def segment_of(boundaries: Sequence[datetime]):
+    """
+    Return a SQL expression numbering the segment of Metric.timestamp between sorted boundaries.
+
+    Segment 2 * i + 1 holds rows exactly at boundaries[i] and segment 2 * i
+    the rows between boundaries[i - 1] and boundaries[i], so inclusive
+    windows are made of whole segments.
+    """
+    whens = []
+    for i, boundary in enumerate(boundaries):
+        whens.append((Metric.timestamp < boundary, 2 * i))
+        whens.append((Metric.timestamp == boundary, 2 * i + 1))
+    return case(*whens, else_=2 * len(boundaries))
+
+
+def segments_within(window: TimeWindow, boundaries: Sequence[datetime]) -> range:
+    """Return the segments of segment_of(boundaries) that make up a window starting and ending on boundaries."""
+    start, end = window
+    last = 2 * len(boundaries) if end is None else 2 * bisect_left(boundaries, end) + 1
+    return range(2 * bisect_left(boundaries, start) + 1, last + 1)
+
+
+def scan_window(
+        db: Session,
+        window: TimeWindow,
+        queries: Sequence[QueryParams],
+        include_end: bool = True,
+        boundaries: Sequence[datetime] = None
+) -> Dict[tuple, PartialAggregate]:
+    """
+    Aggregate every (sensor, metric type) pair needed by the given queries in one statement.
+
+    Args:
+        db: Database session
+        window: Time window covering all the queries
+        queries: Queries whose sensors and metric types are merged into the scan
+        include_end: Whether rows at exactly the end of the window are included
+        boundaries: Sorted window boundaries; when given, rows are also grouped by segment_of(boundaries)
+
+    Returns:
+        Dict[tuple, PartialAggregate]: Partial aggregates keyed by (sensor_id, metric_type),
+        or by (sensor_id, metric_type, segment) when boundaries are given
+    """
+    start_date, end_date = window
+    keys = [Metric.sensor_id, Metric.metric_type]
+    if boundaries:
+        keys.append(segment_of(boundaries))
+
+    query = db.query(
+        *keys,
+        func.count(Metric.value),
+        func.sum(Metric.value),
+        func.min(Metric.value),
+        func.max(Metric.value),
+    ).filter(Metric.timestamp >= start_date)
+    if end_date is not None:
+        if include_end:
+            query = query.filter(Metric.timestamp <= end_date)
+        else:
+            query = query.filter(Metric.timestamp < end_date)
+
+    # A query without sensor_ids covers every sensor, so the union is unbounded
+    if all(q.sensor_ids for q in queries):
+        sensor_ids = sorted({sensor_id for q in queries for sensor_id in q.sensor_ids})
+        query = query.filter(Metric.sensor_id.in_(sensor_ids))
+
+    metric_types = sorted({metric_type.value for q in queries for metric_type in q.metric_types})
+    query = query.filter(Metric.metric_type.in_(metric_types))
+
+    rows = query.group_by(*keys).all()
+    return {
+        tuple(row[:-4]): PartialAggregate(*row[-4:])
+        for row in rows
+        if row[-4]
+    }
+
+
+def merge_partials(partial_sets: Iterable[Dict[Tuple[int, str], PartialAggregate]]) -> Dict[Tuple[int, str], PartialAggregate]:
+    """
+    Combine partial aggregates computed over disjoint slices of the same data.
+
+    Returns:
+        Dict[Tuple[int, str], PartialAggregate]: One merged partial per (sensor_id, metric_type)
+    """
+    merged: Dict[Tuple[int, str], PartialAggregate] = {}
+    for partials in partial_sets:
+        for key, partial in partials.items():
+            current = merged.get(key)
+            if current is None:
+                merged[key] = partial
+            else:
+                merged[key] = PartialAggregate(
+                    current.count + partial.count,
+                    current.total + partial.total,
+                    min(current.minimum, partial.minimum),
+                    max(current.maximum, partial.maximum)
+                )
+    return merged
+
+
+def answer_query(query_params: QueryParams, partials: Dict[Tuple[int, str], PartialAggregate]) -> list:
+    """
+    Build the results of a single query from the partial aggregates of its window.
+
+    The results match those of query_metrics: one entry per metric type with data.
+    """
+    statistic = query_params.statistic
+    requested_sensors = set(query_params.sensor_ids) if query_params.sensor_ids else None
+
+    results = []
+    for metric_type in query_params.metric_types:
+        matching = sorted(
+            (sensor_id, partial) for (sensor_id, partial_type), partial in partials.items()
+            if partial_type == metric_type.value
+            and (requested_sensors is None or sensor_id in requested_sensors)
+        )
+        if not matching:
+            continue
+
+        sensor_id = None
+        if statistic == StatisticType.MIN:
+            sensor_id, partial = min(matching, key=lambda item: item[1].minimum)
+            value = partial.minimum
+        elif statistic == StatisticType.MAX:
+            sensor_id, partial = max(matching, key=lambda item: item[1].maximum)
+            value = partial.maximum
+        elif statistic == StatisticType.SUM:
+            value = sum(partial.total for _, partial in matching)
+        elif statistic == StatisticType.AVG:
+            value = sum(partial.total for _, partial in matching) / sum(partial.count for _, partial in matching)
+        else:
+            raise ValueError(f"Unsupported statistic type: {statistic}")
+
+        results.append(create_query_result_object(
+            statistic.value,
+            metric_type.value,
+            value,
+            [sensor for sensor, _ in matching],
+            query_params.start_date,
+            query_params.end_date,
+            sensor_id=sensor_id
+        ))
+    return results
+
+
+def execute_batch(db: Session, queries: Sequence[QueryParams]) -> List[list]:
+    """
+    Run a batch of queries with one grouped scan per group of overlapping time windows.
+
+    Returns:
+        List[list]: The results of each query, in the order the queries were given
+    """
+    default_window = (get_date_range(days_ago=1)[0], None)
+    plan = plan_batch(queries, default_window)
+
+    results: List[list] = [[] for _ in queries]
+    for window, indexes in plan.items():
+        windows = {
+            index: tuple(map(_naive, resolve_time_window(queries[index], default_window))) for index in indexes
+        }
+        if len(set(windows.values())) == 1:
+            partials = scan_window(db, window, [queries[i] for i in indexes])
+            for index in indexes:
+                results[index] = answer_query(queries[index], partials)
+            continue
+
+        boundaries = sorted({point for start, end in windows.values() for point in (start, end) if point is not None})
+        segments = scan_window(db, window, [queries[i] for i in indexes], boundaries=boundaries)
+        for index in indexes:
+            within = set(segments_within(windows[index], boundaries))
+            partials = merge_partials(
+                {(sensor_id, metric_type): partial}
+                for (sensor_id, metric_type, segment), partial in segments.items()
+                if segment in within
+            )
+            results[index] = answer_query(queries[index], partials)
+    return results
@@ -0,0 +1,155 @@
+"""
+Per-client rate limiting with token buckets.
+
+Each client gets one bucket per route class (ingestion and queries, as
+classified for admission control). A bucket holds up to burst tokens and
+refills at rate tokens per second, computed from the time since it was last
+used, so a request costs one dictionary lookup and a few arithmetic
+operations. A request finding its bucket empty gets 429 with a Retry-After
+header saying when the next token arrives.
+
+Clients are identified by the API key header when it carries one of the
+configured RATE_LIMIT_API_KEYS, otherwise by their address. Unknown keys are
+ignored, so a client cannot escape its limit, or flood the buckets and evict
+other clients, by sending a new key with every request.
+
+Buckets are kept in least recently used order. A bucket idle long enough to
+have refilled completely is the same as a new one, so such buckets are
+dropped from the old end as requests arrive. The number of
+buckets is also capped at RATE_LIMIT_MAX_CLIENTS, which bounds memory
+however many clients there are.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from fastapi.responses import JSONResponse
+
+from src.utils.admission import route_class
+from src.utils.instrumentation import registry
+
+# Sustained requests per second per client and bucket size; a rate of 0 disables the limit
+RATE_LIMIT_INGEST_RPS = float(os.getenv("RATE_LIMIT_INGEST_RPS", "0"))
+RATE_LIMIT_INGEST_BURST = float(os.getenv("RATE_LIMIT_INGEST_BURST", "0")) or max(1.0, RATE_LIMIT_INGEST_RPS)
+RATE_LIMIT_QUERY_RPS = float(os.getenv("RATE_LIMIT_QUERY_RPS", "0"))
+RATE_LIMIT_QUERY_BURST = float(os.getenv("RATE_LIMIT_QUERY_BURST", "0")) or max(1.0, RATE_LIMIT_QUERY_RPS)
+# Most clients tracked at once per route class
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Header identifying a client; requests without a configured key in it are keyed by address
+RATE_LIMIT_KEY_HEADER = os.getenv("RATE_LIMIT_KEY_HEADER", "X-API-Key").lower().encode()
+# Comma-separated API keys that get a bucket of their own
+RATE_LIMIT_API_KEYS = frozenset(
+    key.strip().encode() for key in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if key.strip()
+)
+
+registry.describe("rate_limited_total", "Requests rejected with 429 by the rate limiter, by route class.")
+registry.describe("rate_limit_evictions_total", "Client buckets dropped to keep the rate limiter bounded.")
+
+
+class TokenBuckets:
+    """
+    Token buckets for any number of clients, with idle eviction.
+
+    Used from a single event loop, so no lock is needed.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int = None):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients or RATE_LIMIT_MAX_CLIENTS
+        # Seconds an idle bucket takes to refill completely
+        self.idle_after = burst / rate
+        # Client key -> [tokens, time of last update]
+        self.buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def take(self, key: Hashable, now: float = None) -> float:
+        """
+        Take a token from the client's bucket.
+
+        Args:
+            key: Client identity
+            now (float): Current monotonic time, for tests
+
+        Returns:
+            float: 0 if the request is allowed, otherwise seconds until a token is available
+        """
+        now = time.monotonic() if now is None else now
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self._evict(now)
+            bucket = self.buckets[key] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self.buckets.move_to_end(key)
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def _evict(self, now: float) -> None:
+        evicted = 0
+        # Buckets are ordered by last use, so the idle ones are at the front
+        while self.buckets:
+            key, (_, last) = next(iter(self.buckets.items()))
+            if now - last < self.idle_after and len(self.buckets) < self.max_clients:
+                break
+            del self.buckets[key]
+            evicted += 1
+        if evicted:
+            registry.inc("rate_limit_evictions_total", amount=evicted)
+
+
+def client_key(scope, api_keys=None) -> Hashable:
+    """Identify the client of a request by its configured API key, or its address."""
+    api_keys = RATE_LIMIT_API_KEYS if api_keys is None else api_keys
+    for name, value in scope["headers"]:
+        if name == RATE_LIMIT_KEY_HEADER and value in api_keys:
+            return "key", value
+    client = scope.get("client")
+    return "address", client[0] if client else None
+
+
+def build_buckets() -> Dict[str, TokenBuckets]:
+    limits = {
+        "ingest": (RATE_LIMIT_INGEST_RPS, RATE_LIMIT_INGEST_BURST),
+        "query": (RATE_LIMIT_QUERY_RPS, RATE_LIMIT_QUERY_BURST),
+    }
+    return {name: TokenBuckets(rate, burst) for name, (rate, burst) in limits.items() if rate > 0}
+
+
+buckets = build_buckets()
+
+
+class RateLimitMiddleware:
+    """ASGI middleware rejecting HTTP requests of clients that exceed their rate with 429."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limiter: Optional[TokenBuckets] = None
+        if scope["type"] == "http" and buckets:
+            name = route_class(scope["method"], scope["path"])
+            limiter = buckets.get(name)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = limiter.take(client_key(scope))
+        if retry_after:
+            registry.inc("rate_limited_total", (("route_class", name),))
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Rate limit exceeded. Please slow down."},
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,118 @@
+"""
+In-process cache of the sensor ids that exist, consulted on the ingestion path.
+
+Sensors are never deleted through the API, so once an id has been seen in the
+sensors table it can be trusted without asking the database again. Each
+ingest request therefore only queries the sensors table for ids it has not
+seen yet, and a reading for a known sensor is stored without a sensor lookup:
+its INSERT ... RETURNING plus the latest_metrics upsert.
+The cache is warmed from the sensors table at startup and updated by
+create_sensor. Ids are cached per engine, so sessions bound to different
+databases never share entries.
+"""
+import threading
+import weakref
+from typing import Iterable, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.models.models import Sensor
+from src.utils.instrumentation import registry
+
+registry.describe("sensor_cache_hits_total", "Sensor ids found in the sensor cache.")
+registry.describe("sensor_cache_misses_total", "Sensor ids looked up in the sensors table.")
+
+
+class SensorCache:
+    """Thread-safe set of sensor ids known to exist in one database."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: Set[int] = set()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, sensor_id) -> bool:
+        return sensor_id in self._ids
+
+    def warm(self, connection) -> int:
+        """
+        Load every sensor id from the database.
+
+        Args:
+            connection: Connection or session of the cached database
+
+        Returns:
+            int: Number of ids cached
+        """
+        ids = set(connection.scalars(select(Sensor.id)))
+        with self._lock:
+            self._ids |= ids
+        return len(ids)
+
+    def add(self, sensor_id: int) -> None:
+        """Record a sensor that was just created."""
+        with self._lock:
+            self._ids.add(sensor_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+
+    def known(self, db: Session, sensor_ids: Iterable[int]) -> Set[int]:
+        """
+        Return the given sensor ids that exist.
+
+        Only ids missing from the cache are looked up, in a single query.
+
+        Args:
+            db: Database session
+            sensor_ids: Sensor ids to check
+
+        Returns:
+            Set[int]: The ids that belong to existing sensors
+        """
+        sensor_ids = set(sensor_ids)
+        # Set operations hold the GIL, so the lock is only needed when writing
+        missing = sensor_ids - self._ids
+        if sensor_ids:
+            registry.inc("sensor_cache_hits_total", amount=len(sensor_ids) - len(missing))
+        if not missing:
+            return sensor_ids
+
+        registry.inc("sensor_cache_misses_total", amount=len(missing))
+        found = set(db.scalars(select(Sensor.id).where(Sensor.id.in_(missing))))
+        if found:
+            with self._lock:
+                self._ids |= found
+        return (sensor_ids - missing) | found
+
+    def exists(self, db: Session, sensor_id: int) -> bool:
+        """Return whether a single sensor exists."""
+        return bool(self.known(db, (sensor_id,)))
+
+
+_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def sensor_cache(bind) -> SensorCache:
+    """
+    Return the sensor cache of a database.
+
+    Args:
+        bind: Engine of the database, or a session bound to it
+
+    Returns:
+        SensorCache: The cache shared by every session of that engine
+    """
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    bind = getattr(bind, "engine", bind)
+    with _caches_lock:
+        cache = _caches.get(bind)
+        if cache is None:
+            cache = _caches[bind] = SensorCache()
+        return cache
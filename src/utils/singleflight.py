@@ -0,0 +1,78 @@
+"""
+Request coalescing for identical concurrent computations.
+
+Endpoints run in Starlette's threadpool, so the same query can be executing on
+several threads at once. SingleFlight lets the first caller for a key run the
+computation while later callers with the same key wait and share its result.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """An in-flight computation and the outcome its waiters receive."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls that share a key.
+
+    Only calls that overlap in time are coalesced; nothing is cached once the
+    computation finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn for key, or wait for the in-flight call with the same key.
+
+        Args:
+            key: Hashable identity of the computation
+            fn: Zero-argument callable that computes the result
+
+        Returns:
+            The result of fn, shared by every caller that joined the flight
+
+        Raises:
+            Any exception raised by fn is re-raised in every waiter
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        """Return the number of computations currently running."""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,219 @@
+"""
+In-process fan-out of newly ingested metrics to live subscribers.
+
+Ingest endpoints run in Starlette's threadpool and publish the readings they
+commit; subscribers live on the event loop. Every reading is serialized once
+and handed to each matching subscriber's bounded queue with a single
+call_soon_threadsafe per publish. A subscriber whose queue fills up is
+dropped instead of letting its backlog grow without limit. Subscribers also
+receive coalesced per-sensor aggregates at a fixed interval, so dashboards
+can follow high-rate sensors without handling every reading.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.utils.instrumentation import registry
+
+# Messages buffered per subscriber before it is dropped as a slow consumer
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "1000"))
+# Seconds between coalesced aggregate updates
+SUBSCRIPTION_AGGREGATE_SECONDS = float(os.getenv("SUBSCRIPTION_AGGREGATE_SECONDS", "5"))
+
+registry.describe("subscriptions_opened_total", "Live metric subscriptions opened.")
+registry.describe("subscriptions_closed_total", "Live metric subscriptions closed.")
+registry.describe("subscription_messages_total", "Readings queued for live subscribers.")
+registry.describe("subscription_slow_consumers_total", "Subscribers dropped because their queue was full.")
+
+# Sentinel queued in place of the backlog when a subscriber falls behind
+DROPPED = object()
+
+
+class Subscription:
+    """A subscriber's filter, bounded queue and running aggregates."""
+
+    def __init__(self, loop, sensor_ids: Optional[Iterable[int]], metric_types: Optional[Iterable[str]],
+                 readings: bool = True, queue_size: int = None):
+        self.loop = loop
+        self.sensor_ids: Optional[Set[int]] = set(sensor_ids) if sensor_ids else None
+        self.metric_types: Optional[Set[str]] = set(metric_types) if metric_types else None
+        self.readings = readings
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = False
+        # (sensor_id, metric_type) -> [count, total, minimum, maximum, latest value, latest timestamp]
+        self.aggregates: Dict[Tuple[int, str], list] = {}
+
+    def matches(self, metric_type: str) -> bool:
+        return self.metric_types is None or metric_type in self.metric_types
+
+    def deliver(self, messages: List[Tuple[dict, str]]) -> None:
+        """Queue serialized readings and fold them into the aggregates. Runs on the subscriber's loop."""
+        if self.dropped:
+            return
+        for reading, text in messages:
+            if not self.matches(reading["metric_type"]):
+                continue
+            self._accumulate(reading)
+            if not self.readings:
+                continue
+            if self.queue.full():
+                # Discard the backlog so the sentinel reaches the consumer right away
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(DROPPED)
+                self.dropped = True
+                registry.inc("subscription_slow_consumers_total")
+                return
+            self.queue.put_nowait(text)
+            registry.inc("subscription_messages_total")
+
+    def _accumulate(self, reading: dict) -> None:
+        key = (reading["sensor_id"], reading["metric_type"])
+        value = reading["value"]
+        aggregate = self.aggregates.get(key)
+        if aggregate is None:
+            self.aggregates[key] = [1, value, value, value, value, reading["timestamp"]]
+            return
+        aggregate[0] += 1
+        aggregate[1] += value
+        aggregate[2] = min(aggregate[2], value)
+        aggregate[3] = max(aggregate[3], value)
+        if reading["timestamp"] >= aggregate[5]:
+            aggregate[4], aggregate[5] = value, reading["timestamp"]
+
+    def take_aggregates(self) -> Optional[str]:
+        """Return the aggregates since the previous call as a message, or None if nothing arrived."""
+        if not self.aggregates:
+            return None
+        aggregates, self.aggregates = self.aggregates, {}
+        return json.dumps({
+            "type": "aggregate",
+            "metrics": [
+                {
+                    "sensor_id": sensor_id,
+                    "metric_type": metric_type,
+                    "count": count,
+                    "min": minimum,
+                    "max": maximum,
+                    "avg": total / count,
+                    "latest": latest,
+                    "timestamp": timestamp,
+                }
+                for (sensor_id, metric_type), (count, total, minimum, maximum, latest, timestamp)
+                in sorted(aggregates.items())
+            ],
+        })
+
+    async def stream(self, send_text: Callable[[str], Awaitable[None]], aggregate_seconds: float = None) -> bool:
+        """
+        Send queued readings and periodic aggregates until the subscriber is dropped.
+
+        Returns:
+            bool: False once the subscriber was dropped as a slow consumer
+        """
+        interval = aggregate_seconds or SUBSCRIPTION_AGGREGATE_SECONDS
+        next_aggregate = time.monotonic() + interval
+        while True:
+            timeout = next_aggregate - time.monotonic()
+            if timeout <= 0:
+                message = self.take_aggregates()
+                if message is not None:
+                    await send_text(message)
+                next_aggregate += interval
+                continue
+            try:
+                text = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                continue
+            if text is DROPPED:
+                return False
+            await send_text(text)
+
+
+class MetricBroker:
+    """Thread-safe registry of subscriptions, indexed by sensor id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Sensor id -> subscriptions; None holds subscriptions to every sensor
+        self._by_sensor: Dict[Optional[int], Set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, sensor_ids=None, metric_types=None, readings: bool = True,
+                  queue_size: int = None) -> Subscription:
+        """Register a subscription on the running event loop."""
+        subscription = Subscription(asyncio.get_running_loop(), sensor_ids, metric_types, readings, queue_size)
+        with self._lock:
+            for sensor_id in subscription.sensor_ids or [None]:
+                self._by_sensor[sensor_id].add(subscription)
+        registry.inc("subscriptions_opened_total")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        removed = False
+        with self._lock:
+            for sensor_id in subscription.sensor_ids or [None]:
+                subscribers = self._by_sensor.get(sensor_id)
+                if subscribers is not None and subscription in subscribers:
+                    removed = True
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_sensor[sensor_id]
+        if removed:
+            registry.inc("subscriptions_closed_total")
+
+    def publish(self, metrics) -> None:
+        """
+        Fan committed metrics out to matching subscribers.
+
+        Safe to call from any thread. Each reading is serialized once, and each
+        subscriber is woken once per call however many readings match.
+
+        Args:
+            metrics: Committed Metric objects
+        """
+        self.send(self.prepare(metrics))
+
+    def prepare(self, metrics) -> Dict[Subscription, List[Tuple[dict, str]]]:
+        """
+        Serialize metrics for their subscribers without delivering them yet.
+
+        Lets bulk writers capture flushed rows before commit expires them and
+        deliver them with send once the commit succeeded.
+        """
+        batches: Dict[Subscription, List[Tuple[dict, str]]] = defaultdict(list)
+        if not self._by_sensor:
+            return batches
+
+        with self._lock:
+            for metric in metrics:
+                subscribers = self._by_sensor.get(metric.sensor_id, set()) | self._by_sensor.get(None, set())
+                if not subscribers:
+                    continue
+                reading = {
+                    "type": "reading",
+                    "id": metric.id,
+                    "sensor_id": metric.sensor_id,
+                    "metric_type": metric.metric_type,
+                    "value": metric.value,
+                    "timestamp": metric.timestamp.isoformat(),
+                }
+                message = (reading, json.dumps(reading))
+                for subscription in subscribers:
+                    batches[subscription].append(message)
+        return batches
+
+    def send(self, batches: Dict[Subscription, List[Tuple[dict, str]]]) -> None:
+        """Deliver readings returned by prepare."""
+        for subscription, messages in batches.items():
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, messages)
+            except RuntimeError:
+                # The subscriber's event loop has already shut down
+                self.unsubscribe(subscription)
+
+
+broker = MetricBroker()
@@ -1,5 +1,11 @@
+import os
+import tempfile
 from datetime import timedelta
 
+# Keep test runs from writing logs and profiles into the repository
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="weather-api-logs-"))
+os.environ.setdefault("PROFILE_DIR", tempfile.mkdtemp(prefix="weather-api-profiles-"))
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -0,0 +1,108 @@
+import gzip
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.backup import backup_database, default_backup_path, restore_database
+from src.database.database import Base
+from src.models.models import Metric, Sensor
+
+
+@pytest.fixture
+def populated_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'source.db'}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        sensor = Sensor(name="Backup Sensor", location="Test")
+        session.add(sensor)
+        session.flush()
+        session.add_all([
+            Metric(sensor_id=sensor.id, metric_type="temperature", value=float(i)) for i in range(2000)
+        ])
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def _metric_count(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_backup_database(populated_engine, tmp_path):
+    """Test that a stepped backup produces a complete copy"""
+    destination = tmp_path / "backups" / "snapshot.db"
+
+    report = backup_database(populated_engine, destination, pages_per_step=2, step_sleep=0)
+
+    assert report.path == str(destination)
+    assert report.pages > 2
+    assert report.size_bytes == destination.stat().st_size
+    assert not report.compressed
+    assert _metric_count(destination) == 2000
+
+    # No temporary snapshot files are left behind
+    assert [p.name for p in destination.parent.iterdir()] == ["snapshot.db"]
+
+
+def test_backup_finishes_under_concurrent_writes(populated_engine, tmp_path):
+    """Test that a backup restarted by every write falls back to a single step instead of looping"""
+    destination = tmp_path / "snapshot.db"
+    writing, stop = threading.Event(), threading.Event()
+
+    def write():
+        writer = sqlite3.connect(populated_engine.url.database)
+        while not stop.is_set():
+            writer.execute("INSERT INTO sensors (name, location) VALUES ('Writer', 'Test')")
+            writer.commit()
+            writing.set()
+            time.sleep(0.001)
+        writer.close()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    writing.wait()
+    try:
+        report = backup_database(populated_engine, destination, pages_per_step=1, step_sleep=0.001, max_restarts=1)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert report.restarts >= 1
+    assert _metric_count(destination) == 2000
+
+
+def test_compressed_backup_and_restore(populated_engine, tmp_path):
+    """Test that a compressed snapshot restores the database contents"""
+    destination = tmp_path / "snapshot.db.gz"
+    report = backup_database(populated_engine, destination, compress=True, step_sleep=0)
+
+    assert report.compressed
+    with gzip.open(destination, "rb") as snapshot:
+        assert snapshot.read(16) == b"SQLite format 3\x00"
+
+    # Change the database, then restore the snapshot over it
+    with sessionmaker(bind=populated_engine)() as session:
+        session.query(Metric).delete()
+        session.commit()
+
+    restore_database(populated_engine, destination)
+
+    with sessionmaker(bind=populated_engine)() as session:
+        assert session.query(Metric).count() == 2000
+        assert session.query(Sensor).first().name == "Backup Sensor"
+
+
+def test_default_backup_paths_are_unique():
+    """Test that backups taken within the same second get different file names"""
+    paths = {default_backup_path(compress=True) for _ in range(100)}
+
+    assert len(paths) == 100
+    assert all(path.name.endswith(".db.gz") for path in paths)
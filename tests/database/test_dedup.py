@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Base
+from src.database.dedup import READING_INDEX, ensure_reading_index
+from src.models.models import Metric, Sensor
+
+TIMESTAMP = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def test_ensure_reading_index_removes_duplicates(tmp_path):
+    """Test that duplicates are removed, keeping the last write, before the index is created"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'dedup.db'}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        sensor = Sensor(name="Dedup Sensor", location="Test")
+        session.add(sensor)
+        session.flush()
+        session.add_all([
+            Metric(sensor_id=sensor.id, metric_type="temperature", value=value, timestamp=TIMESTAMP)
+            for value in (1.0, 2.0, 3.0)
+        ] + [Metric(sensor_id=sensor.id, metric_type="humidity", value=50.0, timestamp=TIMESTAMP)])
+        session.commit()
+
+    with engine.begin() as connection:
+        assert ensure_reading_index(connection) == 2
+        assert connection.exec_driver_sql(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = ?", (READING_INDEX,)
+        ).scalar() == 1
+        assert ensure_reading_index(connection) == 0
+
+    with sessionmaker(bind=engine)() as session:
+        values = {metric.metric_type: metric.value for metric in session.query(Metric).all()}
+    assert values == {"temperature": 3.0, "humidity": 50.0}
+    engine.dispose()
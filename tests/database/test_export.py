@@ -0,0 +1,145 @@
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Base
+from src.database.export import ExportVerificationError, export_day, export_metrics, read_state
+from src.models.models import Metric, Sensor
+
+START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _populate(engine, days, per_day=48):
+    with sessionmaker(bind=engine)() as session:
+        sensor = Sensor(name="Export Sensor", location="Test")
+        session.add(sensor)
+        session.flush()
+        session.add_all([
+            Metric(sensor_id=sensor.id, metric_type=metric_type, value=float(i),
+                   timestamp=START + timedelta(days=day, minutes=30 * i))
+            for day in days
+            for metric_type in ("temperature", "humidity")
+            for i in range(per_day)
+        ])
+        session.commit()
+
+
+def test_export_metrics_partitions_by_day_and_type(engine, tmp_path):
+    """Test the partition layout, row groups, statistics and schema of exported files"""
+    _populate(engine, days=[0, 1])
+    output = tmp_path / "exports"
+
+    report = export_metrics(engine, output, chunk_rows=10, until=date(2025, 3, 3))
+
+    assert report.days == ["2025-03-01", "2025-03-02"]
+    assert report.files == 4
+    assert report.rows == 192
+
+    parquet_file = pq.ParquetFile(output / "date=2025-03-01" / "metric_type=temperature" / "part-0.parquet")
+    assert parquet_file.metadata.num_rows == 48
+    assert parquet_file.metadata.num_row_groups == 5
+    statistics = parquet_file.metadata.row_group(0).column(2).statistics
+    assert (statistics.min, statistics.max) == (0.0, 9.0)
+
+    table = parquet_file.read()
+    assert table.column_names == ["id", "sensor_id", "value", "timestamp"]
+    assert table.column("timestamp")[0].as_py() == START
+
+
+def test_export_metrics_is_incremental(engine, tmp_path):
+    """Test that later runs only export days after the last exported one"""
+    _populate(engine, days=[0, 1])
+    output = tmp_path / "exports"
+
+    # The day before until is still incomplete and is left for the next run
+    assert export_metrics(engine, output, until=date(2025, 3, 2)).days == ["2025-03-01"]
+    assert read_state(output).last_day == date(2025, 3, 1)
+
+    _populate(engine, days=[3])
+    report = export_metrics(engine, output, until=date(2025, 3, 10))
+
+    assert report.days == ["2025-03-02", "2025-03-04"]
+    assert read_state(output).last_day == date(2025, 3, 4)
+    assert export_metrics(engine, output, until=date(2025, 3, 10)).days == []
+    assert export_metrics(engine, output, full=True, until=date(2025, 3, 10)).rows == 288
+
+
+def test_export_metrics_rewrites_backfilled_days(engine, tmp_path):
+    """Test that readings backfilled into exported days are picked up by the next run"""
+    _populate(engine, days=[0, 1, 2])
+    output = tmp_path / "exports"
+    export_metrics(engine, output, until=date(2025, 3, 4))
+
+    # Late readings for the second day only
+    with sessionmaker(bind=engine)() as session:
+        session.add(Metric(sensor_id=1, metric_type="temperature", value=99.0,
+                           timestamp=START + timedelta(days=1, hours=23, minutes=59)))
+        session.commit()
+
+    report = export_metrics(engine, output, until=date(2025, 3, 4))
+
+    assert report.days == ["2025-03-02"]
+    parquet_file = pq.ParquetFile(output / "date=2025-03-02" / "metric_type=temperature" / "part-0.parquet")
+    assert parquet_file.metadata.num_rows == 49
+    assert export_metrics(engine, output, until=date(2025, 3, 4)).days == []
+
+
+def test_export_day_verifies_row_counts(engine, tmp_path, monkeypatch):
+    """Test that a file whose row count differs from the source is rejected"""
+    from src.database import export
+
+    _populate(engine, days=[0], per_day=5)
+    original = export._to_record_batch
+    monkeypatch.setattr(export, "_to_record_batch", lambda rows: original(rows[:-1]))
+
+    with engine.connect() as connection, pytest.raises(ExportVerificationError):
+        export_day(connection, date(2025, 3, 1), tmp_path, chunk_rows=100)
+    assert not list(tmp_path.rglob("*.parquet*"))
+
+
+def test_export_day_reads_one_snapshot(tmp_path, monkeypatch):
+    """Test that readings inserted while a day is exported do not fail its verification"""
+    from src.database import export
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    with engine.connect() as connection:
+        # Writers can commit while a WAL reader holds its snapshot
+        connection.exec_driver_sql("PRAGMA journal_mode = WAL")
+    Base.metadata.create_all(bind=engine)
+    _populate(engine, days=[0], per_day=5)
+
+    original = export._to_record_batch
+    inserted = []
+
+    def insert_during_export(rows):
+        if not inserted:
+            writer = sqlite3.connect(tmp_path / "wal.db")
+            writer.executemany(
+                "INSERT INTO metrics (sensor_id, metric_type, value, timestamp) VALUES (1, ?, 1.0, ?)",
+                [(metric_type, "2025-03-01 12:00:00.000000") for metric_type in ("temperature", "humidity")]
+            )
+            writer.commit()
+            writer.close()
+            inserted.append(True)
+        return original(rows)
+
+    monkeypatch.setattr(export, "_to_record_batch", insert_during_export)
+
+    with engine.connect() as connection:
+        written = export_day(connection, date(2025, 3, 1), tmp_path / "out", chunk_rows=100)
+
+    assert inserted
+    assert written == {"humidity": 5, "temperature": 5}
+    engine.dispose()
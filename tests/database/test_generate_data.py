@@ -0,0 +1,130 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Base
+from src.database.dedup import ensure_reading_index
+from src.database.generate_data import DEFAULT_END_DATE, format_timestamps, generate_dataset, generate_metric_values
+from src.models.models import LatestMetric, Metric, Sensor
+from src.utils import ingest
+from src.utils.helpers import get_sample_metric_ranges
+
+END_DATE = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def empty_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'generated.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _dump_metrics(engine):
+    with sessionmaker(bind=engine)() as session:
+        return [
+            (m.sensor_id, m.metric_type, m.value, m.timestamp)
+            for m in session.query(Metric).order_by(Metric.id)
+        ]
+
+
+def test_generate_dataset_counts(empty_engine):
+    """Test that N sensors x M days at the interval are generated"""
+    inserted = generate_dataset(empty_engine, sensors=3, days=2, interval_minutes=60, seed=1, end_date=END_DATE)
+
+    # 3 sensors x 48 readings x 5 metric types
+    assert inserted == 3 * 48 * 5
+
+    with sessionmaker(bind=empty_engine)() as session:
+        assert session.query(Sensor).count() == 3
+        assert session.query(Metric).count() == inserted
+        assert session.query(LatestMetric).count() == 3 * 5
+
+        last = session.query(Metric).order_by(Metric.timestamp.desc()).first()
+        assert last.timestamp == END_DATE.replace(tzinfo=None)
+
+    # Deferred indexes are rebuilt after the load
+    index_names = {index["name"] for index in inspect(empty_engine).get_indexes("metrics")}
+    assert {"ix_metrics_timestamp", "ix_metrics_metric_type"} <= index_names
+
+
+def test_generate_dataset_is_reproducible(tmp_path):
+    """Test that the same seed produces the same rows"""
+    dumps = []
+    for name in ("first.db", "second.db"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}")
+        Base.metadata.create_all(bind=engine)
+        generate_dataset(engine, sensors=2, days=1, interval_minutes=30, seed=7, end_date=END_DATE, chunk_rows=40)
+        dumps.append(_dump_metrics(engine))
+        engine.dispose()
+
+    assert dumps[0] == dumps[1]
+
+
+def test_generate_dataset_defaults_to_fixed_end_date(empty_engine):
+    """Test that the last reading is at DEFAULT_END_DATE when no end date is given"""
+    generate_dataset(empty_engine, sensors=1, days=1, interval_minutes=60, seed=1)
+
+    with sessionmaker(bind=empty_engine)() as session:
+        last = session.query(Metric).order_by(Metric.timestamp.desc()).first()
+        assert last.timestamp == DEFAULT_END_DATE.replace(tzinfo=None)
+
+
+def test_generate_dataset_rejects_sub_second_interval(empty_engine):
+    """Test that an interval rounding down to zero seconds is rejected"""
+    with pytest.raises(ValueError):
+        generate_dataset(empty_engine, sensors=1, days=1, interval_minutes=0.001, seed=1)
+
+
+def test_generate_dataset_restores_connection_settings(empty_engine):
+    """Test that the pooled connection gets its usual durability and cache settings back"""
+    with empty_engine.connect() as connection:
+        expected = [connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in ("synchronous", "cache_size")]
+
+    generate_dataset(empty_engine, sensors=1, days=1, interval_minutes=60, seed=1, end_date=END_DATE)
+
+    with empty_engine.connect() as connection:
+        assert [connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in ("synchronous", "cache_size")] == expected
+
+
+def test_generate_dataset_skips_duplicates_with_dedup(empty_engine, monkeypatch):
+    """Test that stored readings are resolved like ingestion does when the reading index exists"""
+    monkeypatch.setattr(ingest, "INGEST_DEDUP", "ignore")
+    with empty_engine.begin() as connection:
+        ensure_reading_index(connection)
+        # A reading left behind for the sensor id the generator is about to reuse
+        connection.execute(Metric.__table__.insert().values(
+            sensor_id=1, metric_type="temperature", value=-1.0, timestamp=END_DATE.replace(tzinfo=None)
+        ))
+
+    inserted = generate_dataset(empty_engine, sensors=1, days=1, interval_minutes=60, seed=1, end_date=END_DATE)
+
+    assert inserted == 24 * 5 - 1
+    with sessionmaker(bind=empty_engine)() as session:
+        assert session.query(Metric).count() == 24 * 5
+
+
+def test_generated_values_stay_in_range():
+    """Test that every metric type stays within its sample range"""
+    rng = np.random.default_rng(0)
+    seconds_of_day = np.arange(0, 86400, 60)
+
+    for metric_type, (low, high) in get_sample_metric_ranges().items():
+        values = generate_metric_values(metric_type, seconds_of_day, rng)
+        assert values.shape == seconds_of_day.shape
+        assert values.min() >= low
+        assert values.max() <= high
+
+    # Temperature peaks in the afternoon
+    temperature = generate_metric_values("temperature", seconds_of_day, rng)
+    assert temperature[15 * 60] > temperature[3 * 60]
+
+
+def test_format_timestamps():
+    """Test that timestamps match SQLAlchemy's SQLite DateTime format"""
+    epochs = np.array([int(END_DATE.timestamp())], dtype=np.int64)
+
+    assert format_timestamps(epochs).tolist() == ["2025-03-01 00:00:00.000000"]
@@ -1,7 +1,12 @@
 from unittest.mock import patch, MagicMock
+
+import pytest
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.exc import SQLAlchemyError
 
-from src.database.init_db import init_database
+from src.database import init_db
+from src.database.dedup import MissingReadingIndexError, reading_index_exists
+from src.database.init_db import SCHEMA_VERSION, ensure_schema, init_database
 
 
 @patch('src.database.init_db.Base')
@@ -38,4 +43,42 @@ def test_init_database_failure(mock_logger, mock_engine, mock_base):
     assert result is False
 
     # Verify the error was logged
-    mock_logger.error.assert_called()
\ No newline at end of file
+    mock_logger.error.assert_called()
+
+def test_ensure_schema_only_initializes_once(tmp_path):
+    """Test that the schema is created on the first start and only checked afterwards."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    try:
+        assert ensure_schema(engine) is True
+        assert {"sensors", "metrics", "latest_metrics"} <= set(inspect(engine).get_table_names())
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA user_version").scalar() == SCHEMA_VERSION
+
+        with patch('src.database.init_db.Base') as mock_base:
+            assert ensure_schema(engine) is False
+            mock_base.metadata.create_all.assert_not_called()
+    finally:
+        engine.dispose()
+
+
+def test_ensure_schema_checks_reading_index_without_cleanup(tmp_path, monkeypatch):
+    """Test that startup never removes duplicates and refuses to run dedup without the index."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    try:
+        ensure_schema(engine)
+        monkeypatch.setattr(init_db, "INGEST_DEDUP", "ignore")
+
+        with patch('src.database.init_db.ensure_reading_index') as mock_ensure:
+            with pytest.raises(MissingReadingIndexError):
+                ensure_schema(engine)
+            mock_ensure.assert_not_called()
+
+        # An upgrade creates the index once, after which startup only checks it
+        with engine.begin() as connection:
+            connection.exec_driver_sql("PRAGMA user_version = 0")
+        assert ensure_schema(engine) is True
+        with engine.connect() as connection:
+            assert reading_index_exists(connection)
+        assert ensure_schema(engine) is False
+    finally:
+        engine.dispose()
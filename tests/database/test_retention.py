@@ -0,0 +1,199 @@
+import sqlite3
+import threading
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+from src.database import retention
+from src.database.database import Base
+from src.database.retention import (
+    RetentionJob,
+    apply_retention,
+    delete_expired_idempotency_keys,
+    delete_expired_metrics,
+    enable_incremental_vacuum,
+    incremental_vacuum,
+    parse_retention_rules
+)
+from src.models.models import IdempotencyKey, LatestMetric, Metric, Sensor
+from src.utils.datetime_helper import utc_now
+from src.utils.latest_metrics import rebuild_latest_metrics
+
+
+def _create_engine(path, incremental=True):
+    engine = create_engine(f"sqlite:///{path}")
+    if incremental:
+        @event.listens_for(engine, "connect")
+        def set_auto_vacuum(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _populate(engine, now, ages_in_days, metric_types=("temperature", "rainfall"), padding=0):
+    with sessionmaker(bind=engine)() as session:
+        sensor = Sensor(name="Retention Sensor", location="Test")
+        session.add(sensor)
+        session.flush()
+        session.add_all([
+            Metric(sensor_id=sensor.id, metric_type=metric_type, value=1.0,
+                   timestamp=now - timedelta(days=age, minutes=i))
+            for age in ages_in_days
+            for metric_type in metric_types
+            for i in range(padding or 1)
+        ])
+        session.commit()
+
+
+def _count(engine, metric_type):
+    with sessionmaker(bind=engine)() as session:
+        return session.query(Metric).filter(Metric.metric_type == metric_type).count()
+
+
+def test_parse_retention_rules():
+    """Test parsing rules with day counts and forever"""
+    assert parse_retention_rules("*=90, rainfall=365,pressure=forever") == {
+        "*": 90, "rainfall": 365, "pressure": None
+    }
+
+    with pytest.raises(ValueError):
+        parse_retention_rules("temperature")
+    with pytest.raises(ValueError):
+        parse_retention_rules("*=soon")
+    with pytest.raises(ValueError):
+        parse_retention_rules("*=90,temperature=-1")
+
+
+def test_delete_expired_metrics_in_chunks(tmp_path):
+    """Test that each rule only deletes its own expired rows, chunk by chunk"""
+    engine = _create_engine(tmp_path / "retention.db")
+    now = utc_now()
+    _populate(engine, now, ages_in_days=[1, 100, 400], padding=7)
+
+    deleted = delete_expired_metrics(engine, {"*": 90, "rainfall": None}, chunk_size=3, now=now)
+
+    assert deleted == {"*": 14}
+    assert _count(engine, "temperature") == 7
+    assert _count(engine, "rainfall") == 21
+
+    deleted = delete_expired_metrics(engine, {"*": 90, "rainfall": 365}, chunk_size=3, now=now)
+
+    assert deleted == {"*": 0, "rainfall": 7}
+    assert _count(engine, "rainfall") == 14
+    engine.dispose()
+
+
+def test_delete_expired_metrics_repairs_latest_metrics(tmp_path):
+    """Test that latest readings are repointed or removed along with the readings they refer to"""
+    engine = _create_engine(tmp_path / "latest.db")
+    now = utc_now()
+    _populate(engine, now, ages_in_days=[1, 100], metric_types=("temperature",))
+    _populate(engine, now, ages_in_days=[100], metric_types=("rainfall",))
+    with engine.begin() as connection:
+        rebuild_latest_metrics(connection)
+        # Point the temperature row at its expired reading, so it has to be repointed to the newer one
+        connection.execute(LatestMetric.__table__.update().where(LatestMetric.metric_type == "temperature").values(
+            metric_id=select(Metric.id).where(Metric.metric_type == "temperature")
+            .order_by(Metric.timestamp).limit(1).scalar_subquery()
+        ))
+
+    delete_expired_metrics(engine, {"*": 90}, chunk_size=10, now=now)
+
+    with sessionmaker(bind=engine)() as session:
+        latest = session.query(LatestMetric).all()
+        remaining = session.query(Metric).filter(Metric.metric_type == "temperature").one()
+        assert [(row.metric_type, row.metric_id, row.timestamp) for row in latest] == [
+            ("temperature", remaining.id, remaining.timestamp)
+        ]
+    engine.dispose()
+
+
+def test_apply_retention_reclaims_space(tmp_path):
+    """Test that incremental vacuum shrinks the file after a large delete"""
+    engine = _create_engine(tmp_path / "vacuum.db")
+    now = utc_now()
+    _populate(engine, now, ages_in_days=[200], padding=2000)
+
+    report = apply_retention(engine, {"*": 90}, chunk_size=500, now=now)
+
+    assert report.rows_deleted == {"*": 4000}
+    assert report.bytes_reclaimed > 0
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA freelist_count").scalar() == 0
+    engine.dispose()
+
+
+def test_incremental_vacuum_requires_incremental_mode(tmp_path):
+    """Test that databases without auto_vacuum=INCREMENTAL are left alone until converted"""
+    engine = _create_engine(tmp_path / "legacy.db", incremental=False)
+    now = utc_now()
+    _populate(engine, now, ages_in_days=[200], padding=500)
+    delete_expired_metrics(engine, {"*": 90}, chunk_size=100, now=now)
+
+    assert incremental_vacuum(engine) == 0
+
+    enable_incremental_vacuum(engine)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+    engine.dispose()
+
+
+def test_retention_job_disabled_without_interval():
+    """Test that the background job only starts with a positive interval"""
+    job = RetentionJob(None, interval_minutes=0)
+    job.start()
+    assert job._thread is None
+    job.stop()
+
+
+def test_retention_job_survives_driver_errors(monkeypatch):
+    """Test that a sqlite3 error from a run is logged and the job keeps running"""
+    ran = threading.Event()
+    calls = []
+
+    def apply(engine, rules):
+        calls.append(engine)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        ran.set()
+        return retention.RetentionReport({}, 0, 0.0)
+
+    monkeypatch.setattr(retention, "apply_retention", apply)
+    job = RetentionJob(None, interval_minutes=0.0001)
+    job.start()
+    try:
+        assert ran.wait(5)
+    finally:
+        job.stop()
+    assert len(job.reports) >= 1
+
+
+def test_retention_job_rejects_bad_rules_at_start():
+    """Test that invalid rules fail when the job starts instead of killing its thread later"""
+    job = RetentionJob(None, interval_minutes=60, rules="temperature=abc")
+
+    with pytest.raises(ValueError):
+        job.start()
+    assert job._thread is None
+
+    # A disabled job never looks at its rules
+    RetentionJob(None, interval_minutes=0, rules="temperature=abc").start()
+
+
+def test_delete_expired_idempotency_keys(tmp_path):
+    """Test that only idempotency keys past their lifetime are forgotten"""
+    engine = _create_engine(tmp_path / "keys.db")
+    now = utc_now()
+    with sessionmaker(bind=engine)() as session:
+        session.add_all([
+            IdempotencyKey(key="old", response="{}", created_at=now - timedelta(days=2)),
+            IdempotencyKey(key="new", response="{}", created_at=now - timedelta(hours=1)),
+        ])
+        session.commit()
+
+    assert delete_expired_idempotency_keys(engine, now) == 1
+    with sessionmaker(bind=engine)() as session:
+        assert [key.key for key in session.query(IdempotencyKey).all()] == ["new"]
+    engine.dispose()
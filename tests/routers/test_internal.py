@@ -0,0 +1,45 @@
+def test_stats_endpoint(client, sample_sensor):
+    """Test that request and SQL metrics are exposed in Prometheus format"""
+    client.get(f"/sensors/{sample_sensor.id}")
+    client.get("/sensors/999")
+
+    response = client.get("/internal/stats/")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_requests_total{method="GET",route="/sensors/{sensor_id}",status="200"}' in body
+    assert 'http_requests_total{method="GET",route="/sensors/{sensor_id}",status="404"}' in body
+    assert 'db_statements_per_request_count{method="GET",route="/sensors/{sensor_id}"}' in body
+    assert 'query_coalesced_total{endpoint="query"}' in body
+
+
+def test_backup_endpoint_requires_admin(client, monkeypatch):
+    """Test that the backup endpoint is disabled or rejects bad tokens"""
+    from src.utils import admin
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "")
+    assert client.post("/internal/backup/").status_code == 403
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    assert client.post("/internal/backup/").status_code == 401
+    assert client.post("/internal/backup/", headers={"X-Admin-Token": "wrong"}).status_code == 401
+
+
+def test_backup_endpoint(client, sample_metrics, monkeypatch, tmp_path):
+    """Test taking a compressed snapshot through the admin endpoint"""
+    from src.database import backup
+    from src.utils import admin
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(backup, "BACKUP_DIR", tmp_path)
+
+    response = client.post("/internal/backup/?compress=true", headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["compressed"] is True
+    assert data["path"].endswith(".db.gz")
+    assert (tmp_path / data["path"].rsplit("/", 1)[-1]).exists()
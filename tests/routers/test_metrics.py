@@ -1,3 +1,6 @@
+from datetime import datetime, timedelta, timezone
+
+
 def test_create_metric(client, sample_sensor):
     """Test creating a metric via the API"""
     metric_data = {
@@ -106,4 +109,239 @@ def test_metrics_pagination(client, sample_metrics):
     # Make sure we're getting the 3rd and 4th metrics
     all_ids = [metric.id for metric in sample_metrics]
     assert data[0]["id"] in all_ids
-    assert data[1]["id"] in all_ids
\ No newline at end of file
+    assert data[1]["id"] in all_ids
+
+def test_subscribe_metrics_streams_readings(client, sample_sensor):
+    """Test that subscribers receive readings matching their filters as they are created"""
+    url = f"/metrics/subscribe/?sensor_ids={sample_sensor.id}&metric_types=temperature"
+    with client.websocket_connect(url) as websocket:
+        client.post("/metrics/", json={"sensor_id": sample_sensor.id, "metric_type": "humidity", "value": 60.0})
+        response = client.post("/metrics/", json={
+            "sensor_id": sample_sensor.id, "metric_type": "temperature", "value": 21.5
+        })
+
+        message = websocket.receive_json()
+        assert message["type"] == "reading"
+        assert message["id"] == response.json()["id"]
+        assert message["metric_type"] == "temperature"
+        assert message["value"] == 21.5
+
+
+def test_subscribe_metrics_aggregates(client, sample_sensor):
+    """Test that aggregate-only subscribers receive coalesced updates"""
+    url = "/metrics/subscribe/?readings=false&aggregate_seconds=0.05"
+    with client.websocket_connect(url) as websocket:
+        for value in (10.0, 20.0, 30.0):
+            client.post("/metrics/", json={"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": value})
+
+        metrics = []
+        while sum(item["count"] for item in metrics) < 3:
+            message = websocket.receive_json()
+            assert message["type"] == "aggregate"
+            metrics.extend(message["metrics"])
+
+    assert {item["min"] for item in metrics} <= {10.0, 20.0, 30.0}
+    assert metrics[-1]["latest"] == 30.0
+
+
+def test_ingest_metrics_stream(client, sample_sensor, monkeypatch):
+    """Test that streamed frames are stored in batches and acknowledged"""
+    from src.utils import ingest
+
+    monkeypatch.setattr(ingest, "INGEST_BATCH_SIZE", 3)
+    reading = {"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": 20.0}
+
+    with client.websocket_connect("/metrics/ingest/") as websocket:
+        websocket.send_json(reading)
+        websocket.send_json([reading, {**reading, "sensor_id": 999}, {**reading, "metric_type": "invalid"}])
+
+        ack = websocket.receive_json()
+        assert ack == {
+            "type": "ack",
+            "frames": 2,
+            "accepted": 2,
+            "rejected": [
+                {"frame": 2, "index": 2, "error": ack["rejected"][0]["error"]},
+                {"frame": 2, "index": 1, "error": "Sensor not found"},
+            ],
+        }
+
+        # A partial batch is flushed after INGEST_FLUSH_MS
+        websocket.send_text("not json")
+        websocket.send_json({**reading, "value": 25.0})
+        ack = websocket.receive_json()
+        assert ack["frames"] == 4
+        assert ack["accepted"] == 1
+        assert ack["rejected"] == [{"frame": 3, "index": 0, "error": "Invalid JSON"}]
+
+    response = client.get(f"/metrics/?sensor_id={sample_sensor.id}")
+    assert sorted(metric["value"] for metric in response.json()) == [20.0, 20.0, 25.0]
+
+
+def test_create_metrics_batch(client, sample_sensor):
+    """Test recording a batch of readings as JSON and as packed binary records"""
+    import struct
+
+    from src.utils.ingest import BINARY_CONTENT_TYPE
+
+    response = client.post("/metrics/batch/", json=[
+        {"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": 20.0},
+        {"sensor_id": 999, "metric_type": "temperature", "value": 20.0},
+    ])
+    assert response.status_code == 201
+    assert response.json() == {"accepted": 1, "rejected": [{"index": 1, "error": "Sensor not found"}]}
+
+    body = struct.pack("<IBqd", sample_sensor.id, 1, 0, 55.0) + struct.pack("<IBqd", sample_sensor.id, 4, 0, 0.5)
+    response = client.post("/metrics/batch/", content=body, headers={"Content-Type": BINARY_CONTENT_TYPE})
+    assert response.status_code == 201
+    assert response.json() == {"accepted": 2, "rejected": []}
+
+    response = client.get(f"/metrics/?sensor_id={sample_sensor.id}")
+    assert sorted((metric["metric_type"], metric["value"]) for metric in response.json()) == [
+        ("humidity", 55.0), ("rainfall", 0.5), ("temperature", 20.0)
+    ]
+
+    response = client.post("/metrics/batch/", content=b"1,2,3", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 415
+
+
+def test_create_metrics_batch_rejects_oversized_body(client, sample_sensor, monkeypatch):
+    """Test that batch bodies over METRICS_BATCH_MAX_BYTES are rejected, with or without Content-Length"""
+    from src.utils import ingest
+
+    monkeypatch.setattr(ingest, "METRICS_BATCH_MAX_BYTES", 100)
+    batch = [{"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": 20.0}] * 10
+
+    response = client.post("/metrics/batch/", json=batch)
+    assert response.status_code == 413
+
+    chunks = (b"x" * 60 for _ in range(3))
+    response = client.post("/metrics/batch/", content=chunks, headers={"Content-Type": ingest.BINARY_CONTENT_TYPE})
+    assert response.status_code == 413
+
+    response = client.post("/metrics/batch/", json=batch[:1])
+    assert response.status_code == 201
+
+
+def test_create_metrics_batch_parses_off_the_event_loop(client, sample_sensor, monkeypatch):
+    """Test that batch bodies are parsed and validated in the threadpool"""
+    import asyncio
+
+    from src.utils import ingest
+
+    on_event_loop = []
+    add_json = ingest.IngestBatch.add_json
+
+    def recording_add_json(self, frame, data):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return add_json(self, frame, data)
+
+    monkeypatch.setattr(ingest.IngestBatch, "add_json", recording_add_json)
+
+    response = client.post("/metrics/batch/", json=[
+        {"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": 20.0}
+    ])
+
+    assert response.status_code == 201
+    assert on_event_loop == [False]
+
+
+def test_ingest_metrics_binary_frames(client, sample_sensor):
+    """Test that binary frames on the ingestion stream are stored and acknowledged"""
+    import struct
+
+    with client.websocket_connect("/metrics/ingest/") as websocket:
+        websocket.send_bytes(struct.pack("<IBqd", sample_sensor.id, 0, 0, 18.5) * 2)
+        websocket.send_bytes(b"\x00" * 5)
+        ack = websocket.receive_json()
+
+    assert ack["frames"] == 2
+    assert ack["accepted"] == 2
+    assert ack["rejected"][0]["frame"] == 2
+
+
+def test_create_metric_backfill(client, sample_sensor):
+    """Test that backfilled readings keep their timestamp without replacing newer latest values"""
+    now = datetime.now(timezone.utc)
+    reading = {"sensor_id": sample_sensor.id, "metric_type": "temperature"}
+
+    response = client.post("/metrics/", json={**reading, "value": 21.0, "timestamp": now.isoformat()})
+    assert response.status_code == 201
+
+    # A reading buffered by a gateway for two hours, sent as epoch milliseconds
+    two_hours_ago = now - timedelta(hours=2)
+    response = client.post("/metrics/", json={
+        **reading, "value": 15.0, "timestamp": int(two_hours_ago.timestamp() * 1000)
+    })
+    assert response.status_code == 201
+    assert datetime.fromisoformat(response.json()["timestamp"]).replace(tzinfo=timezone.utc) == \
+        two_hours_ago.replace(microsecond=two_hours_ago.microsecond // 1000 * 1000)
+
+    latest = client.get(f"/sensors/{sample_sensor.id}/latest/").json()
+    assert [(item["metric_type"], item["value"]) for item in latest] == [("temperature", 21.0)]
+
+
+def test_create_metric_deduplicated(client, sample_sensor, test_db, monkeypatch):
+    """Test that a retried reading is stored once when deduplication is enabled"""
+    from src.database.dedup import ensure_reading_index
+    from src.utils import ingest
+
+    ensure_reading_index(test_db.connection())
+    test_db.commit()
+    monkeypatch.setattr(ingest, "INGEST_DEDUP", "ignore")
+    reading = {"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": 20.0,
+               "timestamp": "2025-03-01T12:00:00Z"}
+
+    first = client.post("/metrics/", json=reading)
+    retry = client.post("/metrics/", json=reading)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json()["id"] == first.json()["id"]
+    assert len(client.get(f"/metrics/?sensor_id={sample_sensor.id}").json()) == 1
+
+
+def test_create_metric_deduplicated_without_timestamp(client, sample_sensor, test_db, monkeypatch):
+    """Test that an ignored duplicate stamped at receipt returns the stored reading"""
+    from src.database.dedup import ensure_reading_index
+    from src.utils import ingest
+
+    ensure_reading_index(test_db.connection())
+    test_db.commit()
+    monkeypatch.setattr(ingest, "INGEST_DEDUP", "ignore")
+    monkeypatch.setattr(ingest, "utc_now", lambda: datetime(2025, 3, 1, 12, 0, 0, 123456, tzinfo=timezone.utc))
+    reading = {"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": 20.0}
+
+    first = client.post("/metrics/", json=reading)
+    retry = client.post("/metrics/", json=reading)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+
+
+def test_create_metric_timestamp_matches_listing(client, sample_sensor):
+    """Test that a created reading is serialized the same way as when it is listed"""
+    created = client.post("/metrics/", json={"sensor_id": sample_sensor.id, "metric_type": "temperature",
+                                             "value": 20.0, "timestamp": "2025-03-01T12:00:00Z"}).json()
+
+    listed = client.get(f"/metrics/?sensor_id={sample_sensor.id}").json()
+    latest = client.get(f"/sensors/{sample_sensor.id}/latest/").json()
+
+    assert created["timestamp"] == listed[0]["timestamp"] == latest[0]["timestamp"] == "2025-03-01T12:00:00"
+
+
+def test_create_metrics_batch_idempotency_key(client, sample_sensor):
+    """Test that a batch retried with the same Idempotency-Key is answered from the first upload"""
+    batch = [{"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": 20.0}]
+    headers = {"Idempotency-Key": "gateway-7-batch-42"}
+
+    first = client.post("/metrics/batch/", json=batch, headers=headers)
+    retry = client.post("/metrics/batch/", json=batch, headers=headers)
+
+    assert first.json() == retry.json() == {"accepted": 1, "rejected": []}
+    assert "idempotent-replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(client.get(f"/metrics/?sensor_id={sample_sensor.id}").json()) == 1
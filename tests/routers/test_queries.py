@@ -4,8 +4,11 @@ These tests verify the query functionality with actual API requests.
 """
 from datetime import datetime, timedelta, timezone
 
+import pytest
 from fastapi.testclient import TestClient
 
+from src.utils.query_planner import QUERY_BATCH_MAX_QUERIES
+
 
 def setup_test_data(client):
     """Helper function to set up test data for query tests."""
@@ -205,4 +208,84 @@ def test_query_date_range(client: TestClient):
 
     # Should have no results since our data is in the past
     future_results = future_response.json()
-    assert len(future_results) == 0, "Should have no results for future dates"
\ No newline at end of file
+    assert len(future_results) == 0, "Should have no results for future dates"
+
+def test_query_batch_matches_single_queries(client: TestClient):
+    """Test that each batch result equals the result of the same single query."""
+    sensor_ids, _ = setup_test_data(client)
+    now = datetime.now(timezone.utc)
+
+    queries = [
+        {"sensor_ids": sensor_ids, "metric_types": ["temperature", "humidity"], "statistic": "avg"},
+        {"sensor_ids": [sensor_ids[1]], "metric_types": ["temperature"], "statistic": "max"},
+        {"metric_types": ["humidity"], "statistic": "min"},
+        {
+            "sensor_ids": sensor_ids,
+            "metric_types": ["temperature"],
+            "statistic": "sum",
+            "start_date": (now - timedelta(days=7)).isoformat(),
+            "end_date": now.isoformat()
+        },
+        {"metric_types": ["rainfall"], "statistic": "avg"},
+    ]
+
+    response = client.post("/query/batch/", json=queries)
+    assert response.status_code == 200
+
+    batch_results = response.json()
+    assert len(batch_results) == len(queries)
+
+    for query, batch_result in zip(queries, batch_results):
+        single_response = client.post("/query/", json=query)
+        assert single_response.status_code == 200
+        single_result = single_response.json()
+
+        assert len(batch_result) == len(single_result)
+        for batch_item, single_item in zip(batch_result, single_result):
+            assert batch_item["metric_type"] == single_item["metric_type"]
+            assert batch_item["statistic"] == single_item["statistic"]
+            assert batch_item["value"] == pytest.approx(single_item["value"])
+            assert batch_item.get("sensor_id") == single_item.get("sensor_id")
+            assert sorted(batch_item.get("sensor_ids", [])) == sorted(single_item.get("sensor_ids", []))
+
+
+def test_query_batch_invalid_query(client: TestClient):
+    """Test that an invalid sub-query rejects the whole batch."""
+    queries = [
+        {"metric_types": ["temperature"], "statistic": "avg"},
+        {"metric_types": ["temperature"], "statistic": "median"},
+    ]
+
+    response = client.post("/query/batch/", json=queries)
+    assert response.status_code == 422
+
+
+def test_query_batch_too_many_queries(client: TestClient):
+    """Test that batches over QUERY_BATCH_MAX_QUERIES are rejected."""
+    query = {"metric_types": ["temperature"], "statistic": "avg"}
+
+    assert client.post("/query/batch/", json=[query] * QUERY_BATCH_MAX_QUERIES).status_code == 200
+    assert client.post("/query/batch/", json=[query] * (QUERY_BATCH_MAX_QUERIES + 1)).status_code == 422
+
+
+def test_query_stats(client: TestClient):
+    """Test the coalescing counters endpoint."""
+    response = client.get("/query/stats/")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert isinstance(data["coalesced_queries"], int)
+    assert isinstance(data["coalesced_weekly_averages"], int)
+
+
+def test_query_key_normalization():
+    """Test that equivalent queries map to the same coalescing key."""
+    from src.routers.queries import _query_key
+    from src.schemas.schemas import QueryParams
+
+    first = QueryParams(sensor_ids=[2, 1, 2], metric_types=["temperature"], statistic="avg")
+    second = QueryParams(sensor_ids=[1, 2], metric_types=["temperature"], statistic="avg")
+    other = QueryParams(sensor_ids=[1, 2], metric_types=["temperature"], statistic="max")
+
+    assert _query_key(first) == _query_key(second)
+    assert _query_key(first) != _query_key(other)
@@ -1,3 +1,5 @@
+from sqlalchemy import event
+
 from src.models.models import Sensor
 
 
@@ -18,6 +20,20 @@ def test_create_sensor(client):
     assert "created_at" in data
 
 
+def test_create_sensor_single_statement(client, test_db):
+    """Test that a sensor is created and read back with one statement"""
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    response = client.post("/sensors/", json={"name": "Roof Sensor", "location": "Roof"})
+
+    assert response.status_code == 201
+    assert len(statements) == 1
+    assert statements[0].startswith("INSERT INTO sensors")
+    assert test_db.get(Sensor, response.json()["id"]).created_at is not None
+
+
 def test_get_sensors_empty(client):
     """Test getting all sensors when none exist"""
     response = client.get("/sensors/")
@@ -79,4 +95,32 @@ def test_pagination(client, test_db):
     data = response.json()
     assert len(data) == 5
     assert data[0]["name"] == "Sensor 5"
-    assert data[4]["name"] == "Sensor 9"
\ No newline at end of file
+    assert data[4]["name"] == "Sensor 9"
+
+def test_get_latest_metrics(client, sample_sensor):
+    """Test that the latest endpoints return the newest reading per metric type"""
+    for value in (20.0, 21.5):
+        client.post("/metrics/", json={"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": value})
+    client.post("/metrics/", json={"sensor_id": sample_sensor.id, "metric_type": "humidity", "value": 50.0})
+
+    response = client.get(f"/sensors/{sample_sensor.id}/latest/")
+    assert response.status_code == 200
+    data = response.json()
+    assert [(m["metric_type"], m["value"]) for m in data] == [("humidity", 50.0), ("temperature", 21.5)]
+
+    response = client.get("/sensors/latest/")
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+    # The path without the trailing slash must not be taken for a sensor id
+    response = client.get("/sensors/latest", follow_redirects=False)
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+def test_get_latest_metrics_invalid_sensor(client):
+    """Test the latest endpoint for a non-existent sensor"""
+    response = client.get("/sensors/999/latest/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Sensor not found"
@@ -48,6 +48,22 @@ def test_metric_create_schema():
         MetricCreate(sensor_id=1, metric_type="invalid", value=25.5)
 
 
+def test_metric_create_timestamp():
+    """Test the optional reading timestamp in ISO-8601 and epoch formats"""
+    expected = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+    base = {"sensor_id": 1, "metric_type": "temperature", "value": 25.5}
+
+    assert MetricCreate(**base).timestamp is None
+    for timestamp in ("2025-03-01T12:00:00Z", "2025-03-01T14:00:00+02:00", "2025-03-01T12:00:00",
+                      1740830400, 1740830400000):
+        assert MetricCreate(**base, timestamp=timestamp).timestamp == expected
+
+    # Readings from the future are rejected, allowing for some clock skew
+    MetricCreate(**base, timestamp=datetime.now(timezone.utc) + timedelta(minutes=1))
+    with pytest.raises(ValidationError):
+        MetricCreate(**base, timestamp=datetime.now(timezone.utc) + timedelta(hours=1))
+
+
 def test_query_params_schema():
     """Test QueryParams schema validation"""
     # Valid data with all fields
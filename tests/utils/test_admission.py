@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from src.utils import admission
+from src.utils.admission import AdmissionLimiter, Overloaded, route_class
+
+
+def test_route_class():
+    """Test that ingestion and queries are limited separately and internal routes are not limited"""
+    assert route_class("POST", "/metrics/") == "ingest"
+    assert route_class("POST", "/metrics/batch/") == "ingest"
+    assert route_class("GET", "/metrics/") == "query"
+    assert route_class("GET", "/sensors/1/latest/") == "query"
+    assert route_class("POST", "/query/") == "query"
+    assert route_class("GET", "/internal/stats/") is None
+    assert route_class("GET", "/") is None
+
+
+def test_queued_request_receives_released_slot():
+    """Test that a request over the limit waits and is handed the next free slot"""
+    async def scenario():
+        limiter = AdmissionLimiter(limit=1, max_wait=1.0)
+        assert await limiter.acquire() == 0.0
+
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert len(limiter.waiters) == 1
+
+        limiter.release(0.05)
+        waited = await waiting
+        assert waited >= 0
+        assert limiter.in_flight == 1
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_request_shed_when_estimated_wait_too_long():
+    """Test that a request is rejected at once when the queue ahead is expected to take too long"""
+    async def scenario():
+        limiter = AdmissionLimiter(limit=1, max_wait=0.5, initial_service_time=1.0)
+        await limiter.acquire()
+
+        with pytest.raises(Overloaded) as excinfo:
+            await limiter.acquire()
+
+        assert excinfo.value.reason == "estimated_wait"
+        assert excinfo.value.retry_after == pytest.approx(1.0)
+        assert not limiter.waiters
+
+    asyncio.run(scenario())
+
+
+def test_request_shed_after_waiting_too_long():
+    """Test that a queued request gives up after max_wait and leaves the queue"""
+    async def scenario():
+        limiter = AdmissionLimiter(limit=1, max_wait=0.05, initial_service_time=0.001)
+        await limiter.acquire()
+
+        with pytest.raises(Overloaded) as excinfo:
+            await limiter.acquire()
+
+        assert excinfo.value.reason == "timeout"
+        assert not limiter.waiters
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_middleware_returns_503_with_retry_after(client, monkeypatch):
+    """Test that a request over the limit gets 503 and Retry-After while other classes are served"""
+    full = AdmissionLimiter(limit=1, max_wait=0.5, initial_service_time=2.0)
+    full.in_flight = 1
+    monkeypatch.setitem(admission.limiters, "ingest", full)
+
+    response = client.post("/metrics/", json={"sensor_id": 1, "metric_type": "temperature", "value": 1.0})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert client.get("/metrics/").status_code == 200
+
+    stats = client.get("/internal/stats/").text
+    assert 'admission_shed_total{route_class="ingest",reason="estimated_wait"} 1' in stats
+    assert 'admission_queue_seconds_count{route_class="query"}' in stats
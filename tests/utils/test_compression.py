@@ -0,0 +1,98 @@
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.utils.compression import CompressionMiddleware, available_encodings, choose_encoding
+
+LARGE = {"values": list(range(2000))}
+
+
+def make_client(**options):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, **options)
+
+    @app.get("/large")
+    def large():
+        return LARGE
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/sensor")
+    def get_sensor():
+        return LARGE
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"line {i}\n" for i in range(1000)), media_type="text/plain")
+
+    @app.get("/binary")
+    def binary():
+        return PlainTextResponse(b"x" * 5000, media_type="application/octet-stream")
+
+    return TestClient(app)
+
+
+def test_choose_encoding():
+    """Test that our preference order is used among the encodings the client accepts"""
+    assert choose_encoding("gzip, deflate, br", ["zstd", "br", "gzip"]) == "br"
+    assert choose_encoding("gzip;q=1.0, br;q=0", ["br", "gzip"]) == "gzip"
+    assert choose_encoding("*", ["zstd"]) == "zstd"
+    assert choose_encoding("identity", ["gzip"]) is None
+
+
+def test_unknown_encodings_are_skipped():
+    """Test that unknown encodings are dropped from the configuration"""
+    assert available_encodings(["lz4", "gzip"]) == ["gzip"]
+
+
+def test_large_response_is_compressed():
+    """Test that a body over the threshold is gzip-compressed with a matching Content-Length"""
+    client = make_client(encodings=["gzip"], minimum_size=1024)
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == LARGE
+    assert int(response.headers["content-length"]) < len(response.content)
+
+
+def test_small_skipped_and_binary_responses_are_not_compressed():
+    """Test the size threshold, skipped routes, content types and clients without gzip"""
+    client = make_client(encodings=["gzip"], minimum_size=1024, skip_routes={"get_sensor"})
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/sensor", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/binary", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streaming_response_is_compressed_per_chunk():
+    """Test that a streamed body is compressed as it is produced and decodes to the original"""
+    client = make_client(encodings=["gzip"], minimum_size=1024)
+
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw).decode() == "".join(f"line {i}\n" for i in range(1000))
+    # Chunks are flushed as they are sent, so a partial stream can already be decoded
+    assert zlib.decompressobj(31).decompress(raw[:len(raw) // 2]).startswith(b"line 0\n")
+
+
+@pytest.mark.parametrize("encoding, module", [("zstd", "zstandard"), ("br", "brotli")])
+def test_optional_encodings(encoding, module):
+    """Test zstd and brotli when their packages are installed"""
+    pytest.importorskip(module)
+    client = make_client(encodings=[encoding, "gzip"], minimum_size=1024)
+
+    response = client.get("/large", headers={"Accept-Encoding": f"{encoding}, gzip"})
+
+    assert response.headers["content-encoding"] == encoding
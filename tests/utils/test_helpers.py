@@ -9,7 +9,10 @@ from src.schemas.schemas import (
     StatisticType
 )
 from src.utils.helpers import (
+    epoch_timestamp_range,
     generate_timestamp_range,
+    iter_epoch_chunks,
+    iter_timestamp_range,
     get_sample_metric_ranges,
     get_statistic_query,
     create_query_result_object
@@ -44,6 +47,49 @@ def test_generate_timestamp_range():
     assert timestamps[2] == end
 
 
+def test_iter_timestamp_range():
+    """Test that the generator variant yields the same timestamps lazily"""
+    start = datetime(2023, 1, 1, 0, 0, 0)
+    end = datetime(2023, 1, 1, 12, 0, 0)
+
+    timestamps = iter_timestamp_range(start, end, timedelta(hours=3))
+
+    # Nothing is materialized until the generator is consumed
+    assert not isinstance(timestamps, list)
+    assert list(timestamps) == generate_timestamp_range(start, end)
+
+    # Minute resolution
+    minutes = list(iter_timestamp_range(start, start + timedelta(hours=1), timedelta(minutes=1)))
+    assert len(minutes) == 61
+
+    with pytest.raises(ValueError):
+        next(iter_timestamp_range(start, end, timedelta(0)))
+
+
+def test_epoch_timestamp_range():
+    """Test the NumPy epoch-second variant"""
+    start = datetime(2023, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
+    end = datetime(2023, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+    epochs = epoch_timestamp_range(start, end, 3 * 3600)
+
+    assert epochs.dtype == "int64"
+    assert epochs.tolist() == [int(ts.timestamp()) for ts in generate_timestamp_range(start, end)]
+    assert str(epochs.astype("datetime64[s]")[0]) == "2023-01-01T00:00:00"
+
+
+def test_iter_epoch_chunks():
+    """Test that chunks are bounded and cover the full range in order"""
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(hours=1)
+
+    chunks = list(iter_epoch_chunks(start, end, 60, chunk_size=25))
+
+    assert [chunk.size for chunk in chunks] == [25, 25, 11]
+    combined = [epoch for chunk in chunks for epoch in chunk.tolist()]
+    assert combined == epoch_timestamp_range(start, end, 60).tolist()
+
+
 def test_get_sample_metric_ranges():
     """Test the get_sample_metric_ranges helper function"""
     ranges = get_sample_metric_ranges()
@@ -0,0 +1,131 @@
+import struct
+from datetime import datetime, timezone
+
+import pytest
+
+from src.database.dedup import ensure_reading_index
+from src.models.models import LatestMetric, Metric
+from src.schemas.schemas import MetricCreate
+from src.utils.ingest import (
+    METRIC_CODES,
+    RECORD_SIZE,
+    IngestBatch,
+    decode_records,
+    insert_rows,
+    parse_frame,
+    store_batch,
+    store_metrics,
+    store_records
+)
+
+
+def test_parse_frame():
+    """Test parsing single readings, lists and frames with invalid readings"""
+    readings, errors = parse_frame('{"sensor_id": 1, "metric_type": "humidity", "value": 50}')
+    assert [(index, reading.metric_type.value) for index, reading in readings] == [(0, "humidity")]
+    assert errors == []
+
+    readings, errors = parse_frame(
+        b'[{"sensor_id": 1, "metric_type": "humidity", "value": 50}, {"sensor_id": 1, "value": 2}]'
+    )
+    assert [index for index, _ in readings] == [0]
+    assert [index for index, _ in errors] == [1]
+
+    assert parse_frame("{") == ([], [(0, "Invalid JSON")])
+
+
+def test_store_metrics(test_db, sample_sensor):
+    """Test that readings for known sensors are stored in one batch with their latest values"""
+    readings = [
+        MetricCreate(sensor_id=sample_sensor.id, metric_type="temperature", value=value)
+        for value in (10.0, 12.0)
+    ] + [MetricCreate(sensor_id=999, metric_type="temperature", value=1.0)]
+
+    assert store_metrics(test_db, readings) == (2, [2])
+    assert test_db.query(Metric).count() == 2
+    assert test_db.query(LatestMetric).one().value == 12.0
+
+
+def _pack(*records):
+    return b"".join(struct.pack("<IBqd", *record) for record in records)
+
+
+def test_decode_records():
+    """Test decoding packed records into columns"""
+    records = decode_records(_pack((7, 1, 1740830400000000, 55.5), (8, 0, 0, -3.25)))
+
+    assert records["sensor_id"].tolist() == [7, 8]
+    assert records["metric_code"].tolist() == [1, 0]
+    assert records["timestamp"].tolist() == [1740830400000000, 0]
+    assert records["value"].tolist() == [55.5, -3.25]
+
+    with pytest.raises(ValueError):
+        decode_records(b"\x00" * (RECORD_SIZE + 1))
+
+
+def test_store_records(test_db, sample_sensor):
+    """Test that binary records are stored with ids, timestamps and latest values"""
+    timestamp = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+    epoch_us = int(timestamp.timestamp() * 1_000_000)
+    records = decode_records(_pack(
+        (sample_sensor.id, 0, epoch_us + 60_000_000, 21.0),
+        (sample_sensor.id, 0, epoch_us, 20.0),
+        (sample_sensor.id, METRIC_CODES.index("humidity"), 0, 50.0),
+        (999, 0, epoch_us, 1.0),
+        (sample_sensor.id, 200, epoch_us, 1.0),
+        (sample_sensor.id, 0, -1, 1.0),
+    ))
+
+    assert store_records(test_db, records) == (3, [3, 4, 5])
+
+    metrics = test_db.query(Metric).order_by(Metric.id).all()
+    assert [(metric.metric_type, metric.value) for metric in metrics] == [
+        ("temperature", 21.0), ("temperature", 20.0), ("humidity", 50.0)
+    ]
+    assert metrics[1].timestamp == timestamp.replace(tzinfo=None)
+
+    latest = {item.metric_type: item for item in test_db.query(LatestMetric).all()}
+    assert latest["temperature"].value == 21.0
+    assert latest["temperature"].metric_id == metrics[0].id
+    assert latest["humidity"].metric_id == metrics[2].id
+
+
+def test_ingest_batch_maps_rejections_to_frames(test_db, sample_sensor):
+    """Test that rejected readings are reported with their own frame and index"""
+    batch = IngestBatch()
+    batch.add_json(1, '[{"sensor_id": 999, "metric_type": "humidity", "value": 1}]')
+    batch.add_binary(2, _pack((sample_sensor.id, 0, 0, 1.0), (999, 0, 0, 1.0)))
+    batch.add_binary(3, _pack((999, 0, 0, 1.0), (sample_sensor.id, 0, 0, 1.0)))
+    batch.add_binary(4, b"\x01")
+
+    assert len(batch) == 5
+    accepted, rejected = batch.store(test_db)
+
+    assert accepted == 2
+    assert [(item["frame"], item["index"]) for item in rejected] == [(4, 0), (1, 0), (2, 1), (3, 0)]
+
+
+def test_insert_rows_deduplicates(test_db, sample_sensor):
+    """Test that ON CONFLICT skips or overwrites readings that are already stored"""
+    ensure_reading_index(test_db.connection())
+    row = (sample_sensor.id, "temperature", 20.0, "2025-03-01 12:00:00.000000")
+
+    assert len(insert_rows(test_db, [row], dedup="ignore")) == 1
+    assert insert_rows(test_db, [row[:2] + (21.0,) + row[3:]], dedup="ignore") == []
+    assert test_db.query(Metric).one().value == 20.0
+
+    replaced = insert_rows(test_db, [row[:2] + (22.0,) + row[3:]], dedup="replace")
+    assert [reading.value for reading in replaced] == [22.0]
+    assert test_db.query(Metric).one().value == 22.0
+
+
+def test_store_batch_replays_idempotency_key(test_db, sample_sensor):
+    """Test that an upload retried with the same key is stored once"""
+    def upload():
+        batch = IngestBatch()
+        batch.add_json(0, f'[{{"sensor_id": {sample_sensor.id}, "metric_type": "humidity", "value": 40}}]')
+        return store_batch(test_db, batch, "upload-1")
+
+    assert upload() == ({"accepted": 1, "rejected": []}, False)
+    assert upload() == ({"accepted": 1, "rejected": []}, True)
+    assert test_db.query(Metric).count() == 1
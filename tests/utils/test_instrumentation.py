@@ -0,0 +1,62 @@
+from sqlalchemy import text
+
+from src.utils import instrumentation
+from src.utils.instrumentation import Histogram, MetricsRegistry, RequestStats
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test that the rendered buckets follow the Prometheus format"""
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+
+    lines = histogram.render("latency", (("route", "/"),))
+
+    assert lines == [
+        'latency_bucket{route="/",le="0.1"} 1',
+        'latency_bucket{route="/",le="1.0"} 3',
+        'latency_bucket{route="/",le="+Inf"} 4',
+        'latency_sum{route="/"} 6.05',
+        'latency_count{route="/"} 4',
+    ]
+
+
+def test_registry_render():
+    """Test that counters and histograms are rendered with HELP and TYPE lines"""
+    registry = MetricsRegistry()
+    registry.describe("requests_total", "Requests served.")
+    registry.inc("requests_total", (("route", '/a"b'),))
+    registry.inc("requests_total", (("route", '/a"b'),))
+    registry.observe("duration_seconds", 0.2)
+
+    output = registry.render()
+
+    assert "# HELP requests_total Requests served." in output
+    assert "# TYPE requests_total counter" in output
+    assert 'requests_total{route="/a\\"b"} 2' in output
+    assert "# TYPE duration_seconds histogram" in output
+    assert "duration_seconds_count 1" in output
+
+
+def test_cursor_hooks_count_statements(test_db):
+    """Test that statements are attributed to the current request"""
+    stats = RequestStats()
+    token = instrumentation._current_request.set(stats)
+    try:
+        test_db.execute(text("SELECT 1"))
+        test_db.execute(text("SELECT 2"))
+    finally:
+        instrumentation._current_request.reset(token)
+
+    assert stats.statements == 2
+    assert stats.db_time > 0
+
+
+def test_slow_queries_are_logged(test_db, monkeypatch, caplog):
+    """Test that statements over the threshold are logged"""
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+
+    test_db.execute(text("SELECT 42"))
+
+    assert "Slow query" in caplog.text
+    assert "SELECT 42" in caplog.text
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from src.models.models import LatestMetric, Metric
+from src.utils.datetime_helper import utc_now
+from src.utils.latest_metrics import (
+    get_latest_metrics,
+    rebuild_latest_metrics,
+    upsert_latest_metrics
+)
+
+
+def _add_metric(test_db, sensor_id, metric_type, value, timestamp):
+    metric = Metric(sensor_id=sensor_id, metric_type=metric_type, value=value, timestamp=timestamp)
+    test_db.add(metric)
+    test_db.flush()
+    return metric
+
+
+def test_upsert_keeps_newest_reading(test_db, sample_sensor):
+    """Test that newer readings replace older ones and late readings do not"""
+    now = utc_now()
+
+    first = _add_metric(test_db, sample_sensor.id, "temperature", 20.0, now - timedelta(hours=1))
+    upsert_latest_metrics(test_db, [first])
+
+    newer = _add_metric(test_db, sample_sensor.id, "temperature", 22.0, now)
+    upsert_latest_metrics(test_db, [newer])
+
+    late = _add_metric(test_db, sample_sensor.id, "temperature", 18.0, now - timedelta(hours=2))
+    upsert_latest_metrics(test_db, [late])
+    test_db.commit()
+
+    latest = get_latest_metrics(test_db, sample_sensor.id)
+    assert len(latest) == 1
+    assert latest[0].value == 22.0
+    assert latest[0].metric_id == newer.id
+
+
+def test_upsert_batch_picks_newest_per_type(test_db, sample_sensor):
+    """Test that a batch only records the newest reading per metric type"""
+    now = utc_now()
+    batch = [
+        _add_metric(test_db, sample_sensor.id, "temperature", 20.0, now - timedelta(hours=1)),
+        _add_metric(test_db, sample_sensor.id, "temperature", 21.0, now),
+        _add_metric(test_db, sample_sensor.id, "humidity", 55.0, now),
+    ]
+    upsert_latest_metrics(test_db, batch)
+    test_db.commit()
+
+    latest = {row.metric_type: row.value for row in get_latest_metrics(test_db)}
+    assert latest == {"humidity": 55.0, "temperature": 21.0}
+
+
+def test_rebuild_latest_metrics(test_db, sample_sensor, sample_metrics):
+    """Test that rebuilding derives the latest rows from the metrics table"""
+    rebuild_latest_metrics(test_db)
+    test_db.commit()
+
+    latest = test_db.query(LatestMetric).order_by(LatestMetric.metric_type).all()
+    assert [row.metric_type for row in latest] == ["humidity", "temperature"]
+
+    newest_timestamp = max(m.timestamp for m in sample_metrics)
+    for row in latest:
+        assert row.sensor_id == sample_sensor.id
+        assert row.timestamp == newest_timestamp.replace(tzinfo=None)
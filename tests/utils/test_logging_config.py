@@ -1,7 +1,11 @@
 """
 Unit tests for the logging_config module.
 """
+import json
 import logging
+import os
+import subprocess
+import sys
 from pathlib import Path
 
 import pytest
@@ -26,20 +30,24 @@ def test_logger_setup():
 
 
 def test_logger_handlers():
-    """Test that the logger has the correct handlers."""
+    """Test that the logger hands records to a background queue listener."""
     # Get the logger
-    logger = logging_config.logger
+    logger, _ = logging_config.setup_logger()
+
+    # The request thread only enqueues records
+    assert [type(h) for h in logger.handlers] == [logging.handlers.QueueHandler]
 
-    # Should have at least 2 handlers (console and file)
-    assert len(logger.handlers) >= 2
+    # The listener owns the console and file handlers
+    listener = logging_config.listener
+    assert listener._thread is not None
+    assert listener.respect_handler_level is True
 
-    # Verify handler types
-    handler_types = [type(h) for h in logger.handlers]
+    handler_types = [type(h) for h in listener.handlers]
     assert logging.StreamHandler in handler_types
     assert logging.handlers.RotatingFileHandler in handler_types
 
     # Verify file handler configuration
-    file_handlers = [h for h in logger.handlers if isinstance(h, logging.handlers.RotatingFileHandler)]
+    file_handlers = [h for h in listener.handlers if isinstance(h, logging.handlers.RotatingFileHandler)]
     assert len(file_handlers) > 0
 
     file_handler = file_handlers[0]
@@ -47,10 +55,30 @@ def test_logger_handlers():
     assert file_handler.backupCount == 5
 
 
+def test_setup_logger_is_idempotent():
+    """Test that setting up logging again keeps a single listener and queue handler."""
+    first = logging_config.setup_logger()
+    second = logging_config.setup_logger()
+
+    assert first == second
+    assert len(logging_config.logger.handlers) == 1
+
+
+def test_import_has_no_side_effects(tmp_path):
+    """Test that importing the app creates no log directory and no database until it starts."""
+    root = Path(__file__).resolve().parents[2]
+    env = {**os.environ, "PYTHONPATH": str(root)}
+
+    subprocess.run([sys.executable, "-c", "import src.main"], cwd=tmp_path, env=env, check=True)
+
+    assert list(tmp_path.iterdir()) == []
+
+
 def test_logs_directory_creation():
     """Test that the logs directory is created."""
+    logging_config.setup_logger()
     # The logs directory should exist
-    logs_dir = Path("logs")
+    logs_dir = logging_config.log_dir
     assert logs_dir.exists()
     assert logs_dir.is_dir()
 
@@ -83,11 +111,12 @@ def test_log_formatting():
     # This is more of an integration test, but we'll check basic formatting
     # by examining the formatters on the handlers
 
-    # Get the logger
-    logger = logging_config.logger
+    # Get the handlers that emit records
+    _, listener = logging_config.setup_logger()
+    handlers = listener.handlers
 
     # Check console handler formatter
-    console_handlers = [h for h in logger.handlers if isinstance(h, logging.StreamHandler)
+    console_handlers = [h for h in handlers if isinstance(h, logging.StreamHandler)
                         and not isinstance(h, logging.FileHandler)]
     assert len(console_handlers) > 0
 
@@ -96,11 +125,34 @@ def test_log_formatting():
     assert "%(message)s" in console_formatter._fmt
 
     # Check file handler formatter
-    file_handlers = [h for h in logger.handlers if isinstance(h, logging.handlers.RotatingFileHandler)]
+    file_handlers = [h for h in handlers if isinstance(h, logging.handlers.RotatingFileHandler)]
     assert len(file_handlers) > 0
 
     file_formatter = file_handlers[0].formatter
     assert "%(asctime)s" in file_formatter._fmt
     assert "%(name)s" in file_formatter._fmt
     assert "%(levelname)s" in file_formatter._fmt
-    assert "%(message)s" in file_formatter._fmt
\ No newline at end of file
+    assert "%(message)s" in file_formatter._fmt
+
+
+def test_json_formatter():
+    """Test that the JSON formatter writes one object per record."""
+    formatter = logging_config.JsonFormatter()
+    record = logging.LogRecord("weather_api", logging.INFO, __file__, 1, "Found %s rows", (3,), None)
+
+    entry = json.loads(formatter.format(record))
+
+    assert entry["logger"] == "weather_api"
+    assert entry["level"] == "INFO"
+    assert entry["message"] == "Found 3 rows"
+    assert "timestamp" in entry
+
+
+def test_create_handlers_json_format():
+    """Test that the JSON format only applies to the file handler."""
+    console_handler, file_handler = logging_config.create_handlers(json_format=True)
+    try:
+        assert isinstance(file_handler.formatter, logging_config.JsonFormatter)
+        assert not isinstance(console_handler.formatter, logging_config.JsonFormatter)
+    finally:
+        file_handler.close()
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Base
+from src.models.models import Metric, Sensor
+from src.schemas.schemas import QueryParams
+from src.utils import instrumentation
+from src.utils.parallel_query import parallel_query, read_engine, split_time_range
+from src.utils.query_planner import answer_query, scan_window
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=8)
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """Create a file-backed database so partitions get their own connections"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'parallel.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+
+    session = sessionmaker(bind=engine)()
+    sensors = [Sensor(name=f"Sensor {i}", location="Test") for i in range(3)]
+    session.add_all(sensors)
+    session.flush()
+
+    metrics = []
+    current = START
+    step = 0
+    while current <= END:
+        for sensor in sensors:
+            metrics.append(Metric(sensor_id=sensor.id, metric_type="temperature",
+                                  value=float((step * 7 + sensor.id) % 40), timestamp=current))
+            metrics.append(Metric(sensor_id=sensor.id, metric_type="humidity",
+                                  value=float((step * 3 + sensor.id) % 90), timestamp=current))
+        current += timedelta(hours=6)
+        step += 1
+    session.add_all(metrics)
+    session.commit()
+    session.close()
+
+    yield engine
+    engine.dispose()
+
+
+def test_split_time_range():
+    """Test that sub-ranges are contiguous and cover the full range"""
+    windows = split_time_range(START, END, 4)
+
+    assert len(windows) == 4
+    assert windows[0][0] == START
+    assert windows[-1][1] == END
+    for (_, previous_end), (next_start, _) in zip(windows, windows[1:]):
+        assert previous_end == next_start
+
+    with pytest.raises(ValueError):
+        split_time_range(START, END, 0)
+
+
+@pytest.mark.parametrize("statistic", ["min", "max", "sum", "avg"])
+@pytest.mark.parametrize("parallelism", [1, 3, 4])
+def test_parallel_query_matches_serial(file_engine, statistic, parallelism):
+    """Test that merging partition partials gives the same results as one scan"""
+    query_params = QueryParams(
+        metric_types=["temperature", "humidity"],
+        statistic=statistic,
+        start_date=START,
+        end_date=END
+    )
+
+    with sessionmaker(bind=file_engine)() as session:
+        expected = answer_query(query_params, scan_window(session, (START, END), [query_params]))
+
+    results = parallel_query(file_engine, query_params, parallelism=parallelism)
+
+    assert [r.model_dump() for r in results] == pytest.approx([r.model_dump() for r in expected])
+
+
+def test_parallel_query_requires_date_range(file_engine):
+    """Test that the parallel mode rejects open-ended queries"""
+    query_params = QueryParams(metric_types=["temperature"], statistic="avg")
+
+    with pytest.raises(ValueError):
+        parallel_query(file_engine, query_params, parallelism=2)
+
+
+def test_partitions_use_read_only_connections(file_engine):
+    """Test that partitions read through their own read-only engine and leave the application's pool alone"""
+    query_params = QueryParams(metric_types=["temperature"], statistic="avg", start_date=START, end_date=END)
+
+    parallel_query(file_engine, query_params, parallelism=3)
+
+    assert read_engine(file_engine) is read_engine(file_engine)
+    with read_engine(file_engine).connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql("DELETE FROM metrics")
+    with file_engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA query_only").scalar() == 0
+
+
+def test_partitions_count_towards_request_stats(file_engine):
+    """Test that statements run by worker threads are recorded in the request's stats"""
+    query_params = QueryParams(metric_types=["temperature"], statistic="avg", start_date=START, end_date=END)
+    stats = instrumentation.RequestStats()
+    token = instrumentation._current_request.set(stats)
+    try:
+        parallel_query(file_engine, query_params, parallelism=3)
+    finally:
+        instrumentation._current_request.reset(token)
+
+    assert stats.statements == 3
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from src.utils import admin, profiling
+from src.utils.profiling import StackSampler, should_profile
+
+
+def test_should_profile_requires_matching_token(monkeypatch):
+    """Test that header-triggered profiling only accepts the admin token"""
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0)
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "")
+    assert should_profile([(b"x-admin-token", b"")]) is False
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    assert should_profile([(b"x-admin-token", b"secret")]) is True
+    assert should_profile([(b"x-admin-token", b"wrong")]) is False
+    assert should_profile([]) is False
+
+
+def test_should_profile_sample_rate(monkeypatch):
+    """Test that the sampler profiles requests without a header"""
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "")
+
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    assert should_profile([]) is True
+
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    assert should_profile([]) is False
+
+
+def test_stack_sampler_collects_busy_threads():
+    """Test that the sampler records stacks in collapsed format"""
+    sampler = StackSampler(0.001)
+    sampler.start()
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    sampler.stop()
+
+    output = sampler.collapsed()
+    assert "test_stack_sampler_collects_busy_threads" in output
+    for line in output.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+
+
+def test_profiled_request_saves_profile(client, sample_sensor, monkeypatch, tmp_path):
+    """Test that a profiled request covers the endpoint and returns the file name"""
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+
+    response = client.get(f"/sensors/{sample_sensor.id}", headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    profile = tmp_path / response.headers["x-profile-file"]
+    assert profile.exists()
+
+    unprofiled = client.get(f"/sensors/{sample_sensor.id}")
+    assert "x-profile-file" not in unprofiled.headers
+
+
+def test_sampled_request_does_not_disclose_profile_file(client, sample_sensor, monkeypatch, tmp_path):
+    """Test that sampled requests are saved without the X-Profile-File header"""
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+
+    response = client.get(f"/sensors/{sample_sensor.id}")
+
+    assert response.status_code == 200
+    assert "x-profile-file" not in response.headers
+    assert len(list(tmp_path.glob("*.collapsed"))) == 1
+
+
+def test_profile_is_saved_off_the_event_loop(client, sample_sensor, monkeypatch, tmp_path):
+    """Test that the profile file is not written on the event loop thread"""
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    on_event_loop = []
+    save_profile = profiling.save_profile
+
+    def recording_save_profile(*args):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return save_profile(*args)
+
+    monkeypatch.setattr(profiling, "save_profile", recording_save_profile)
+
+    client.get(f"/sensors/{sample_sensor.id}", headers={"X-Admin-Token": "secret"})
+
+    assert on_event_loop == [False]
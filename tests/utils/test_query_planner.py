@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta, timezone
+
+from src.models.models import Metric
+from src.schemas.schemas import MultiSensorQueryResult, QueryParams, SingleSensorQueryResult
+from src.utils.query_planner import (
+    PartialAggregate,
+    answer_query,
+    execute_batch,
+    plan_batch,
+    scan_window
+)
+
+
+def test_plan_batch_groups_by_window():
+    """Test that queries with the same window share a scan"""
+    default_window = (datetime(2025, 3, 1, tzinfo=timezone.utc), None)
+    start = datetime(2025, 2, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=7)
+
+    queries = [
+        QueryParams(metric_types=["temperature"], statistic="avg"),
+        QueryParams(metric_types=["humidity"], statistic="max", start_date=start, end_date=end),
+        QueryParams(sensor_ids=[1], metric_types=["rainfall"], statistic="sum"),
+        QueryParams(sensor_ids=[2], metric_types=["temperature"], statistic="min", start_date=start, end_date=end),
+    ]
+
+    plan = plan_batch(queries, default_window)
+
+    assert plan == {default_window: [0, 2], (start, end): [1, 3]}
+
+
+def test_plan_batch_merges_overlapping_windows():
+    """Test that overlapping, contained and touching windows share a scan covering all of them"""
+    day = datetime(2025, 2, 1)
+    default_window = (datetime(2025, 3, 1, tzinfo=timezone.utc), None)
+
+    def query(start, end):
+        return QueryParams(metric_types=["temperature"], statistic="avg", start_date=start, end_date=end)
+
+    queries = [
+        query(day, day + timedelta(days=7)),
+        query(day + timedelta(days=2), day + timedelta(days=3)),
+        query(day + timedelta(days=7), day + timedelta(days=10)),
+        query(day + timedelta(days=20), day + timedelta(days=25)),
+        QueryParams(metric_types=["humidity"], statistic="max"),
+        query(day + timedelta(days=24), day + timedelta(days=29)),
+    ]
+
+    plan = plan_batch(queries, default_window)
+
+    assert plan == {
+        (day, day + timedelta(days=10)): [0, 1, 2],
+        (day + timedelta(days=20), None): [3, 4, 5],
+    }
+
+
+def test_execute_batch_merged_windows_match_separate_scans(test_db, sample_sensor):
+    """Test that queries sharing a merged scan get the results of scanning their own window"""
+    day = datetime(2025, 2, 1)
+    test_db.add_all([
+        Metric(sensor_id=sample_sensor.id, metric_type="temperature", value=float(hour),
+               timestamp=day + timedelta(hours=hour))
+        for hour in range(0, 24 * 10, 6)
+    ])
+    test_db.commit()
+
+    queries = [
+        QueryParams(metric_types=["temperature"], statistic=statistic, start_date=start, end_date=end)
+        for statistic, start, end in [
+            ("avg", day, day + timedelta(days=8)),
+            ("sum", day + timedelta(days=2), day + timedelta(days=3)),
+            ("min", day + timedelta(days=3), day + timedelta(days=9)),
+            ("max", day + timedelta(days=1, hours=6), day + timedelta(days=2, hours=6)),
+        ]
+    ]
+
+    statements = []
+    original_query = test_db.query
+
+    def counting_query(*entities, **kwargs):
+        statements.append(entities)
+        return original_query(*entities, **kwargs)
+
+    test_db.query = counting_query
+    try:
+        results = execute_batch(test_db, queries)
+    finally:
+        test_db.query = original_query
+
+    assert len(statements) == 1
+    for query_params, result in zip(queries, results):
+        window = (query_params.start_date, query_params.end_date)
+        assert result == answer_query(query_params, scan_window(test_db, window, [query_params]))
+
+
+def test_answer_query_from_partials():
+    """Test that statistics are merged correctly across sensors"""
+    partials = {
+        (1, "temperature"): PartialAggregate(count=2, total=40.0, minimum=15.0, maximum=25.0),
+        (2, "temperature"): PartialAggregate(count=1, total=30.0, minimum=30.0, maximum=30.0),
+        (2, "humidity"): PartialAggregate(count=1, total=50.0, minimum=50.0, maximum=50.0),
+    }
+
+    avg = answer_query(QueryParams(metric_types=["temperature"], statistic="avg"), partials)
+    assert len(avg) == 1
+    assert isinstance(avg[0], MultiSensorQueryResult)
+    assert avg[0].value == 70.0 / 3
+    assert avg[0].sensor_ids == [1, 2]
+
+    minimum = answer_query(QueryParams(metric_types=["temperature"], statistic="min"), partials)
+    assert isinstance(minimum[0], SingleSensorQueryResult)
+    assert minimum[0].sensor_id == 1
+    assert minimum[0].value == 15.0
+
+    maximum = answer_query(QueryParams(sensor_ids=[1], metric_types=["temperature"], statistic="max"), partials)
+    assert maximum[0].sensor_id == 1
+    assert maximum[0].value == 25.0
+
+    # Metric types without data are skipped, like in query_metrics
+    missing = answer_query(QueryParams(metric_types=["rainfall", "humidity"], statistic="sum"), partials)
+    assert [r.metric_type for r in missing] == ["humidity"]
+
+
+def test_scan_window(test_db, sample_sensor, sample_metrics):
+    """Test that a scan returns one partial per sensor and metric type"""
+    start = min(m.timestamp for m in sample_metrics)
+    queries = [QueryParams(metric_types=["temperature", "humidity"], statistic="avg")]
+
+    partials = scan_window(test_db, (start, None), queries)
+
+    per_type = len(sample_metrics) // 2
+    assert partials[(sample_sensor.id, "temperature")] == PartialAggregate(per_type, 25.0 * per_type, 25.0, 25.0)
+    assert partials[(sample_sensor.id, "humidity")] == PartialAggregate(per_type, 60.0 * per_type, 60.0, 60.0)
+
+
+def test_execute_batch_issues_one_scan_per_window(test_db, sample_sensor):
+    """Test that execute_batch keeps query order and shares scans"""
+    now = datetime.now(timezone.utc)
+    test_db.add_all([
+        Metric(sensor_id=sample_sensor.id, metric_type="temperature", value=20.0, timestamp=now),
+        Metric(sensor_id=sample_sensor.id, metric_type="humidity", value=40.0, timestamp=now),
+    ])
+    test_db.commit()
+
+    queries = [
+        QueryParams(metric_types=["humidity"], statistic="max"),
+        QueryParams(sensor_ids=[sample_sensor.id], metric_types=["temperature"], statistic="avg"),
+    ]
+
+    statements = []
+    original_query = test_db.query
+
+    def counting_query(*entities, **kwargs):
+        statements.append(entities)
+        return original_query(*entities, **kwargs)
+
+    test_db.query = counting_query
+    try:
+        results = execute_batch(test_db, queries)
+    finally:
+        test_db.query = original_query
+
+    assert len(statements) == 1
+    assert results[0][0].metric_type == "humidity"
+    assert results[0][0].value == 40.0
+    assert results[1][0].metric_type == "temperature"
+    assert results[1][0].value == 20.0
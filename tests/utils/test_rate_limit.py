@@ -0,0 +1,54 @@
+from src.utils import rate_limit
+from src.utils.rate_limit import TokenBuckets, client_key
+
+
+def test_bucket_allows_burst_then_refills():
+    """Test that a client can spend its burst and then gets one token per 1/rate seconds"""
+    buckets = TokenBuckets(rate=2.0, burst=3.0)
+
+    assert [buckets.take("gateway", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("gateway", now=0.0) == 0.5
+    assert buckets.take("gateway", now=0.5) == 0.0
+    assert buckets.take("other", now=0.5) == 0.0
+
+
+def test_idle_buckets_are_evicted():
+    """Test that refilled buckets are dropped and the number of clients stays bounded"""
+    buckets = TokenBuckets(rate=1.0, burst=2.0, max_clients=3)
+
+    for i in range(3):
+        buckets.take(i, now=0.0)
+    buckets.take(3, now=0.0)
+    assert len(buckets) == 3
+    assert 0 not in buckets.buckets
+
+    # Every bucket has refilled after burst / rate seconds, so all are dropped
+    buckets.take("late", now=2.0)
+    assert list(buckets.buckets) == ["late"]
+
+
+def test_client_key_prefers_configured_api_key():
+    """Test that clients are keyed by a configured API key and by address otherwise"""
+    scope = {"headers": [(b"x-api-key", b"gateway-7")], "client": ("10.0.0.1", 5000)}
+
+    assert client_key(scope, {b"gateway-7"}) == ("key", b"gateway-7")
+    assert client_key(scope, {b"gateway-8"}) == ("address", "10.0.0.1")
+    assert client_key({"headers": [], "client": ("10.0.0.1", 5000)}, {b"gateway-7"}) == ("address", "10.0.0.1")
+
+
+def test_middleware_returns_429(client, sample_sensor, monkeypatch):
+    """Test that a client over its ingestion rate gets 429 while queries are still served"""
+    monkeypatch.setattr(rate_limit, "buckets", {"ingest": TokenBuckets(rate=0.5, burst=1.0)})
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_API_KEYS", frozenset({b"other"}))
+    reading = {"sensor_id": sample_sensor.id, "metric_type": "temperature", "value": 20.0}
+
+    assert client.post("/metrics/", json=reading).status_code == 201
+    response = client.post("/metrics/", json=reading)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    # An unknown key does not get a fresh bucket, a configured one does
+    assert client.post("/metrics/", json=reading, headers={"X-API-Key": "random"}).status_code == 429
+    assert client.post("/metrics/", json=reading, headers={"X-API-Key": "other"}).status_code == 201
+    assert client.get("/metrics/").status_code == 200
+    assert 'rate_limited_total{route_class="ingest"}' in client.get("/internal/stats/").text
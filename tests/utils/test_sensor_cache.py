@@ -0,0 +1,57 @@
+from sqlalchemy import create_engine, event
+
+from src.models.models import Sensor
+from src.utils.sensor_cache import SensorCache, sensor_cache
+
+
+def test_known_only_queries_missing_ids(test_db, sample_sensor):
+    """Test that cached ids are answered without a query and unknown ids are not cached"""
+    cache = SensorCache()
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    assert cache.known(test_db, {sample_sensor.id, 999}) == {sample_sensor.id}
+    assert cache.known(test_db, {sample_sensor.id}) == {sample_sensor.id}
+    assert not cache.exists(test_db, 999)
+
+    assert len(statements) == 2
+    assert sample_sensor.id in cache
+    assert 999 not in cache
+
+
+def test_warm_and_add(test_db, sample_sensor):
+    """Test that warming loads every sensor and created sensors can be added"""
+    cache = SensorCache()
+
+    assert cache.warm(test_db) == 1
+    cache.add(42)
+
+    assert sample_sensor.id in cache
+    assert 42 in cache
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_sensor_cache_is_per_engine(test_db):
+    """Test that sessions and engines of the same database share a cache, others do not"""
+    other = create_engine("sqlite:///:memory:")
+
+    assert sensor_cache(test_db) is sensor_cache(test_db.get_bind())
+    assert sensor_cache(test_db) is not sensor_cache(other)
+
+
+def test_create_metric_skips_sensor_lookup(client, test_db):
+    """Test that readings for a sensor created through the API never query the sensors table"""
+    sensor_id = client.post("/sensors/", json={"name": "Roof", "location": "North"}).json()["id"]
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    response = client.post("/metrics/", json={"sensor_id": sensor_id, "metric_type": "temperature", "value": 20.0})
+
+    assert response.status_code == 201
+    assert not [statement for statement in statements if "FROM sensors" in statement]
+    # The metrics INSERT ... RETURNING and the latest_metrics upsert
+    assert [statement.split()[2] for statement in statements] == ["metrics", "latest_metrics"]
+    assert test_db.get(Sensor, sensor_id) is not None
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    """Test that callers with the same key wait for the leader's result"""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return {"value": 42}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flights.do, "key", compute)
+        started.wait(timeout=5)
+        followers = [pool.submit(flights.do, "key", compute) for _ in range(4)]
+
+        # Wait until every follower has joined the in-flight call
+        while flights.coalesced < 4:
+            threading.Event().wait(0.01)
+        release.set()
+
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1
+    assert all(result == {"value": 42} for result in results)
+    assert flights.coalesced == 4
+    assert flights.in_flight() == 0
+
+
+def test_sequential_calls_are_not_coalesced():
+    """Test that a finished call is not reused by later callers"""
+    flights = SingleFlight()
+    counter = iter(range(10))
+
+    assert flights.do("key", lambda: next(counter)) == 0
+    assert flights.do("key", lambda: next(counter)) == 1
+    assert flights.coalesced == 0
+
+
+def test_errors_are_shared_with_waiters():
+    """Test that an exception from the leader is raised in every waiter"""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(timeout=5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.do, "key", failing)
+        started.wait(timeout=5)
+        follower = pool.submit(flights.do, "key", failing)
+        while flights.coalesced < 1:
+            threading.Event().wait(0.01)
+        release.set()
+
+        with pytest.raises(ValueError):
+            leader.result()
+        with pytest.raises(ValueError):
+            follower.result()
+
+    assert flights.in_flight() == 0
@@ -0,0 +1,80 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from src.models.models import Metric
+from src.utils.subscriptions import MetricBroker
+
+TIMESTAMP = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _metric(metric_id, sensor_id, metric_type="temperature", value=20.0):
+    return Metric(id=metric_id, sensor_id=sensor_id, metric_type=metric_type, value=value, timestamp=TIMESTAMP)
+
+
+def test_publish_fans_out_by_sensor_and_type():
+    """Test that each subscriber only receives the readings it subscribed to"""
+    async def scenario():
+        broker = MetricBroker()
+        everything = broker.subscribe()
+        sensor_one = broker.subscribe(sensor_ids=[1])
+        humidity = broker.subscribe(metric_types=["humidity"])
+
+        broker.publish([_metric(1, 1), _metric(2, 2, "humidity"), _metric(3, 3)])
+        await asyncio.sleep(0)
+
+        received = [
+            [json.loads(subscription.queue.get_nowait())["id"] for _ in range(subscription.queue.qsize())]
+            for subscription in (everything, sensor_one, humidity)
+        ]
+        for subscription in (everything, sensor_one, humidity):
+            broker.unsubscribe(subscription)
+        return received, broker._by_sensor
+
+    received, index = asyncio.run(scenario())
+
+    assert received == [[1, 2, 3], [1], [2]]
+    assert not index
+
+
+def test_slow_consumer_is_dropped():
+    """Test that a subscriber whose queue overflows is told to disconnect"""
+    async def scenario():
+        broker = MetricBroker()
+        subscription = broker.subscribe(queue_size=2)
+        broker.publish([_metric(i, 1) for i in range(5)])
+        await asyncio.sleep(0)
+
+        sent = []
+
+        async def send_text(text):
+            sent.append(text)
+
+        return await asyncio.wait_for(subscription.stream(send_text, 60), 1), sent, subscription.dropped
+
+    still_connected, sent, dropped = asyncio.run(scenario())
+
+    assert still_connected is False
+    assert dropped
+    assert sent == []
+
+
+def test_take_aggregates_coalesces_readings():
+    """Test that aggregates summarize every reading since the previous update"""
+    async def scenario():
+        broker = MetricBroker()
+        subscription = broker.subscribe(readings=False)
+        broker.publish([_metric(1, 1, value=10.0), _metric(2, 1, value=30.0), _metric(3, 2, value=5.0)])
+        await asyncio.sleep(0)
+        return subscription
+
+    subscription = asyncio.run(scenario())
+
+    message = json.loads(subscription.take_aggregates())
+    assert subscription.queue.empty()
+    assert message["metrics"][0] == {
+        "sensor_id": 1, "metric_type": "temperature", "count": 2, "min": 10.0, "max": 30.0, "avg": 20.0,
+        "latest": 30.0, "timestamp": TIMESTAMP.isoformat()
+    }
+    assert message["metrics"][1]["sensor_id"] == 2
+    assert subscription.take_aggregates() is None